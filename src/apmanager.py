@@ -10,9 +10,17 @@ Traceability: workspace/trace/trace-0001-requirements-traceability-matrix.md
 Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
 """
 
+import asyncio
 import logging
+import re
+import time
 import traceback
+from dataclasses import dataclass
+from pathlib import Path
 from subprocess import check_output, CalledProcessError
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from connectionmanager import NetworkScanError, NetworkScanner, ScanCache, ScanResult
 
 # Custom exceptions
 class APManagerError(Exception):
@@ -27,13 +35,192 @@ class APActivationError(APManagerError):
 class ProfileCreationError(APManagerError):
     pass
 
-# Logger setup
+# Configure module logger (handlers are owned by the service controller)
 logger = logging.getLogger('APManager')
-logger.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-ch = logging.StreamHandler()
-ch.setFormatter(formatter)
-logger.addHandler(ch)
+
+# AP profile written into a flashed image by the offline provisioner; when
+# present it is used as-is instead of creating the profile with nmcli.
+# Keep in sync with installer.PROVISIONED_AP_KEYFILE.
+PROVISIONED_AP_KEYFILE = Path('/etc/NetworkManager/system-connections/pi-netconfig-ap-provisioned.nmconnection')
+
+# Channel planning
+CHANNELS_24GHZ = (1, 6, 11)
+CHANNELS_5GHZ = (36, 40, 44, 48)  # UNII-1, no DFS wait before beaconing
+BSSID_WEIGHT = 1.0
+OVERLAP_SPAN_24GHZ = 5  # 20 MHz channels overlap up to 4 channel numbers away
+
+def channel_overlap(channel: int, other: int) -> float:
+    """Return overlap factor (0..1) between two channels."""
+    if channel > 14 or other > 14:
+        return 1.0 if channel == other else 0.0
+    distance = abs(channel - other)
+    return max(0.0, 1.0 - distance / OVERLAP_SPAN_24GHZ)
+
+def score_channels(scan: ScanResult, candidates: Iterable[int]) -> Dict[int, float]:
+    """Congestion per candidate: each BSSID adds (count weight + signal) scaled by overlap."""
+    scores = {channel: 0.0 for channel in candidates}
+    for entry in scan.entries:
+        weight = BSSID_WEIGHT + entry.signal_strength / 100.0
+        for channel in scores:
+            overlap = channel_overlap(channel, entry.channel)
+            if overlap:
+                scores[channel] += overlap * weight
+    return scores
+
+def select_channel(scan: ScanResult, supports_5ghz: bool = False) -> Tuple[str, int]:
+    """Return (nmcli band, channel) for the least-congested candidate; ties favour 2.4 GHz."""
+    candidates = [('bg', c) for c in CHANNELS_24GHZ]
+    if supports_5ghz:
+        candidates += [('a', c) for c in CHANNELS_5GHZ]
+    scores = score_channels(scan, [c for _, c in candidates])
+    return min(candidates, key=lambda bc: scores[bc[1]])
+
+# AP+STA concurrency
+STATION_INTERFACE_SUFFIX = "sta"
+_COMBINATION_GROUP = re.compile(r"#\{\s*([^}]*)\}\s*<=\s*(\d+)")
+_COMBINATION_TOTAL = re.compile(r"total\s*<=\s*(\d+)")
+_COMBINATION_CHANNELS = re.compile(r"#channels\s*<=\s*(\d+)")
+
+@dataclass(frozen=True)
+class InterfaceCapabilities:
+    """Subset of PHY capabilities needed to run a station beside the AP."""
+    supports_ap: bool
+    supports_ap_sta: bool
+    max_channels: int = 1
+
+    @classmethod
+    def from_iw_list(cls, output: str) -> "InterfaceCapabilities":
+        """Parse 'iw list' supported modes and valid interface combinations."""
+        supports_ap = bool(re.search(r"^\s*\* AP$", output, re.MULTILINE))
+        supports_ap_sta, max_channels = False, 1
+        for combo in cls._combinations(output):
+            groups = [([m.strip() for m in names.split(",")], int(limit))
+                      for names, limit in _COMBINATION_GROUP.findall(combo)]
+            total = _COMBINATION_TOTAL.search(combo)
+            if total is None or int(total.group(1)) < 2:
+                continue
+            sta = [g for g in groups if "managed" in g[0]]
+            ap = [g for g in groups if "AP" in g[0]]
+            if not sta or not ap:
+                continue
+            if sta[0] is ap[0] and sta[0][1] < 2:
+                continue
+            supports_ap_sta = True
+            channels = _COMBINATION_CHANNELS.search(combo)
+            max_channels = max(max_channels, int(channels.group(1)) if channels else 1)
+        return cls(supports_ap, supports_ap_sta, max_channels)
+
+    @staticmethod
+    def _combinations(output: str) -> List[str]:
+        """Return each '* #{ ... }' combination, joined with its continuation lines."""
+        combos: List[str] = []
+        header_indent = None
+        for line in output.splitlines():
+            indent = len(line) - len(line.lstrip())
+            if header_indent is None:
+                if line.strip() == "valid interface combinations:":
+                    header_indent = indent
+                continue
+            if line.strip() and indent <= header_indent:
+                break
+            if line.strip().startswith("*"):
+                combos.append(line.strip())
+            elif combos:
+                combos[-1] += " " + line.strip()
+        return combos
+
+class StationProbe:
+    """Virtual station interface used to look for known networks while the AP stays up."""
+
+    def __init__(self, ap_interface: str, capabilities: InterfaceCapabilities,
+                 known_ssids: Callable[[], List[str]]):
+        self.ap_interface = ap_interface
+        self.capabilities = capabilities
+        self.known_ssids = known_ssids
+        self.station_interface = f"{ap_interface}{STATION_INTERFACE_SUFFIX}"
+        self.station_active = False
+
+    @classmethod
+    def create(cls, ap_interface: str, known_ssids: Callable[[], List[str]]) -> Optional["StationProbe"]:
+        """Return a probe when 'iw list' reports AP+STA support, otherwise None."""
+        try:
+            capabilities = InterfaceCapabilities.from_iw_list(check_output(["iw", "list"]).decode("utf-8"))
+        except (CalledProcessError, OSError) as e:
+            logger.warning(f"Could not read interface capabilities: {e}")
+            return None
+        if not capabilities.supports_ap_sta:
+            logger.info("Chipset does not support concurrent AP+STA, probing disabled")
+            return None
+        return cls(ap_interface, capabilities, known_ssids)
+
+    def add_station_interface(self) -> None:
+        """Execute 'iw dev {ap_interface} interface add {station} type managed'."""
+        if self.station_active:
+            return
+        check_output(["iw", "dev", self.ap_interface, "interface", "add",
+                      self.station_interface, "type", "managed"])
+        self.station_active = True
+        logger.info(f"Station interface {self.station_interface} added")
+
+    def remove_station_interface(self) -> None:
+        """Execute 'iw dev {station} del', ignoring failures."""
+        if not self.station_active:
+            return
+        try:
+            check_output(["iw", "dev", self.station_interface, "del"])
+            logger.info(f"Station interface {self.station_interface} removed")
+        except CalledProcessError as e:
+            logger.warning(f"Failed to remove station interface: {e}")
+        self.station_active = False
+
+    def scan_known(self) -> Optional[str]:
+        """Rescan on the station interface, return the first visible known SSID."""
+        known = [ssid for ssid in self.known_ssids() if ssid]
+        if not known:
+            return None
+        self.add_station_interface()
+        output = check_output(["nmcli", "-t", "-f", "SSID", "dev", "wifi", "list",
+                               "ifname", self.station_interface, "--rescan", "yes"]).decode("utf-8")
+        visible = {line.strip() for line in output.splitlines()}
+        return next((ssid for ssid in known if ssid in visible), None)
+
+    def connect(self, ssid: str) -> bool:
+        """Execute 'nmcli con up id {ssid} ifname {station}'."""
+        try:
+            check_output(["nmcli", "con", "up", "id", ssid, "ifname", self.station_interface])
+            return True
+        except CalledProcessError as e:
+            logger.warning(f"Station connect to {ssid} failed: {e}")
+            return False
+
+    def connect_primary(self, ssid: str) -> bool:
+        """Execute 'nmcli con up id {ssid} ifname {ap_interface}' once the AP is down."""
+        try:
+            check_output(["nmcli", "con", "up", "id", ssid, "ifname", self.ap_interface])
+            return True
+        except CalledProcessError as e:
+            logger.warning(f"Activating {ssid} on {self.ap_interface} failed: {e}")
+            return False
+
+    async def find_known_network(self) -> Optional[str]:
+        """Async wrapper for scan_known(); errors mean nothing found."""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, self.scan_known)
+        except (CalledProcessError, OSError) as e:
+            logger.warning(f"Station scan failed: {e}")
+            return None
+
+    async def connect_known(self, ssid: str) -> bool:
+        """Async wrapper for connect()."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.connect, ssid)
+
+    async def activate_primary(self, ssid: str) -> bool:
+        """Async wrapper for connect_primary()."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.connect_primary, ssid)
+
+    async def release(self) -> None:
+        """Async wrapper for remove_station_interface()."""
+        await asyncio.get_running_loop().run_in_executor(None, self.remove_station_interface)
 
 class AccessPoint:
     """Manage local WiFi access point for network configuration."""
@@ -83,11 +270,47 @@ class AccessPoint:
         """Format "PiConfig-{last_4_hex}" from MAC address."""
         return f"PiConfig-{self.mac_address[-4:]}"
 
-    def create_ap_profile(self) -> None:
-        """Execute nmcli commands to create AP profile with WPA2-PSK."""
+    def supports_5ghz(self) -> bool:
+        """Execute 'nmcli -f WIFI-PROPERTIES.5GHZ device show {interface}', check for 'yes'."""
+        try:
+            output = check_output(["nmcli", "-t", "-f", "WIFI-PROPERTIES.5GHZ",
+                                   "device", "show", self.interface]).decode("utf-8")
+            return output.strip().endswith("yes")
+        except (CalledProcessError, OSError) as e:
+            logger.warning(f"Could not query 5 GHz support: {e}")
+            return False
+
+    @staticmethod
+    def recent_scan() -> Optional[ScanResult]:
+        """Return ScanCache's result within its TTL, else NetworkManager's last scan (no rescan)."""
+        scan = ScanCache.latest()
+        if scan is not None and time.time() - scan.timestamp <= ScanCache.TTL_SECONDS:
+            return scan
+        try:
+            return NetworkScanner.cached_scan()
+        except NetworkScanError as e:
+            logger.warning(f"No recent scan for channel planning: {e}")
+            return None
+
+    def plan_channel(self, scan: Optional[ScanResult] = None) -> Optional[Tuple[str, int]]:
+        """Pick band/channel from the given or a recent scan, None without scan data."""
+        scan = scan if scan is not None else self.recent_scan()
+        if scan is None or not scan.entries:
+            logger.info("No scan data available, leaving AP channel to NetworkManager")
+            return None
+        band, channel = select_channel(scan, self.supports_5ghz())
+        logger.info(f"Selected AP channel {channel} (band {band}) from {len(scan.entries)} BSSIDs")
+        return band, channel
+
+    def create_ap_profile(self, scan: Optional[ScanResult] = None) -> None:
+        """Execute nmcli commands to create AP profile with WPA2-PSK on the least-congested channel."""
         try:
-            check_output(["nmcli", "con", "add", "type", "wifi", "ifname", self.interface,
-                          "con-name", self.profile_name, "mode", "ap", "ssid", self.ssid])
+            command = ["nmcli", "con", "add", "type", "wifi", "ifname", self.interface,
+                       "con-name", self.profile_name, "mode", "ap", "ssid", self.ssid]
+            plan = self.plan_channel(scan)
+            if plan is not None:
+                command += ["802-11-wireless.band", plan[0], "802-11-wireless.channel", str(plan[1])]
+            check_output(command)
             check_output(["nmcli", "con", "modify", self.profile_name,
                           "802-11-wireless-security.key-mgmt", "wpa-psk"])
             check_output(["nmcli", "con", "modify", self.profile_name,
@@ -153,10 +376,13 @@ class AccessPoint:
 
 # Public functions
 def activate_ap() -> bool:
-    """Create AccessPoint instance, activate."""
+    """Create AccessPoint instance, activate (using a provisioned profile if present)."""
     ap = AccessPoint()
     try:
-        ap.create_ap_profile()
+        if PROVISIONED_AP_KEYFILE.exists():
+            logger.info("Using provisioned AP profile")
+        else:
+            ap.create_ap_profile()
         return ap.activate_ap()
     except ProfileCreationError:
         return ap.fallback_to_open_ap()
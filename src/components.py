@@ -0,0 +1,220 @@
+"""
+Components Module - Service Wiring
+
+Builds the objects StateMonitor drives and connects them explicitly, instead
+of each module importing its collaborators at request time. Every adapter
+exposes the async interface StateMonitor expects and imports its backing
+module on first use, so modules needed only in AP mode (HTTP server, access
+point control, captive DNS, station probing) are never loaded on a device
+that stays in CLIENT mode. The one exception is a socket-activated portal,
+whose inherited listener is adopted at service start.
+
+Copyright (c) 2025 William Watson. Licensed under MIT License.
+"""
+
+import asyncio
+import logging
+import sys
+from typing import Any, Callable, Dict, List, Optional
+
+# Configure module logger
+logger = logging.getLogger('Components')
+
+PORTAL_PORT = 8080
+AP_ADDRESS = '192.168.50.1'
+
+
+class ComponentError(Exception):
+    """Raised when a wired component cannot perform its operation"""
+    pass
+
+
+def load_module(name: str):
+    """Import a component module on first use (cached by sys.modules)"""
+    # __import__ rather than importlib.import_module: only the former is
+    # reported by -X importtime, which the cold-start budget test parses
+    return __import__(name)
+
+
+async def run_blocking(func: Callable, *args) -> Any:
+    """Run a blocking component call in the default executor"""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+def configured_ssid() -> Optional[str]:
+    """Return the configured SSID, None if unconfigured or unreadable"""
+    connectionmanager = load_module('connectionmanager')
+    try:
+        return connectionmanager.ConfigManager.load_configuration() or None
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Cannot read configuration: {e}")
+        return None
+
+
+def known_ssids() -> List[str]:
+    """Return the configured SSID as a list (empty if unconfigured)"""
+    ssid = configured_ssid()
+    return [ssid] if ssid else []
+
+
+class ConnectionService:
+    """Async connectivity check backed by connectionmanager.ConnectionTester"""
+
+    async def test_connection(self) -> bool:
+        """Probe upstream DNS servers without blocking the event loop"""
+        tester = load_module('connectionmanager').ConnectionTester
+        return await run_blocking(tester.test_connection)
+
+
+class AccessPointService:
+    """Async access point control backed by apmanager (loaded on first use)"""
+
+    async def activate_ap(self) -> None:
+        """
+        Create and bring up the AP profile
+
+        Raises:
+            ComponentError: If the access point did not come up
+        """
+        if not await run_blocking(load_module('apmanager').activate_ap):
+            raise ComponentError("Access point activation failed")
+
+    async def deactivate_ap(self) -> None:
+        """Bring the AP profile down"""
+        await run_blocking(load_module('apmanager').deactivate_ap)
+
+
+class PortalService:
+    """Async portal control backed by webserver (loaded on first use)"""
+
+    def __init__(self, port: int = PORTAL_PORT,
+                 status_provider: Optional[Callable[[], Dict[str, Any]]] = None):
+        """
+        Initialize portal adapter
+
+        Args:
+            port: Portal TCP port
+            status_provider: Callable returning the /api/status payload
+        """
+        self.port = port
+        self.status_provider = status_provider
+
+    def _open(self) -> None:
+        """Bind (or adopt) the listening socket with wired providers (idempotent)"""
+        load_module('webserver').open_server(self.port, status_provider=self.status_provider)
+
+    async def open(self) -> None:
+        """Bind the portal socket without accepting yet"""
+        await run_blocking(self._open)
+
+    def _start(self) -> None:
+        """Bind on first AP entry (a no-op later), then begin accepting"""
+        self._open()
+        load_module('webserver').start_server(self.port)
+
+    async def start_server(self) -> None:
+        """Start serving the portal"""
+        await run_blocking(self._start)
+
+    async def stop_server(self) -> None:
+        """Stop serving, keeping the listening socket"""
+        await run_blocking(load_module('webserver').stop_server)
+
+    def close(self) -> None:
+        """Release the listening socket if the portal was ever opened"""
+        webserver = sys.modules.get('webserver')
+        if webserver is not None:
+            webserver.close_server()
+
+
+class DNSService:
+    """Captive-portal DNS backed by dnsresponder (loaded on first use)"""
+
+    def __init__(self, address: str = AP_ADDRESS):
+        """Initialize adapter answering with address"""
+        self.address = address
+        self.responder = None
+
+    async def start(self) -> None:
+        """Create responder on first AP activation and start it"""
+        if self.responder is None:
+            self.responder = load_module('dnsresponder').DNSResponder(self.address)
+        await self.responder.start()
+
+    async def stop(self) -> None:
+        """Stop responder if it was created"""
+        if self.responder is not None:
+            await self.responder.stop()
+
+
+class StationProbeService:
+    """AP+STA probe created on first use; inert on unsupported chipsets"""
+
+    def __init__(self):
+        """Initialize adapter with probe not yet created"""
+        self.probe = None
+        self.checked = False
+
+    def _create(self) -> None:
+        """Query chipset capabilities once and build the probe if supported"""
+        apmanager = load_module('apmanager')
+        interface = apmanager.AccessPoint().interface
+        self.probe = apmanager.StationProbe.create(interface, known_ssids)
+        self.checked = True
+
+    async def find_known_network(self) -> Optional[str]:
+        """Delegate to StationProbe, None if unsupported"""
+        if not self.checked:
+            try:
+                await run_blocking(self._create)
+            except Exception as e:
+                logger.warning(f"Station probing unavailable: {e}")
+                self.checked = True
+        if self.probe is None:
+            return None
+        return await self.probe.find_known_network()
+
+    async def connect_known(self, ssid: str) -> bool:
+        """Delegate to StationProbe"""
+        if self.probe is None:
+            return False
+        return await self.probe.connect_known(ssid)
+
+    async def activate_primary(self, ssid: str) -> bool:
+        """Delegate to StationProbe"""
+        if self.probe is None:
+            return False
+        return await self.probe.activate_primary(ssid)
+
+    async def release(self) -> None:
+        """Delegate to StationProbe"""
+        if self.probe is not None:
+            await self.probe.release()
+
+
+class ServiceComponents:
+    """Explicitly wired component set handed to StateMonitor"""
+
+    def __init__(self, port: int = PORTAL_PORT, captive_dns: bool = True,
+                 station_probing: bool = True):
+        """
+        Build adapters (no component modules are imported here)
+
+        Args:
+            port: Portal TCP port
+            captive_dns: Run the captive-portal DNS responder in AP mode
+            station_probing: Probe for known networks via AP+STA in AP mode
+        """
+        self.connection = ConnectionService()
+        self.access_point = AccessPointService()
+        self.portal = PortalService(port)
+        self.dns = DNSService() if captive_dns else None
+        self.station_probe = StationProbeService() if station_probing else None
+
+    def bind_status(self, status_provider: Callable[[], Dict[str, Any]]) -> None:
+        """Wire the portal's /api/status to the state machine"""
+        self.portal.status_provider = status_provider
+
+    def close(self) -> None:
+        """Release process-lifetime resources"""
+        self.portal.close()
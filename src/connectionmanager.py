@@ -16,10 +16,11 @@ import socket
 import json
 from pathlib import Path
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 import logging
 from datetime import datetime
 import threading
+import time
 
 @dataclass
 class NetworkInfo:
@@ -27,6 +28,103 @@ class NetworkInfo:
     signal_strength: int
     security: str
     frequency: str
+    bands: Tuple[str, ...] = ()
+    bssid_count: int = 1
+
+def band_for_frequency(frequency: int) -> str:
+    if frequency < 3000:
+        return '2.4GHz'
+    if frequency < 5925:
+        return '5GHz'
+    return '6GHz'
+
+def security_class(security: str) -> str:
+    tokens = security.upper().split()
+    if not tokens or tokens == ['--']:
+        return 'open'
+    if '802.1X' in tokens:
+        return 'enterprise'
+    if any(t.startswith('WPA') for t in tokens):
+        return 'wpa'
+    return 'wep' if 'WEP' in tokens else 'open'
+
+class BSSIDEntry:
+    """One access point radio seen in a scan; slotted to stay small in dense scans."""
+    __slots__ = ('ssid', 'bssid', 'signal_strength', 'security', 'frequency', 'channel', 'rate')
+
+    def __init__(self, ssid: str, bssid: str, signal_strength: int, security: str,
+                 frequency: int, channel: int, rate: int):
+        self.ssid = ssid
+        self.bssid = bssid
+        self.signal_strength = signal_strength
+        self.security = security
+        self.frequency = frequency
+        self.channel = channel
+        self.rate = rate
+
+    @property
+    def band(self) -> str:
+        return band_for_frequency(self.frequency)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, BSSIDEntry):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __repr__(self) -> str:
+        return (f'BSSIDEntry(ssid={self.ssid!r}, bssid={self.bssid!r}, '
+                f'signal_strength={self.signal_strength}, channel={self.channel})')
+
+class SSIDSummary:
+    """Per-SSID aggregate: strongest BSSID, bands available and BSSID count."""
+    __slots__ = ('ssid', 'best', 'bands', 'bssid_count')
+
+    def __init__(self, best: BSSIDEntry):
+        self.ssid = best.ssid
+        self.best = best
+        self.bands = {best.band}
+        self.bssid_count = 1
+
+    def add(self, entry: BSSIDEntry) -> None:
+        self.bssid_count += 1
+        self.bands.add(entry.band)
+        if entry.signal_strength > self.best.signal_strength:
+            self.best = entry
+
+    @property
+    def signal_strength(self) -> int:
+        return self.best.signal_strength
+
+    @property
+    def security(self) -> str:
+        return self.best.security
+
+    def to_network_info(self) -> NetworkInfo:
+        return NetworkInfo(self.ssid, self.best.signal_strength, self.best.security,
+                           f'{self.best.frequency} MHz', tuple(sorted(self.bands)),
+                           self.bssid_count)
+
+class ScanResult:
+    """Every BSSID from one scan plus per-SSID aggregates built in a single pass."""
+    __slots__ = ('entries', 'summaries', 'timestamp')
+
+    def __init__(self, entries: Iterable[BSSIDEntry], timestamp: Optional[float] = None):
+        self.entries: Tuple[BSSIDEntry, ...] = tuple(entries)
+        self.timestamp = time.time() if timestamp is None else timestamp
+        summaries: Dict[str, SSIDSummary] = {}
+        for entry in self.entries:
+            if not entry.ssid:
+                continue
+            summary = summaries.get(entry.ssid)
+            if summary is None:
+                summaries[entry.ssid] = SSIDSummary(entry)
+            else:
+                summary.add(entry)
+        self.summaries = summaries
+
+    def networks(self) -> List[NetworkInfo]:
+        ranked = sorted(self.summaries.values(), key=lambda s: s.signal_strength, reverse=True)
+        return [s.to_network_info() for s in ranked]
 
 class ConnectionManagerError(Exception):
     pass
@@ -50,21 +148,93 @@ class ConnectionTester:
                 pass
         return False
 
+def _split_terse(line: str) -> List[str]:
+    # nmcli -t escapes ':' and '\\' inside values (e.g. BSSIDs) with a backslash
+    fields, current, escaped = [], [], False
+    for ch in line:
+        if escaped:
+            current.append(ch)
+            escaped = False
+        elif ch == '\\':
+            escaped = True
+        elif ch == ':':
+            fields.append(''.join(current))
+            current = []
+        else:
+            current.append(ch)
+    fields.append(''.join(current))
+    return fields
+
+def _leading_int(value: str) -> int:
+    digits = value.strip().split(' ', 1)[0]
+    return int(digits) if digits.isdigit() else 0
+
 class NetworkScanner:
+    SCAN_FIELDS = 'SSID,BSSID,SIGNAL,SECURITY,FREQ,CHAN,RATE'
+
     @staticmethod
-    def scan_networks() -> List[NetworkInfo]:
+    def parse_scan_output(output: str) -> ScanResult:
+        entries = []
+        for line in output.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            ssid, bssid, signal_strength, security, frequency, channel, rate = _split_terse(line)
+            entries.append(BSSIDEntry(ssid, bssid, int(signal_strength), security,
+                                      _leading_int(frequency), _leading_int(channel), _leading_int(rate)))
+        return ScanResult(entries)
+
+    @staticmethod
+    def scan_bssids() -> ScanResult:
         try:
-            output = subprocess.check_output(['nmcli', '-t', '-f', 'SSID,SIGNAL,SECURITY,FREQ', 'dev', 'wifi', 'list'])
-            networks = []
-            for line in output.decode().splitlines():
-                ssid, signal_strength, security, frequency = line.strip().split(':')
-                networks.append(NetworkInfo(ssid, int(signal_strength), security, frequency))
-            networks = list({n.ssid: n for n in networks}.values())
-            return sorted(networks, key=lambda x: x.signal_strength, reverse=True)
+            output = subprocess.check_output(['nmcli', '-t', '-f', NetworkScanner.SCAN_FIELDS, 'dev', 'wifi', 'list'])
+            return NetworkScanner.parse_scan_output(output.decode())
         except subprocess.CalledProcessError as e:
             logger.error(f'Failed to scan networks: {e}', exc_info=True)
             raise NetworkScanError('Failed to scan networks') from e
 
+    @staticmethod
+    def cached_scan() -> ScanResult:
+        # NetworkManager's last background scan; no radio time spent
+        try:
+            output = subprocess.check_output(['nmcli', '-t', '-f', NetworkScanner.SCAN_FIELDS, 'dev', 'wifi', 'list', '--rescan', 'no'])
+            return NetworkScanner.parse_scan_output(output.decode())
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.error(f'Failed to read cached scan: {e}', exc_info=True)
+            raise NetworkScanError('Failed to read cached scan') from e
+
+    @staticmethod
+    def scan_networks() -> List[NetworkInfo]:
+        return NetworkScanner.scan_bssids().networks()
+
+class ScanCache:
+    TTL_SECONDS = 15.0
+    _lock = threading.Lock()
+    _result: Optional[ScanResult] = None
+
+    @staticmethod
+    def get(max_age: float = TTL_SECONDS) -> ScanResult:
+        with ScanCache._lock:
+            result = ScanCache._result
+            if result is None or time.time() - result.timestamp > max_age:
+                result = NetworkScanner.scan_bssids()
+                ScanCache._result = result
+            return result
+
+    @staticmethod
+    def latest() -> Optional[ScanResult]:
+        return ScanCache._result
+
+    @staticmethod
+    def store(result: ScanResult) -> None:
+        with ScanCache._lock:
+            ScanCache._result = result
+
+    @staticmethod
+    def clear() -> None:
+        with ScanCache._lock:
+            ScanCache._result = None
+
 class ConfigManager:
     CONFIG_PATH = Path('/etc/pi-netconfig/config.json')
     _lock = threading.Lock()
@@ -102,3 +272,76 @@ class ConfigManager:
                     config = json.load(f)
                 return config['configured_ssid']
             return None
+
+class LinkProbe:
+    SYSFS_NET = Path('/sys/class/net')
+    PROC_ROUTE = Path('/proc/net/route')
+    RTF_UP = 0x1
+
+    @staticmethod
+    def wireless_interfaces() -> List[str]:
+        try:
+            return sorted(p.name for p in LinkProbe.SYSFS_NET.iterdir() if (p / 'wireless').is_dir())
+        except OSError:
+            return []
+
+    @staticmethod
+    def is_up(interface: str) -> bool:
+        try:
+            return (LinkProbe.SYSFS_NET / interface / 'operstate').read_text().strip() == 'up'
+        except OSError:
+            return False
+
+    @staticmethod
+    def default_route_interfaces() -> List[str]:
+        try:
+            lines = LinkProbe.PROC_ROUTE.read_text().splitlines()[1:]
+        except OSError:
+            return []
+        interfaces = []
+        for line in lines:
+            fields = line.split()
+            if (len(fields) >= 8 and fields[1] == '00000000' and fields[7] == '00000000'
+                    and int(fields[3], 16) & LinkProbe.RTF_UP):
+                interfaces.append(fields[0])
+        return interfaces
+
+    @staticmethod
+    def associated_ssid(interface: str) -> Optional[str]:
+        try:
+            output = subprocess.check_output(['iw', 'dev', interface, 'link'], timeout=2)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        for line in output.decode(errors='replace').splitlines():
+            line = line.strip()
+            if line.startswith('SSID: '):
+                return line[6:]
+        return None
+
+class BootProbe:
+    # Startup fast path: returns 'CLIENT', 'AP_MODE' or None when a regular check must decide
+    @staticmethod
+    def initial_state() -> Optional[str]:
+        try:
+            ssid = ConfigManager.load_configuration()
+        except (OSError, ValueError, KeyError):
+            ssid = None
+        routed = set(LinkProbe.default_route_interfaces())
+        if ssid:
+            for interface in LinkProbe.wireless_interfaces():
+                if interface in routed and LinkProbe.is_up(interface) and LinkProbe.associated_ssid(interface) == ssid:
+                    logger.info(f"Fast path: '{ssid}' associated on {interface} with default route")
+                    return 'CLIENT'
+        if routed:
+            return None
+        try:
+            scan = NetworkScanner.cached_scan()
+        except NetworkScanError:
+            return None
+        if not scan.entries:
+            return None
+        ScanCache.store(scan)
+        if ssid is None or ssid not in scan.summaries:
+            logger.info('Fast path: no route and no known network in cached scan')
+            return 'AP_MODE'
+        return None
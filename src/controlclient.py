@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+ControlClient Module - pi-netconfig-ctl
+
+Thin command-line client for the daemon's control socket. Imports only the
+standard library so it starts quickly on a Pi and works without loading the
+service modules.
+
+Usage:
+    pi-netconfig-ctl status
+    pi-netconfig-ctl history [limit]
+    pi-netconfig-ctl metrics
+    pi-netconfig-ctl check
+    pi-netconfig-ctl ap        (queues the switch; follow with status)
+    pi-netconfig-ctl scan
+
+Copyright (c) 2025 William Watson. Licensed under MIT License.
+"""
+
+import json
+import os
+import socket
+import sys
+from typing import Any, Dict, List, Optional
+
+# Keep in sync with controlsocket.CONTROL_SOCKET_PATH (not imported to stay light)
+CONTROL_SOCKET_PATH = '/run/pi-netconfig/control.sock'
+CLIENT_TIMEOUT_SECONDS = 30.0
+COMMANDS = ('status', 'history', 'metrics', 'check', 'ap', 'scan')
+
+
+class ControlClientError(Exception):
+    """Raised when the daemon cannot be reached or replies malformed data"""
+    pass
+
+
+def send_command(request: Dict[str, Any], path: str = CONTROL_SOCKET_PATH,
+                 timeout: float = CLIENT_TIMEOUT_SECONDS) -> Dict[str, Any]:
+    """
+    Send one request and return the decoded response
+
+    Args:
+        request: Request object with a "command" key
+        path: Control socket path
+        timeout: Seconds to wait for connect and reply
+
+    Returns:
+        Dict[str, Any]: Response object
+
+    Raises:
+        ControlClientError: If the socket is unreachable or the reply invalid
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            reply = sock.makefile('rb').readline()
+    except OSError as e:
+        raise ControlClientError(f"Cannot reach pi-netconfig at {path}: {e}")
+    try:
+        return json.loads(reply)
+    except ValueError:
+        raise ControlClientError("Malformed reply from pi-netconfig")
+
+
+def build_request(argv: List[str]) -> Optional[Dict[str, Any]]:
+    """Translate command-line arguments to a request, None if invalid"""
+    if not argv or argv[0] not in COMMANDS:
+        return None
+    request: Dict[str, Any] = {'command': argv[0]}
+    if argv[0] == 'history' and len(argv) > 1:
+        if not argv[1].isdigit():
+            return None
+        request['limit'] = int(argv[1])
+    return request
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run one control command and print the result as JSON
+
+    Args:
+        argv: Arguments after 'ctl' (defaults to sys.argv[1:])
+
+    Returns:
+        int: 0 on success, 1 on command or connection error, 2 on usage error
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    request = build_request(argv)
+    if request is None:
+        print(f"usage: pi-netconfig-ctl {{{','.join(COMMANDS)}}} [args]", file=sys.stderr)
+        return 2
+
+    path = os.environ.get('PI_NETCONFIG_CONTROL_SOCKET', CONTROL_SOCKET_PATH)
+    try:
+        response = send_command(request, path)
+    except ControlClientError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+
+    if not response.get('ok'):
+        print(f"ERROR: {response.get('error', 'unknown error')}", file=sys.stderr)
+        return 1
+    print(json.dumps(response.get('result'), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+ControlSocket Module - Runtime Control Interface
+
+Unix-domain control socket giving local tools access to the running daemon
+while the web portal is down (CLIENT mode). The protocol is line-delimited
+JSON: each request line is an object with a "command" key, each response
+line is {"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+
+Commands:
+    status   - current state, failure count, last check/transition times
+    history  - recent state transitions (reason, time in previous state, probe)
+    metrics  - check/transition counters, time per state, flaps, component metrics
+    check    - wake the monitoring loop for an immediate connection check
+    ap       - queue a forced AP_MODE (held for a period so the portal stays
+               up); replies at once with a request id, poll status for the result
+    scan     - run a Wi-Fi scan and return the visible networks
+
+Copyright (c) 2025 William Watson. Licensed under MIT License.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import traceback
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Configure module logger
+logger = logging.getLogger('ControlSocket')
+
+CONTROL_SOCKET_PATH = '/run/pi-netconfig/control.sock'
+MAX_LINE_BYTES = 4096
+CLIENT_IDLE_SECONDS = 30.0
+SCAN_TIMEOUT_SECONDS = 20.0
+
+
+class ControlSocketError(Exception):
+    """Base exception for control socket errors"""
+    pass
+
+
+class CommandError(ControlSocketError):
+    """Request could not be executed; message is returned to the client"""
+    pass
+
+
+class ControlServer:
+    """Serve line-delimited JSON commands against a StateMonitor"""
+
+    def __init__(self, state_monitor, path: str = CONTROL_SOCKET_PATH,
+                 metrics_sources: Optional[Dict[str, Callable[[], Dict[str, Any]]]] = None):
+        """
+        Initialize control server
+
+        Args:
+            state_monitor: StateMonitor instance queried and commanded
+            path: Filesystem path of the Unix socket
+            metrics_sources: Extra name -> callable returning a metrics dict
+        """
+        self.state_monitor = state_monitor
+        self.path = path
+        self.metrics_sources = dict(metrics_sources or {})
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.ap_task: Optional[asyncio.Task] = None
+        self.ap_request_id = 0
+        self.commands: Dict[str, Callable[[Dict[str, Any]], Awaitable[Any]]] = {
+            'status': self.cmd_status,
+            'history': self.cmd_history,
+            'metrics': self.cmd_metrics,
+            'check': self.cmd_check,
+            'ap': self.cmd_ap,
+            'scan': self.cmd_scan,
+        }
+
+    async def start(self) -> None:
+        """
+        Bind the Unix socket (owner-only permissions) and accept clients
+
+        Raises:
+            ControlSocketError: If the socket cannot be created
+        """
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, mode=0o755, exist_ok=True)
+            if os.path.exists(self.path):
+                os.unlink(self.path)  # stale socket from a previous run
+            self.server = await asyncio.start_unix_server(
+                self.handle_client, path=self.path, limit=MAX_LINE_BYTES
+            )
+            os.chmod(self.path, 0o600)
+            logger.info(f"Control socket listening on {self.path}")
+        except OSError as e:
+            logger.error(f"Failed to start control socket: {e}\n{traceback.format_exc()}")
+            raise ControlSocketError(f"Cannot bind control socket {self.path}: {e}")
+
+    async def stop(self) -> None:
+        """Stop accepting clients and remove the socket file"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            logger.info("Control socket stopped")
+
+    def is_running(self) -> bool:
+        """Return server status"""
+        return self.server is not None
+
+    async def handle_client(self, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> None:
+        """Answer requests on one connection until EOF or idle timeout"""
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), CLIENT_IDLE_SECONDS)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    break
+                except ValueError:
+                    # Line longer than MAX_LINE_BYTES; framing is lost
+                    writer.write(self.encode({'ok': False, 'error': 'request too long'}))
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                writer.write(self.encode(await self.dispatch(line)))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def encode(response: Dict[str, Any]) -> bytes:
+        """Serialize one response line"""
+        return json.dumps(response, separators=(',', ':')).encode('utf-8') + b'\n'
+
+    async def dispatch(self, line: bytes) -> Dict[str, Any]:
+        """
+        Parse and execute one request line
+
+        Args:
+            line: Raw request bytes including the newline
+
+        Returns:
+            Dict[str, Any]: Response object
+        """
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {'ok': False, 'error': 'invalid JSON'}
+        if not isinstance(request, dict) or not isinstance(request.get('command'), str):
+            return {'ok': False, 'error': 'request must be an object with a "command" string'}
+
+        name = request['command']
+        handler = self.commands.get(name)
+        if handler is None:
+            return {'ok': False, 'error': f"unknown command '{name}'",
+                    'commands': sorted(self.commands)}
+        try:
+            return {'ok': True, 'result': await handler(request)}
+        except CommandError as e:
+            return {'ok': False, 'error': str(e)}
+        except Exception as e:
+            logger.error(f"Control command '{name}' failed: {e}\n{traceback.format_exc()}")
+            return {'ok': False, 'error': f"{name} failed: {e}"}
+
+    async def cmd_status(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a freshly published state snapshot"""
+        return self.state_monitor.publish_status().to_dict()
+
+    async def cmd_history(self, request: Dict[str, Any]) -> list:
+        """Return recent transitions, newest last"""
+        limit = request.get('limit')
+        if not isinstance(limit, int) or limit <= 0:
+            limit = None
+        return [event.to_dict() for event in self.state_monitor.history.recent(limit)]
+
+    async def cmd_metrics(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Return state machine counters, transition statistics and component metrics"""
+        metrics: Dict[str, Any] = {'state_monitor': self.state_monitor.metrics()}
+        for name, source in self.metrics_sources.items():
+            try:
+                metrics[name] = source()
+            except Exception as e:
+                metrics[name] = {'error': str(e)}
+        return metrics
+
+    async def cmd_check(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Request an immediate connection check"""
+        self.state_monitor.request_check()
+        return {'requested': True}
+
+    async def cmd_ap(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue a forced AP_MODE transition and reply without waiting for it
+
+        The transition can outlast the client's timeout, so it runs as a
+        task; a request made while one is pending joins it.
+
+        Returns:
+            Dict[str, Any]: Request id and the status at the time of queuing
+        """
+        if self.ap_task is None or self.ap_task.done():
+            self.ap_request_id += 1
+            self.ap_task = asyncio.create_task(self.force_ap(self.ap_request_id))
+        return {'request_id': self.ap_request_id, 'queued': True,
+                'status': self.state_monitor.status()}
+
+    async def force_ap(self, request_id: int) -> None:
+        """Run one queued AP_MODE request, logging its outcome"""
+        try:
+            await self.state_monitor.force_ap_mode()
+            logger.info(f"AP request {request_id} completed")
+        except Exception as e:
+            logger.error(f"AP request {request_id} failed: {e}\n{traceback.format_exc()}")
+
+    async def cmd_scan(self, request: Dict[str, Any]) -> list:
+        """Scan in a worker thread and return networks, strongest first"""
+        from connectionmanager import ScanCache, NetworkScanError
+
+        loop = asyncio.get_running_loop()
+        try:
+            # max_age=0 forces a fresh scan and refreshes the shared cache
+            result = await asyncio.wait_for(
+                loop.run_in_executor(None, ScanCache.get, 0.0),
+                SCAN_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            raise CommandError("scan timed out")
+        except NetworkScanError as e:
+            raise CommandError(f"scan failed: {e}")
+        networks = sorted(result.networks(), key=lambda n: n.signal_strength, reverse=True)
+        return [
+            {'ssid': n.ssid, 'signal': n.signal_strength, 'security': n.security,
+             'bands': list(n.bands)}
+            for n in networks
+        ]
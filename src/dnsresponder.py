@@ -0,0 +1,181 @@
+"""
+DNSResponder Module - Captive Portal DNS
+
+Answers every DNS A query with the access point address while in AP mode so
+client OS captive-portal detection opens the configuration page without the
+user typing 192.168.50.1:8080.
+
+The hot path only inspects the 12-byte header and the question section and
+assembles the reply in a preallocated buffer from a precomputed answer
+template; no message objects are built per query.
+
+NetworkManager's shared-mode dnsmasq also listens on port 53 of the AP
+address. The installer's drop-in in /etc/NetworkManager/dnsmasq-shared.d/
+disables DNS there (port=0) and hands DHCP clients the AP address as
+resolver (dhcp-option=6). Without it this responder cannot bind; the
+failure is logged as an error and AP mode continues without it.
+
+Copyright (c) 2025 William Watson. Licensed under MIT License.
+"""
+
+import asyncio
+import logging
+import socket
+import traceback
+from typing import Optional, Tuple
+
+# Configure module logger
+logger = logging.getLogger('DNSResponder')
+
+DNS_PORT = 53
+DNS_TTL = 10
+HEADER_SIZE = 12
+MAX_MESSAGE = 512
+QTYPE_A = 1
+QTYPE_ANY = 255
+
+
+class DNSResponderError(Exception):
+    """Base exception for DNS responder errors"""
+    pass
+
+
+def build_answer_template(address: str, ttl: int = DNS_TTL) -> bytes:
+    """
+    Build the fixed answer record pointing back at the question name
+
+    Args:
+        address: IPv4 address returned for every A query
+        ttl: Record TTL in seconds
+
+    Returns:
+        bytes: 16-byte resource record (name pointer, A, IN, TTL, RDATA)
+    """
+    return (b'\xc0\x0c'                       # pointer to question name at offset 12
+            + QTYPE_A.to_bytes(2, 'big')
+            + b'\x00\x01'                     # class IN
+            + ttl.to_bytes(4, 'big')
+            + b'\x00\x04'
+            + socket.inet_aton(address))
+
+
+class DNSResponderProtocol(asyncio.DatagramProtocol):
+    """Answer A queries with a fixed address from a precomputed template"""
+
+    def __init__(self, address: str, ttl: int = DNS_TTL):
+        """Precompute answer record and response buffer"""
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self._answer = build_answer_template(address, ttl)
+        self._buffer = bytearray(MAX_MESSAGE + len(self._answer))
+        self._buffer[5] = 1                   # QDCOUNT = 1
+        self._view = memoryview(self._buffer)
+        self.queries = 0
+        self.answered = 0
+        self.dropped = 0
+
+    def connection_made(self, transport) -> None:
+        """Keep transport for replies"""
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        """Parse header and question, reply from template"""
+        self.queries += 1
+        length = len(data)
+        # Need header + root label + QTYPE/QCLASS; reject responses and non-QUERY opcodes
+        if length < HEADER_SIZE + 5 or length > MAX_MESSAGE or data[2] & 0xF8:
+            self.dropped += 1
+            return
+        if data[4] or data[5] != 1:
+            self.dropped += 1
+            return
+
+        pos = HEADER_SIZE
+        while True:
+            if pos >= length:
+                self.dropped += 1
+                return
+            label = data[pos]
+            if label == 0:
+                break
+            if label & 0xC0:
+                self.dropped += 1
+                return
+            pos += label + 1
+        question_end = pos + 5
+        if question_end > length:
+            self.dropped += 1
+            return
+        qtype = (data[pos + 1] << 8) | data[pos + 2]
+
+        buf = self._buffer
+        buf[0] = data[0]
+        buf[1] = data[1]
+        buf[2] = 0x84 | (data[2] & 0x01)      # QR, AA, copy RD
+        buf[3] = 0x80                         # RA, NOERROR
+        buf[HEADER_SIZE:question_end] = data[HEADER_SIZE:question_end]
+        if qtype == QTYPE_A or qtype == QTYPE_ANY:
+            buf[7] = 1
+            end = question_end + len(self._answer)
+            buf[question_end:end] = self._answer
+            self.answered += 1
+        else:
+            # NODATA so clients fall back to the A record
+            buf[7] = 0
+            end = question_end
+        self.transport.sendto(self._view[:end], addr)
+
+    def error_received(self, exc: Exception) -> None:
+        """Log socket errors without stopping the responder"""
+        logger.debug(f"DNS socket error: {exc}")
+
+
+class DNSResponder:
+    """Manage captive-portal DNS responder lifecycle"""
+
+    def __init__(self, address: str = '192.168.50.1', port: int = DNS_PORT,
+                 bind_address: Optional[str] = None):
+        """Initialize responder answering with address on port"""
+        self.address = address
+        self.port = port
+        self.bind_address = bind_address or address
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.protocol: Optional[DNSResponderProtocol] = None
+
+    async def start(self) -> None:
+        """
+        Bind UDP socket and start answering queries
+
+        Raises:
+            DNSResponderError: If the socket cannot be bound
+        """
+        if self.is_running():
+            logger.warning("DNS responder already running")
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+            self.transport, self.protocol = await loop.create_datagram_endpoint(
+                lambda: DNSResponderProtocol(self.address),
+                local_addr=(self.bind_address, self.port)
+            )
+            logger.info(f"DNS responder started on {self.bind_address}:{self.local_port()}")
+        except OSError as e:
+            logger.error(f"Failed to start DNS responder on port {self.port}: {e}\n{traceback.format_exc()}")
+            raise DNSResponderError(f"Port {self.port} is unavailable: {e}")
+
+    async def stop(self) -> None:
+        """Close UDP socket"""
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+            logger.info("DNS responder stopped")
+
+    def is_running(self) -> bool:
+        """Return responder status"""
+        return self.transport is not None and not self.transport.is_closing()
+
+    def local_port(self) -> int:
+        """Return bound port (useful when started on port 0)"""
+        if self.transport is None:
+            return self.port
+        return self.transport.get_extra_info('sockname')[1]
@@ -11,16 +11,96 @@ Traceability: workspace/trace/trace-0001-requirements-traceability-matrix.md
 Copyright (c) 2025 William Watson. Licensed under the MIT License.
 """
 
+import argparse
+import hashlib
+import io
+import json
 import os
+import py_compile
 import shutil
 import subprocess
 import sys
+import tempfile
+import time
+import uuid
+import zipfile
+from dataclasses import dataclass
 from logging import getLogger
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterable, List, Optional, Tuple
 
 logger = getLogger('Installer')
 
+APP_DIR = '/usr/local/bin/pi-netconfig'
+RELEASES_DIR = f'{APP_DIR}/releases'
+CURRENT_LINK = f'{APP_DIR}/current'
+ZIPAPP_NAME = 'pi-netconfig.pyz'
+ZIPAPP_PATH = f'{CURRENT_LINK}/{ZIPAPP_NAME}'
+# Command-line entry point for the control client (APP_DIR is a directory)
+CTL_WRAPPER_PATH = '/usr/local/bin/pi-netconfig-ctl'
+CONFIG_DIR = '/etc/pi-netconfig'
+LOG_DIR = '/var/log'
+UNIT_DIR = '/etc/systemd/system'
+SERVICE_UNIT = 'pi-netconfig.service'
+SOCKET_UNIT = 'pi-netconfig.socket'
+WANTED_BY = {SERVICE_UNIT: 'multi-user.target', SOCKET_UNIT: 'sockets.target'}
+
+# Offline image provisioning (NetworkManager keyfiles)
+NM_CONNECTIONS_DIR = '/etc/NetworkManager/system-connections'
+# Keep in sync with apmanager.PROVISIONED_AP_KEYFILE
+PROVISIONED_AP_KEYFILE = f'{NM_CONNECTIONS_DIR}/pi-netconfig-ap-provisioned.nmconnection'
+AP_PROFILE_NAME = 'pi-netconfig-ap'
+AP_ADDRESS = '192.168.50.1/24'
+AP_DEFAULT_PSK = 'piconfig123'
+# OS captive-portal probes (and DNS-hijacked browsing) arrive on port 80;
+# a dispatcher script redirects them to the portal while the AP is up
+NM_DISPATCHER_DIR = '/etc/NetworkManager/dispatcher.d'
+PORTAL_REDIRECT_SCRIPT = f'{NM_DISPATCHER_DIR}/90-pi-netconfig-portal'
+# Keep in sync with components.PORTAL_PORT
+PORTAL_PORT = 8080
+# Shared-mode dnsmasq leaves port 53 to the captive DNS responder and tells
+# DHCP clients to use it
+DNSMASQ_SHARED_DIR = '/etc/NetworkManager/dnsmasq-shared.d'
+DNSMASQ_DROPIN = f'{DNSMASQ_SHARED_DIR}/pi-netconfig.conf'
+CONFIG_PATH = f'{CONFIG_DIR}/config.json'
+SSID_FORBIDDEN = set(';,&|$`\\\'"/')
+
+# Modules packed into the zipapp (everything the service can import)
+APP_MODULES = (
+    'main', 'installer', 'components', 'connectionmanager', 'statemonitor',
+    'apmanager', 'webserver', 'dnsresponder', 'logpipeline', 'controlsocket',
+    'controlclient',
+)
+
+# -OO level: asserts and docstrings stripped from the packed bytecode
+BYTECODE_OPTIMIZE = 2
+
+# Fixed entry timestamp so identical sources give a byte-identical archive
+ARCHIVE_TIMESTAMP = (1980, 1, 1, 0, 0, 0)
+
+# Releases kept besides the current one for instant rollback
+RELEASES_KEPT = 2
+
+# Seconds the new release has to report ready (READY=1) before it is reverted
+HEALTH_TIMEOUT_SECONDS = 120.0
+HEALTH_POLL_SECONDS = 1.0
+
+# Archive entry point; 'ctl' dispatches before the service stack is imported
+ZIPAPP_MAIN = """import os
+import sys
+
+# Pin imports to the resolved release so a later 'current' swap cannot
+# change modules under this running process
+sys.path[0] = os.path.realpath(sys.path[0])
+
+if sys.argv[1:2] == ['ctl']:
+    from controlclient import main as ctl_main
+    sys.exit(ctl_main(sys.argv[2:]))
+
+from main import main
+sys.exit(main())
+"""
+
 
 class InstallerError(Exception):
     """Base exception for installer operations."""
@@ -52,7 +132,7 @@ class InstallationDetector:
         Returns:
             bool: True if service file exists, False otherwise.
         """
-        service_path = Path('/etc/systemd/system/pi-netconfig.service')
+        service_path = Path(f'{UNIT_DIR}/{SERVICE_UNIT}')
         exists = service_path.exists()
         logger.debug(f"Service file exists check: {exists}")
         return exists
@@ -69,8 +149,421 @@ class InstallationDetector:
         return script_path
 
 
+@dataclass
+class PlannedFile:
+    """File an InstallPlan puts in place."""
+    path: str
+    content: bytes
+    mode: int = 0o644
+    unit: bool = False  # systemd unit; a change requires daemon-reload
+    
+    @property
+    def digest(self) -> str:
+        """SHA-256 of the planned content."""
+        return hashlib.sha256(self.content).hexdigest()
+
+
+@dataclass
+class PreImage:
+    """State of a file or symlink before the plan replaced it.
+    
+    content (files) or link (symlinks) is None if the path did not exist.
+    """
+    path: Path
+    content: Optional[bytes] = None
+    mode: int = 0o644
+    is_link: bool = False
+    link: Optional[str] = None
+    
+    @property
+    def existed(self) -> bool:
+        """True if the plan replaced something rather than creating it."""
+        return (self.link if self.is_link else self.content) is not None
+
+
+class InstallPlan:
+    """Content-hashed install steps applied under a root prefix.
+    
+    Files whose on-disk SHA-256 and mode already match (and symlinks
+    already pointing at their target) are skipped, so re-running an
+    install with unchanged sources changes nothing and runs no systemctl
+    commands. Every replaced path is recorded as a pre-image first, and
+    rollback() restores exactly those. After starting units, apply()
+    waits for the restarted unit to become active and fails if it does
+    not within health_timeout, so the caller can roll back.
+    """
+    
+    def __init__(self, root: str = '/', systemctl: str = 'systemctl',
+                 health_timeout: float = HEALTH_TIMEOUT_SECONDS,
+                 health_poll: float = HEALTH_POLL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """Initialize an empty plan.
+        
+        Args:
+            root: Filesystem prefix all planned paths are resolved under.
+            systemctl: systemctl executable (a fake one in tests).
+            health_timeout: Seconds to wait for the unit to become active
+                (0 disables the health gate).
+            health_poll: Seconds between activity checks.
+            clock: Monotonic time source.
+            sleep: Sleep function used between checks.
+        """
+        self.root = Path(root)
+        self.systemctl = systemctl
+        self.health_timeout = health_timeout
+        self.health_poll = health_poll
+        self.clock = clock
+        self.sleep = sleep
+        self.directories: List[Tuple[str, int]] = []
+        self.files: List[PlannedFile] = []
+        self.links: List[Tuple[str, str]] = []
+        self.units: List[str] = []
+        self.restart_unit: Optional[str] = None
+        self.pre_images: List[PreImage] = []
+        self.created_directories: List[Path] = []
+        self.commands_run: List[List[str]] = []
+    
+    def resolve(self, path: str) -> Path:
+        """Map an absolute target path under the root prefix."""
+        return self.root / path.lstrip('/')
+    
+    def add_directory(self, path: str, mode: int = 0o755) -> None:
+        """Create directory if missing."""
+        self.directories.append((path, mode))
+    
+    def add_file(self, path: str, content: bytes, mode: int = 0o644,
+                 unit: bool = False) -> None:
+        """Install file content (unit=True for systemd unit files)."""
+        self.files.append(PlannedFile(path, content, mode, unit))
+    
+    def add_symlink(self, path: str, target: str) -> None:
+        """Point symlink path at target (switched atomically after all files)."""
+        self.links.append((path, target))
+    
+    def enable(self, units: Iterable[str], restart: Optional[str] = None) -> None:
+        """Enable and start units; restart one of them when upgrading."""
+        self.units = list(units)
+        self.restart_unit = restart
+    
+    @staticmethod
+    def file_digest(path: Path) -> Optional[str]:
+        """SHA-256 of a file on disk, None if it does not exist."""
+        digest = hashlib.sha256()
+        try:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(65536), b''):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            return None
+        return digest.hexdigest()
+    
+    def changed_files(self) -> List[PlannedFile]:
+        """Planned files whose content or mode differs from disk."""
+        changed = []
+        for planned in self.files:
+            target = self.resolve(planned.path)
+            if (self.file_digest(target) != planned.digest
+                    or (target.stat().st_mode & 0o7777) != planned.mode):
+                changed.append(planned)
+        return changed
+    
+    def changed_links(self) -> List[Tuple[str, str]]:
+        """Planned symlinks missing or pointing elsewhere."""
+        changed = []
+        for path, target in self.links:
+            try:
+                current = os.readlink(self.resolve(path))
+            except OSError:
+                current = None
+            if current != target:
+                changed.append((path, target))
+        return changed
+    
+    def systemctl_commands(self, changed: List[PlannedFile], links_changed: bool,
+                           upgrade: bool) -> List[List[str]]:
+        """Merged systemctl invocations needed for the changed steps."""
+        if not (changed or links_changed) or not self.units:
+            return []
+        commands = []
+        if any(planned.unit for planned in changed):
+            commands.append([self.systemctl, 'daemon-reload'])
+        # --no-block: readiness is judged by the health gate's deadline
+        commands.append([self.systemctl, 'enable', '--now', '--no-block', *self.units])
+        if upgrade and self.restart_unit:
+            # enable --now leaves an already running service on the old version
+            commands.append([self.systemctl, 'restart', '--no-block', self.restart_unit])
+        return commands
+    
+    def apply(self) -> List[str]:
+        """Apply changed steps.
+        
+        Returns:
+            List[str]: Paths written or relinked (empty if already up to date).
+            
+        Raises:
+            FileSystemError: If a directory, file or symlink cannot be written.
+            SystemdError: If a systemctl command fails or the restarted unit
+                does not become active within health_timeout.
+        """
+        changed = self.changed_files()
+        links = self.changed_links()
+        upgrade = (any(self.resolve(planned.path).exists() for planned in changed)
+                   or any(os.path.lexists(self.resolve(path)) for path, _ in links))
+        for path, mode in self.directories:
+            self.make_directory(self.resolve(path), mode)
+        for planned in changed:
+            self.write_file(planned)
+        for path, target in links:
+            self.write_link(path, target)
+        commands = self.systemctl_commands(changed, bool(links), upgrade)
+        gated = bool(commands and self.restart_unit and self.health_timeout > 0)
+        # Identify the running instance so the gate cannot pass on it
+        previous = self.invocation_id(self.restart_unit) if gated else None
+        for command in commands:
+            self.run(command)
+        if gated:
+            self.wait_until_active(self.restart_unit, previous)
+        
+        applied = [planned.path for planned in changed] + [path for path, _ in links]
+        logger.info(f"Install plan applied: {len(applied)} of "
+                    f"{len(self.files) + len(self.links)} paths changed")
+        return applied
+    
+    def invocation_id(self, unit: str) -> str:
+        """Return the unit's current InvocationID ('' if never started)."""
+        try:
+            result = subprocess.run(
+                [self.systemctl, 'show', '--property=InvocationID', '--value', unit],
+                capture_output=True, text=True
+            )
+        except OSError:
+            return ''
+        return result.stdout.strip() if result.returncode == 0 else ''
+    
+    def wait_until_active(self, unit: str, previous: Optional[str] = None) -> None:
+        """Poll until unit is active (Type=notify: READY=1 was sent).
+        
+        With --no-block the old instance can still be active when polling
+        starts, so when previous is given the unit only counts as ready once
+        a new invocation (a different InvocationID) is active.
+        
+        Args:
+            unit: Unit to wait for.
+            previous: InvocationID recorded before starting/restarting.
+        
+        Raises:
+            SystemdError: If the unit is not active within health_timeout.
+        """
+        deadline = self.clock() + self.health_timeout
+        while True:
+            result = subprocess.run([self.systemctl, 'is-active', '--quiet', unit],
+                                    capture_output=True)
+            if result.returncode == 0 and (
+                    previous is None or self.invocation_id(unit) not in ('', previous)):
+                logger.info(f"{unit} reported ready")
+                return
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                raise SystemdError(f"{unit} not ready within {self.health_timeout:g}s")
+            self.sleep(min(self.health_poll, remaining))
+    
+    def make_directory(self, path: Path, mode: int) -> None:
+        """Create path and missing parents, recording what was created."""
+        missing = []
+        current = path
+        while not current.exists():
+            missing.append(current)
+            current = current.parent
+        try:
+            for directory in reversed(missing):
+                directory.mkdir(mode=mode)
+                os.chmod(directory, mode)
+                self.created_directories.append(directory)
+                logger.debug(f"Created directory {directory}")
+        except OSError as e:
+            raise FileSystemError(f"Failed to create directory {path}: {e}")
+    
+    def write_file(self, planned: PlannedFile) -> None:
+        """Record the pre-image, then atomically replace the file."""
+        target = self.resolve(planned.path)
+        try:
+            try:
+                self.pre_images.append(PreImage(target, target.read_bytes(),
+                                                target.stat().st_mode & 0o7777))
+            except FileNotFoundError:
+                self.pre_images.append(PreImage(target, None))
+            self.replace(target, planned.content, planned.mode)
+            logger.debug(f"Wrote {target} ({planned.digest[:12]})")
+        except OSError as e:
+            raise FileSystemError(f"Failed to write {target}: {e}")
+    
+    def write_link(self, path: str, target: str) -> None:
+        """Record the pre-image, then atomically switch the symlink."""
+        link = self.resolve(path)
+        try:
+            try:
+                previous = os.readlink(link)
+            except FileNotFoundError:
+                previous = None
+            self.pre_images.append(PreImage(link, is_link=True, link=previous))
+            self.relink(link, target)
+            logger.debug(f"Linked {link} -> {target}")
+        except OSError as e:
+            raise FileSystemError(f"Failed to link {link}: {e}")
+    
+    @staticmethod
+    def relink(link: Path, target: str) -> None:
+        """Create a symlink beside link and rename it over link."""
+        partial = link.parent / f'.{link.name}.{os.getpid()}'
+        try:
+            os.unlink(partial)
+        except FileNotFoundError:
+            pass
+        os.symlink(target, partial)
+        os.replace(partial, link)
+    
+    @staticmethod
+    def replace(target: Path, content: bytes, mode: int) -> None:
+        """Write content beside target and rename it into place."""
+        fd, partial = tempfile.mkstemp(dir=target.parent, prefix=f'.{target.name}.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fchmod(f.fileno(), mode)
+                os.fsync(f.fileno())
+            os.replace(partial, target)
+        except BaseException:
+            try:
+                os.unlink(partial)
+            except FileNotFoundError:
+                pass
+            raise
+    
+    def run(self, command: List[str]) -> None:
+        """Run one systemctl command.
+        
+        Raises:
+            SystemdError: If the command fails or cannot be executed.
+        """
+        logger.debug(f"Executing: {' '.join(command)}")
+        self.commands_run.append(command)
+        try:
+            subprocess.run(command, capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"{' '.join(command)} failed: {e.stderr}")
+            raise SystemdError(f"{' '.join(command[1:])} failed: {e.stderr}")
+        except OSError as e:
+            raise SystemdError(f"Cannot run {command[0]}: {e}")
+    
+    def rollback(self) -> None:
+        """Restore recorded pre-images and remove created directories.
+        
+        Best-effort: failures are logged, never raised. A fresh install's
+        units are disabled; an upgrade's previous version is restarted.
+        """
+        logger.warning("Rollback initiated")
+        fresh = not any(image.existed for image in self.pre_images)
+        started = any(command[1:2] == ['enable'] for command in self.commands_run)
+        if started and fresh:
+            self.run_quietly([self.systemctl, 'disable', '--now', *self.units])
+        
+        for image in reversed(self.pre_images):
+            try:
+                if not image.existed:
+                    image.path.unlink()
+                elif image.is_link:
+                    self.relink(image.path, image.link)
+                else:
+                    self.replace(image.path, image.content, image.mode)
+                logger.debug(f"Restored {image.path}")
+            except OSError as e:
+                logger.warning(f"Rollback failed for {image.path}: {e}")
+        for directory in reversed(self.created_directories):
+            try:
+                directory.rmdir()
+            except OSError as e:
+                logger.warning(f"Rollback left directory {directory}: {e}")
+        
+        if any(command[1:2] == ['daemon-reload'] for command in self.commands_run):
+            self.run_quietly([self.systemctl, 'daemon-reload'])
+        if started and not fresh and self.restart_unit:
+            self.run_quietly([self.systemctl, 'restart', self.restart_unit])
+        self.pre_images.clear()
+        self.created_directories.clear()
+    
+    def run_quietly(self, command: List[str]) -> None:
+        """Run a rollback command, logging failures."""
+        try:
+            self.run(command)
+        except SystemdError as e:
+            logger.warning(f"Rollback command failed: {e}")
+
+
+class ReleaseStore:
+    """Versioned release directories and the 'current' symlink selecting one.
+    
+    Release ids are archive content hashes, so reinstalling a kept version
+    only switches the symlink back.
+    """
+    
+    def __init__(self, root: str = '/'):
+        """Initialize store under root prefix."""
+        self.root = Path(root)
+    
+    @staticmethod
+    def release_id(archive: bytes) -> str:
+        """Short content hash naming the release directory."""
+        return hashlib.sha256(archive).hexdigest()[:12]
+    
+    def releases_dir(self) -> Path:
+        """Directory holding all releases."""
+        return self.root / RELEASES_DIR.lstrip('/')
+    
+    def current(self) -> Optional[str]:
+        """Id of the release 'current' points at, None if not installed."""
+        try:
+            return Path(os.readlink(self.root / CURRENT_LINK.lstrip('/'))).name
+        except OSError:
+            return None
+    
+    def releases(self) -> List[str]:
+        """Installed release ids, most recently activated first."""
+        try:
+            entries = [entry for entry in os.scandir(self.releases_dir()) if entry.is_dir()]
+        except FileNotFoundError:
+            return []
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        return [entry.name for entry in entries]
+    
+    def mark_current(self) -> None:
+        """Touch the current release so it sorts as most recently activated."""
+        current = self.current()
+        if current is not None:
+            os.utime(self.releases_dir() / current)
+    
+    def prune(self, keep: int = RELEASES_KEPT) -> List[str]:
+        """Delete all but the current release and the keep most recent others.
+        
+        Returns:
+            List[str]: Removed release ids.
+        """
+        current = self.current()
+        previous = [release for release in self.releases() if release != current]
+        removed = []
+        for release in previous[keep:]:
+            try:
+                shutil.rmtree(self.releases_dir() / release)
+                removed.append(release)
+                logger.info(f"Pruned release {release}")
+            except OSError as e:
+                logger.warning(f"Failed to prune release {release}: {e}")
+        return removed
+
+
 class SystemdInstaller:
-    """Perform installation steps and systemd configuration."""
+    """Build the application archive, unit files and install plan."""
     
     @staticmethod
     def verify_root_privileges() -> bool:
@@ -90,68 +583,107 @@ class SystemdInstaller:
         return True
     
     @staticmethod
-    def create_directories() -> None:
-        """Create required installation directories.
+    def archive_bytes(source_dir: Path, interpreter: Optional[str] = None) -> bytes:
+        """Pack application modules and precompiled bytecode into a zipapp.
+        
+        Each module is stored as source plus a sourceless-layout .pyc
+        (unchecked-hash, optimization level BYTECODE_OPTIMIZE) that zipimport
+        loads without compiling. Sources stay in the archive for tracebacks
+        and as a fallback if the target interpreter's bytecode magic differs.
+        Entries are sorted and timestamped identically, so the same sources
+        always produce the same bytes.
         
-        Creates:
-            - /usr/local/bin/pi-netconfig/
-            - /etc/pi-netconfig/
-            - /var/log/
+        Args:
+            source_dir: Directory containing the application modules.
+            interpreter: Shebang interpreter, None for no shebang.
+            
+        Returns:
+            bytes: Archive content.
             
         Raises:
-            FileSystemError: If directory creation fails.
+            FileSystemError: If a module is missing or fails to compile.
         """
-        directories = [
-            '/usr/local/bin/pi-netconfig',
-            '/etc/pi-netconfig',
-            '/var/log'
-        ]
+        entries = {'__main__.py': ZIPAPP_MAIN.encode('utf-8')}
+        try:
+            with tempfile.TemporaryDirectory() as staging:
+                for name in APP_MODULES:
+                    source = Path(source_dir) / f'{name}.py'
+                    cfile = Path(staging) / f'{name}.pyc'
+                    py_compile.compile(
+                        str(source), cfile=str(cfile), dfile=source.name, doraise=True,
+                        optimize=BYTECODE_OPTIMIZE,
+                        invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH
+                    )
+                    entries[source.name] = source.read_bytes()
+                    entries[cfile.name] = cfile.read_bytes()
+        except (OSError, py_compile.PyCompileError) as e:
+            logger.error(f"Failed to build application archive: {e}", exc_info=True)
+            raise FileSystemError(f"Failed to build application archive: {e}")
         
-        for dir_path in directories:
-            try:
-                logger.debug(f"Creating directory: {dir_path}")
-                Path(dir_path).mkdir(parents=True, exist_ok=True)
-                os.chmod(dir_path, 0o755)
-                logger.debug(f"Directory created with 755 permissions: {dir_path}")
-            except Exception as e:
-                logger.error(f"Failed to create directory {dir_path}: {e}", exc_info=True)
-                raise FileSystemError(f"Failed to create directory {dir_path}: {e}")
+        buffer = io.BytesIO()
+        if interpreter:
+            buffer.write(b'#!' + interpreter.encode(sys.getfilesystemencoding()) + b'\n')
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as zf:
+            for name in sorted(entries):
+                info = zipfile.ZipInfo(name, date_time=ARCHIVE_TIMESTAMP)
+                info.external_attr = 0o644 << 16
+                zf.writestr(info, entries[name])
+        return buffer.getvalue()
     
     @staticmethod
-    def copy_application(script_path: Path) -> None:
-        """Copy application script to installation location.
+    def build_zipapp(source_dir: Path, target: Path,
+                     interpreter: Optional[str] = None) -> Path:
+        """Write the application archive to target atomically.
         
         Args:
-            script_path: Path to source script file.
+            source_dir: Directory containing the application modules.
+            target: Archive path to create or replace.
+            interpreter: Shebang interpreter, None for no shebang.
+            
+        Returns:
+            Path: The archive path.
             
         Raises:
-            FileSystemError: If copy operation fails.
+            FileSystemError: If the archive cannot be built or written.
         """
-        dest_path = '/usr/local/bin/pi-netconfig/main.py'
+        target = Path(target)
+        content = SystemdInstaller.archive_bytes(source_dir, interpreter)
         try:
-            logger.debug(f"Copying {script_path} to {dest_path}")
-            shutil.copy2(script_path, dest_path)
-            os.chmod(dest_path, 0o755)
-            logger.info(f"Application copied to {dest_path}")
-        except Exception as e:
-            logger.error(f"Failed to copy application: {e}", exc_info=True)
-            raise FileSystemError(f"Failed to copy application: {e}")
+            InstallPlan.replace(target, content, 0o755)
+        except OSError as e:
+            raise FileSystemError(f"Failed to write {target}: {e}")
+        logger.debug(f"Built {target} from {source_dir}")
+        return target
     
     @staticmethod
-    def generate_systemd_unit() -> str:
+    def generate_systemd_unit(socket_activation: bool = False) -> str:
         """Generate systemd unit file content.
         
+        Args:
+            socket_activation: Require pi-netconfig.socket so the portal
+                listener is inherited via LISTEN_FDS instead of bound.
+        
         Returns:
             str: Complete systemd unit file content.
         """
-        unit_content = """[Unit]
+        socket_dependency = (
+            "Requires=pi-netconfig.socket\nAfter=pi-netconfig.socket\n"
+            if socket_activation else ""
+        )
+        unit_content = f"""[Unit]
 Description=Pi Network Configuration Service
 After=network.target
 Wants=network.target
-
+{socket_dependency}
 [Service]
-Type=simple
-ExecStart=/usr/bin/python3 /usr/local/bin/pi-netconfig/main.py
+Type=notify
+NotifyAccess=main
+ExecStart=/usr/bin/python3 {ZIPAPP_PATH}
+RuntimeDirectory=pi-netconfig
+RuntimeDirectoryMode=0755
+RuntimeDirectoryPreserve=restart
+TimeoutStartSec=90
+WatchdogSec=60
 Restart=on-failure
 RestartSec=10
 StandardOutput=journal
@@ -165,121 +697,398 @@ WantedBy=multi-user.target
         return unit_content
     
     @staticmethod
-    def install_systemd_unit(unit_content: str) -> None:
-        """Write unit file and reload systemd daemon.
+    def generate_systemd_socket_unit(port: int = 8080) -> str:
+        """Generate systemd socket unit content for the portal listener.
+        
+        systemd binds the port before the service starts and keeps it open
+        across service restarts, queueing connections meanwhile.
         
         Args:
-            unit_content: Systemd unit file content.
+            port: TCP port for the configuration portal.
             
-        Raises:
-            SystemdError: If unit file write or daemon-reload fails.
+        Returns:
+            str: Complete systemd socket unit file content.
         """
-        unit_path = '/etc/systemd/system/pi-netconfig.service'
-        try:
-            logger.debug(f"Writing systemd unit file to {unit_path}")
-            with open(unit_path, 'w') as f:
-                f.write(unit_content)
-            logger.info(f"Systemd unit file written to {unit_path}")
-            
-            logger.debug("Executing: systemctl daemon-reload")
-            result = subprocess.run(
-                ['systemctl', 'daemon-reload'],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            logger.debug("systemctl daemon-reload completed")
-        except subprocess.CalledProcessError as e:
-            logger.error(f"systemctl daemon-reload failed: {e.stderr}", exc_info=True)
-            raise SystemdError(f"systemctl daemon-reload failed: {e.stderr}")
-        except Exception as e:
-            logger.error(f"Failed to install systemd unit: {e}", exc_info=True)
-            raise SystemdError(f"Failed to install systemd unit: {e}")
+        socket_content = f"""[Unit]
+Description=Pi Network Configuration Portal Socket
+
+[Socket]
+ListenStream={port}
+FileDescriptorName=pi-netconfig-http
+NoDelay=true
+Backlog=64
+
+[Install]
+WantedBy=sockets.target
+"""
+        logger.debug("Generated systemd socket unit content")
+        return socket_content
     
     @staticmethod
-    def enable_and_start_service() -> None:
-        """Enable and start systemd service.
+    def generate_ctl_wrapper() -> str:
+        """Generate the pi-netconfig-ctl wrapper script.
         
-        Raises:
-            SystemdError: If enable or start commands fail.
+        Runs the control client from the current release, so the command
+        keeps working across upgrades.
+        
+        Returns:
+            str: Complete wrapper script content.
         """
-        try:
-            logger.debug("Executing: systemctl enable pi-netconfig")
-            subprocess.run(
-                ['systemctl', 'enable', 'pi-netconfig'],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            logger.info("Service enabled")
+        return f'#!/bin/sh\nexec /usr/bin/python3 {ZIPAPP_PATH} ctl "$@"\n'
+    
+    @staticmethod
+    def generate_dnsmasq_dropin() -> str:
+        """Generate the dnsmasq drop-in for NetworkManager's shared mode.
+        
+        port=0 turns off dnsmasq's DNS server so the captive DNS responder
+        can bind port 53 on the AP address; DHCP option 6 hands clients
+        that address as their resolver, since dnsmasq no longer advertises
+        itself.
+        
+        Returns:
+            str: Complete dnsmasq configuration content.
+        """
+        address = AP_ADDRESS.split('/')[0]
+        return (
+            "# Installed by pi-netconfig: DNS is answered by the service in AP mode\n"
+            "port=0\n"
+            f"dhcp-option=6,{address}\n"
+        )
+    
+    @staticmethod
+    def generate_portal_redirect_script(port: int = PORTAL_PORT) -> str:
+        """Generate the NetworkManager dispatcher script for the AP profile.
+        
+        While the AP connection is up, TCP port 80 on its interface is
+        redirected to the portal so OS connectivity checks (generate_204,
+        hotspot-detect.html, ncsi.txt) reach it; the rule is removed when
+        the AP goes down.
+        
+        Args:
+            port: TCP port the portal listens on.
             
-            logger.debug("Executing: systemctl start pi-netconfig")
-            subprocess.run(
-                ['systemctl', 'start', 'pi-netconfig'],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            logger.info("Service started")
-        except subprocess.CalledProcessError as e:
-            logger.error(f"systemctl command failed: {e.stderr}", exc_info=True)
-            raise SystemdError(f"systemctl command failed: {e.stderr}")
+        Returns:
+            str: Complete dispatcher script content.
+        """
+        script_content = f"""#!/bin/sh
+# Installed by pi-netconfig: send port 80 on the AP to the portal
+case "$CONNECTION_ID" in
+  {AP_PROFILE_NAME}*) ;;
+  *) exit 0 ;;
+esac
+case "$2" in
+  up)
+    nft -f - <<EOF
+table ip pi_netconfig
+delete table ip pi_netconfig
+table ip pi_netconfig {{
+  chain prerouting {{
+    type nat hook prerouting priority -100; policy accept;
+    iifname "$1" tcp dport 80 redirect to :{port}
+  }}
+}}
+EOF
+    ;;
+  down|pre-down)
+    nft delete table ip pi_netconfig 2>/dev/null
+    ;;
+esac
+exit 0
+"""
+        logger.debug("Generated portal redirect script content")
+        return script_content
     
     @staticmethod
-    def rollback_installation() -> None:
-        """Remove created files and directories (best-effort).
+    def build_plan(source_dir: Path, socket_activation: bool = False,
+                   root: str = '/', systemctl: str = 'systemctl',
+                   health_timeout: float = HEALTH_TIMEOUT_SECONDS,
+                   enable: bool = True) -> InstallPlan:
+        """Describe a complete installation.
+        
+        The archive goes into its own release directory; the 'current'
+        symlink is switched to it only after every file is in place.
         
-        Logs warnings for cleanup failures but does not raise exceptions.
+        Args:
+            source_dir: Directory containing the application modules.
+            socket_activation: Also install pi-netconfig.socket so systemd
+                owns the portal listener.
+            root: Filesystem prefix to install under.
+            systemctl: systemctl executable.
+            health_timeout: Seconds the service has to report ready.
+            enable: Enable and start units with systemctl; if False, write
+                the .wants symlinks 'systemctl enable' would create instead
+                (offline images, no running systemd).
+            
+        Returns:
+            InstallPlan: Plan ready to apply.
         """
-        logger.warning("Rollback initiated")
+        plan = InstallPlan(root, systemctl, health_timeout=health_timeout)
+        archive = SystemdInstaller.archive_bytes(source_dir, '/usr/bin/python3')
+        release = ReleaseStore.release_id(archive)
+        release_dir = f'{RELEASES_DIR}/{release}'
+        for directory in (APP_DIR, RELEASES_DIR, release_dir, CONFIG_DIR, LOG_DIR, UNIT_DIR,
+                          NM_DISPATCHER_DIR, DNSMASQ_SHARED_DIR):
+            plan.add_directory(directory)
+        plan.add_file(f'{release_dir}/{ZIPAPP_NAME}', archive, 0o755)
+        plan.add_file(CTL_WRAPPER_PATH, SystemdInstaller.generate_ctl_wrapper().encode('utf-8'),
+                      0o755)
+        plan.add_file(DNSMASQ_DROPIN, SystemdInstaller.generate_dnsmasq_dropin().encode('utf-8'))
+        plan.add_file(PORTAL_REDIRECT_SCRIPT,
+                      SystemdInstaller.generate_portal_redirect_script().encode('utf-8'), 0o755)
+        units = [SERVICE_UNIT]
+        if socket_activation:
+            plan.add_file(f'{UNIT_DIR}/{SOCKET_UNIT}',
+                          SystemdInstaller.generate_systemd_socket_unit().encode('utf-8'),
+                          unit=True)
+            units.insert(0, SOCKET_UNIT)
+        plan.add_file(f'{UNIT_DIR}/{SERVICE_UNIT}',
+                      SystemdInstaller.generate_systemd_unit(socket_activation).encode('utf-8'),
+                      unit=True)
+        # Relative target keeps the tree valid when installed under a prefix
+        plan.add_symlink(CURRENT_LINK, f'releases/{release}')
+        if enable:
+            plan.enable(units, restart=SERVICE_UNIT)
+        else:
+            for unit in units:
+                wants = f'{UNIT_DIR}/{WANTED_BY[unit]}.wants'
+                plan.add_directory(wants)
+                plan.add_symlink(f'{wants}/{unit}', f'{UNIT_DIR}/{unit}')
+        return plan
+
+
+class ImageProvisioner:
+    """Write a ready-to-boot installation into a mounted root filesystem.
+    
+    Everything systemctl and nmcli would do on first boot is written as
+    files: the release and units, the .wants symlinks, the AP profile and
+    known-network keyfiles, and the configured-SSID record. Nothing runs
+    against the build host's systemd or NetworkManager.
+    """
+    
+    @staticmethod
+    def validate_ssid(ssid: str) -> None:
+        """Raise InstallerError unless ssid is safe for a keyfile and its name."""
+        if not (1 <= len(ssid) <= 32) or SSID_FORBIDDEN & set(ssid) or ssid.strip() != ssid:
+            raise InstallerError(f"Invalid SSID: {ssid!r}")
+    
+    @staticmethod
+    def validate_psk(psk: str) -> None:
+        """Raise InstallerError unless psk is a valid WPA2 passphrase."""
+        if not (8 <= len(psk) <= 63):
+            raise InstallerError("WPA2 passphrase must be 8-63 characters")
+        if any(c == '\\' or not c.isprintable() for c in psk):
+            raise InstallerError("Passphrase contains characters keyfiles cannot hold")
+    
+    @staticmethod
+    def keyfile(sections: List[Tuple[str, List[Tuple[str, str]]]]) -> bytes:
+        """Render NetworkManager keyfile sections."""
+        lines = []
+        for name, entries in sections:
+            lines.append(f'[{name}]')
+            lines.extend(f'{key}={value}' for key, value in entries)
+            lines.append('')
+        return '\n'.join(lines).encode('utf-8')
+    
+    @staticmethod
+    def connection_uuid(name: str) -> str:
+        """Stable UUID so re-provisioning produces identical keyfiles."""
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f'pi-netconfig:{name}'))
+    
+    @staticmethod
+    def ap_keyfile(ssid: str, psk: str = AP_DEFAULT_PSK) -> bytes:
+        """AP profile equivalent to AccessPoint.create_ap_profile()."""
+        return ImageProvisioner.keyfile([
+            ('connection', [('id', AP_PROFILE_NAME),
+                            ('uuid', ImageProvisioner.connection_uuid(AP_PROFILE_NAME)),
+                            ('type', 'wifi'), ('autoconnect', 'false')]),
+            ('wifi', [('mode', 'ap'), ('ssid', ssid)]),
+            ('wifi-security', [('key-mgmt', 'wpa-psk'), ('psk', psk)]),
+            ('ipv4', [('method', 'shared'), ('address1', AP_ADDRESS)]),
+        ])
+    
+    @staticmethod
+    def network_keyfile(ssid: str, psk: str) -> bytes:
+        """Client profile equivalent to ConfigManager.configure_network()."""
+        return ImageProvisioner.keyfile([
+            ('connection', [('id', ssid),
+                            ('uuid', ImageProvisioner.connection_uuid(f'network:{ssid}')),
+                            ('type', 'wifi'), ('autoconnect', 'true')]),
+            ('wifi', [('mode', 'infrastructure'), ('ssid', ssid)]),
+            ('wifi-security', [('key-mgmt', 'wpa-psk'), ('psk', psk)]),
+            ('ipv4', [('method', 'auto')]),
+            ('ipv6', [('method', 'auto')]),
+        ])
+    
+    @staticmethod
+    def build_plan(source_dir: Path, image_root: str, socket_activation: bool = False,
+                   ap_ssid: Optional[str] = None, ap_psk: str = AP_DEFAULT_PSK,
+                   networks: Iterable[Tuple[str, str]] = ()) -> InstallPlan:
+        """Describe an offline installation into image_root.
+        
+        Args:
+            source_dir: Directory containing the application modules.
+            image_root: Mount point of the target root filesystem.
+            socket_activation: Also enable pi-netconfig.socket.
+            ap_ssid: SSID for a pre-built AP profile; None leaves the
+                profile to be created on the device (MAC-derived SSID).
+            ap_psk: AP passphrase.
+            networks: (ssid, passphrase) pairs to pre-configure; the first
+                is recorded as the configured network.
+            
+        Returns:
+            InstallPlan: Plan that writes files only.
+            
+        Raises:
+            InstallerError: If an SSID or passphrase is invalid.
+        """
+        networks = list(networks)
+        plan = SystemdInstaller.build_plan(source_dir, socket_activation, root=image_root,
+                                           enable=False)
+        if ap_ssid is not None or networks:
+            plan.add_directory(NM_CONNECTIONS_DIR, 0o700)
+        if ap_ssid is not None:
+            ImageProvisioner.validate_ssid(ap_ssid)
+            ImageProvisioner.validate_psk(ap_psk)
+            plan.add_file(PROVISIONED_AP_KEYFILE,
+                          ImageProvisioner.ap_keyfile(ap_ssid, ap_psk), 0o600)
+        for ssid, psk in networks:
+            ImageProvisioner.validate_ssid(ssid)
+            ImageProvisioner.validate_psk(psk)
+            plan.add_file(f'{NM_CONNECTIONS_DIR}/{ssid}.nmconnection',
+                          ImageProvisioner.network_keyfile(ssid, psk), 0o600)
+        if networks:
+            config = {'configured_ssid': networks[0][0], 'last_connected': None,
+                      'ap_password': ap_psk}
+            plan.add_file(CONFIG_PATH, json.dumps(config).encode('utf-8'), 0o600)
+        return plan
+
+
+def provision_image(image_root: str, socket_activation: bool = False,
+                    ap_ssid: Optional[str] = None, ap_psk: str = AP_DEFAULT_PSK,
+                    networks: Iterable[Tuple[str, str]] = ()) -> bool:
+    """Install into a mounted root filesystem image without systemd or nmcli.
+    
+    Args:
+        image_root: Mount point of the target root filesystem.
+        socket_activation: Also enable pi-netconfig.socket.
+        ap_ssid: SSID for a pre-built AP profile (None: created on device).
+        ap_psk: AP passphrase.
+        networks: (ssid, passphrase) pairs to pre-configure.
+    
+    Returns:
+        bool: True if the image was provisioned (or already up to date).
+    """
+    plan: Optional[InstallPlan] = None
+    try:
+        logger.info(f"Provisioning image at {image_root}")
         
-        paths_to_remove = [
-            '/etc/systemd/system/pi-netconfig.service',
-            '/usr/local/bin/pi-netconfig'
-        ]
+        # Keyfiles must be root-owned or NetworkManager ignores them
+        SystemdInstaller.verify_root_privileges()
         
-        for path in paths_to_remove:
-            try:
-                logger.debug(f"Attempting to remove: {path}")
-                if os.path.isdir(path):
-                    shutil.rmtree(path)
-                    logger.debug(f"Removed directory: {path}")
-                elif os.path.exists(path):
-                    os.remove(path)
-                    logger.debug(f"Removed file: {path}")
-            except Exception as e:
-                logger.warning(f"Rollback cleanup failed for {path}: {e}")
-
-
-def install() -> bool:
+        root = Path(image_root).resolve()
+        if root == Path('/') or not (root / 'etc').is_dir():
+            raise InstallerError(f"{image_root} is not a mounted root filesystem image")
+        
+        source_dir = InstallationDetector.get_current_script_path().parent
+        plan = ImageProvisioner.build_plan(source_dir, str(root), socket_activation,
+                                           ap_ssid, ap_psk, networks)
+        changed = plan.apply()
+        logger.info(f"Image provisioned: {len(changed)} paths written")
+        return True
+    
+    except PrivilegeError:
+        return False
+    except (FileSystemError, SystemdError) as e:
+        logger.error(f"Provisioning failed: {e}", exc_info=True)
+        if plan is not None:
+            plan.rollback()
+        return False
+    except InstallerError as e:
+        logger.error(f"Provisioning failed: {e}")
+        print(f"ERROR: {e}", file=sys.stderr)
+        return False
+
+
+def provision_main(argv: List[str]) -> int:
+    """
+    Command-line entry point: pi-netconfig provision IMAGE_ROOT [options]
+    
+    Known networks are read from a JSON file (list of {"ssid", "password"})
+    so passphrases do not appear in the process list.
+    
+    Returns:
+        int: 0 on success, 1 on failure, 2 on usage error
+    """
+    parser = argparse.ArgumentParser(
+        prog='pi-netconfig provision',
+        description='Install pi-netconfig into a mounted root filesystem image.')
+    parser.add_argument('image_root', help='mount point of the image root filesystem')
+    parser.add_argument('--socket-activation', action='store_true',
+                        help='also enable pi-netconfig.socket')
+    parser.add_argument('--ap-ssid', help='SSID for a pre-built AP profile')
+    parser.add_argument('--ap-psk', default=AP_DEFAULT_PSK, help='AP passphrase')
+    parser.add_argument('--networks', metavar='FILE',
+                        help='JSON list of {"ssid": ..., "password": ...} to pre-configure')
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return 2 if e.code else 0
+    
+    networks: List[Tuple[str, str]] = []
+    if args.networks:
+        try:
+            with open(args.networks) as f:
+                networks = [(entry['ssid'], entry['password']) for entry in json.load(f)]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"ERROR: Cannot read networks file {args.networks}: {e}", file=sys.stderr)
+            return 2
+    
+    ok = provision_image(args.image_root, args.socket_activation, args.ap_ssid,
+                         args.ap_psk, networks)
+    return 0 if ok else 1
+
+
+def install(socket_activation: bool = False, root: str = '/',
+            systemctl: str = 'systemctl',
+            health_timeout: float = HEALTH_TIMEOUT_SECONDS) -> bool:
     """Main installation entry point.
     
-    Coordinates installation detection, privilege verification, and
-    installation steps. Performs rollback on failure.
+    Builds the install plan and applies only the steps whose content
+    changed, so running it on an installed system upgrades or does
+    nothing. An upgrade installs a new release directory and switches
+    the 'current' symlink; if the service then fails to report ready
+    within health_timeout, the symlink and units are reverted and the
+    previous release restarted. Older releases beyond RELEASES_KEPT are
+    pruned after a successful install.
+    
+    Args:
+        socket_activation: Also install pi-netconfig.socket so systemd owns
+            the portal listener.
+        root: Filesystem prefix to install under.
+        systemctl: systemctl executable.
+        health_timeout: Seconds the service has to report ready.
     
     Returns:
         bool: True if installation successful, False otherwise.
     """
+    plan: Optional[InstallPlan] = None
     try:
         logger.info("Installation started")
         
-        # Check if already installed
-        if InstallationDetector.is_service_installed():
-            logger.info("Service already installed, skipping installation")
-            return True
-        
         # Verify privileges
         SystemdInstaller.verify_root_privileges()
         
-        # Execute installation steps
-        SystemdInstaller.create_directories()
-        script_path = InstallationDetector.get_current_script_path()
-        SystemdInstaller.copy_application(script_path)
-        unit_content = SystemdInstaller.generate_systemd_unit()
-        SystemdInstaller.install_systemd_unit(unit_content)
-        SystemdInstaller.enable_and_start_service()
+        source_dir = InstallationDetector.get_current_script_path().parent
+        plan = SystemdInstaller.build_plan(source_dir, socket_activation, root, systemctl,
+                                           health_timeout)
+        if plan.apply():
+            logger.info("Installation successful")
+        else:
+            logger.info("Installation already up to date")
         
-        logger.info("Installation successful")
+        store = ReleaseStore(root)
+        store.mark_current()
+        store.prune()
         return True
         
     except PrivilegeError:
@@ -287,14 +1096,50 @@ def install() -> bool:
         return False
     except (FileSystemError, SystemdError) as e:
         logger.error(f"Installation failed: {e}", exc_info=True)
-        SystemdInstaller.rollback_installation()
+        if plan is not None:
+            plan.rollback()
         logger.critical("Installation failed after rollback")
         return False
     except Exception as e:
         logger.critical(f"Unexpected installation failure: {e}", exc_info=True)
-        SystemdInstaller.rollback_installation()
+        if plan is not None:
+            plan.rollback()
         return False
 
 
+def install_main(argv: List[str]) -> int:
+    """
+    Command-line entry point: pi-netconfig install|upgrade [options]
+    
+    Runs install() whether or not the service is already installed, so an
+    installed device re-runs the plan: unchanged content is left alone and
+    new sources become a new release, switched to only if the service
+    comes up healthy (otherwise the previous release is restored).
+    
+    Returns:
+        int: 0 on success, 1 on failure, 2 on usage error
+    """
+    parser = argparse.ArgumentParser(
+        prog='pi-netconfig install',
+        description='Install or upgrade the pi-netconfig service.')
+    parser.add_argument('--socket-activation', action='store_true',
+                        help='let systemd own the portal listener via pi-netconfig.socket '
+                             '(stays enabled on later installs)')
+    parser.add_argument('--root', default='/', help='filesystem prefix to install under')
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return 2 if e.code else 0
+    
+    # Keep an enabled socket: without Requires= it would still hold the port
+    socket_unit = Path(args.root) / UNIT_DIR.lstrip('/') / SOCKET_UNIT
+    socket_activation = args.socket_activation or socket_unit.exists()
+    if not install(socket_activation, root=args.root):
+        print("ERROR: Installation failed", file=sys.stderr)
+        return 1
+    print("Installation successful")
+    return 0
+
+
 # INTEGRATION: Import install() from installer module. Call from ServiceController 
 # when service not detected. Expects root privileges. Returns bool for success/failure.
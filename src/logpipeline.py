@@ -0,0 +1,411 @@
+"""
+LogPipeline Module - Non-blocking Logging
+
+Moves log formatting and file I/O off the event loop and HTTP request
+threads. Loggers hand records to a bounded in-memory queue; a single writer
+thread drains it into the registered output handlers. When the SD card
+stalls and the queue fills, new records are dropped and counted rather than
+blocking the caller, and the writer reports the loss once it catches up.
+
+Output handlers are kept in a registry keyed by name so reconfiguring
+logging replaces a handler instead of stacking a duplicate.
+
+The log file rotates by size and age; rotated segments are gzip-compressed
+and pruned to a retention count on a background thread so compression never
+stalls the writer. A sampler thins out repetitive debug lines such as the
+30-second "Connection check" heartbeat.
+
+Copyright (c) 2025 William Watson. Licensed under MIT License.
+"""
+
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Configure module logger
+logger = logging.getLogger('LogPipeline')
+
+QUEUE_CAPACITY = 1000
+LOG_MAX_BYTES = 1024 * 1024
+LOG_MAX_AGE_SECONDS = 7 * 24 * 3600
+LOG_BACKUP_COUNT = 5
+SAMPLE_INTERVAL_SECONDS = 600
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        """Initialize with bounded queue and zeroed drop counter"""
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._drop_lock = threading.Lock()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Queue record without waiting; count it if the queue is full"""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+
+
+class PipelineListener(logging.handlers.QueueListener):
+    """Writer thread dispatching queued records to registered handlers"""
+
+    def __init__(self, log_queue: queue.Queue, pipeline: 'LogPipeline'):
+        """Initialize listener reading handlers from the pipeline registry"""
+        super().__init__(log_queue, respect_handler_level=True)
+        self.pipeline = pipeline
+        self.reported_drops = 0
+
+    def handle(self, record: logging.LogRecord) -> None:
+        """Emit record to every handler, then report any new drops"""
+        record = self.prepare(record)
+        for handler in self.pipeline.handler_list():
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+        dropped = self.pipeline.queue_handler.dropped
+        if dropped > self.reported_drops and self.queue.empty():
+            lost = dropped - self.reported_drops
+            self.reported_drops = dropped
+            warning = logger.makeRecord(
+                logger.name, logging.WARNING, __file__, 0,
+                f"Log queue overflowed: {lost} record(s) dropped", None, None
+            )
+            for handler in self.pipeline.handler_list():
+                if warning.levelno >= handler.level:
+                    handler.handle(warning)
+
+
+class LogPipeline:
+    """Bounded queue, single writer thread and named handler registry"""
+
+    def __init__(self, capacity: int = QUEUE_CAPACITY):
+        """
+        Initialize pipeline
+
+        Args:
+            capacity: Maximum records buffered before new ones are dropped
+        """
+        self.capacity = capacity
+        self.queue: queue.Queue = queue.Queue(maxsize=capacity)
+        self.queue_handler = BoundedQueueHandler(self.queue)
+        self.listener = PipelineListener(self.queue, self)
+        self.handlers: Dict[str, logging.Handler] = {}
+        self._handlers_snapshot: tuple = ()
+        self._lock = threading.Lock()
+        self._running = False
+        self._atexit_registered = False
+
+    def add_handler(self, name: str, handler: logging.Handler) -> None:
+        """
+        Register output handler, replacing any handler with the same name
+
+        Args:
+            name: Registry key (e.g. 'file', 'console')
+            handler: Handler run on the writer thread
+        """
+        with self._lock:
+            previous = self.handlers.get(name)
+            self.handlers[name] = handler
+            self._refresh_locked()
+        if previous is not None and previous is not handler:
+            previous.close()
+
+    def remove_handler(self, name: str) -> None:
+        """Unregister and close handler if present"""
+        with self._lock:
+            handler = self.handlers.pop(name, None)
+            self._refresh_locked()
+        if handler is not None:
+            handler.close()
+
+    def handler_list(self) -> tuple:
+        """Return current handlers (immutable snapshot, safe without locking)"""
+        return self._handlers_snapshot
+
+    def _refresh_locked(self) -> None:
+        """Publish handler snapshot and skip queueing records no handler wants"""
+        self._handlers_snapshot = tuple(self.handlers.values())
+        levels = [h.level if isinstance(h.level, int) else logging.NOTSET
+                  for h in self._handlers_snapshot]
+        self.queue_handler.setLevel(min(levels) if levels else logging.CRITICAL + 1)
+
+    def install(self, target: Optional[logging.Logger] = None) -> None:
+        """
+        Make the queue handler the only handler on a logger
+
+        Args:
+            target: Logger to attach to (root logger by default)
+        """
+        target = target or logging.getLogger()
+        for handler in target.handlers[:]:
+            target.removeHandler(handler)
+        target.addHandler(self.queue_handler)
+
+    def start(self) -> None:
+        """Start writer thread (idempotent)"""
+        if self._running:
+            return
+        self.listener.start()
+        self._running = True
+        if not self._atexit_registered:
+            # Runs before logging.shutdown(), so queued records are flushed
+            atexit.register(self.stop)
+            self._atexit_registered = True
+
+    def stop(self) -> None:
+        """Drain queue, stop writer thread and flush handlers"""
+        if not self._running:
+            return
+        self._running = False
+        try:
+            self.queue.put(None, timeout=5.0)  # listener sentinel
+            self.listener._thread.join(timeout=5.0)
+        except queue.Full:
+            logger.warning("Log queue still full at shutdown; records may be lost")
+        self.listener._thread = None
+        for handler in self.handler_list():
+            try:
+                handler.flush()
+            except Exception:
+                pass
+
+    def is_running(self) -> bool:
+        """Return writer thread status"""
+        return self._running
+
+    def stats(self) -> Dict[str, object]:
+        """Return queue depth, capacity, drop count and handler names"""
+        return {
+            'queued': self.queue.qsize(),
+            'capacity': self.capacity,
+            'dropped': self.queue_handler.dropped,
+            'handlers': sorted(self.handlers),
+        }
+
+
+class LogCompressor:
+    """Background thread gzip-compressing rotated segments and pruning old ones"""
+
+    def __init__(self, base_filename: str, backup_count: int):
+        """
+        Initialize compressor
+
+        Args:
+            base_filename: Active log path; segments are named base.<stamp>
+            backup_count: Number of rotated segments to keep
+        """
+        self.base_filename = base_filename
+        self.backup_count = backup_count
+        self.jobs: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, segment: str) -> None:
+        """Queue a rotated segment for compression, starting the worker on demand"""
+        self.jobs.put(segment)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='LogCompressor', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        """Compress queued segments until a None sentinel arrives"""
+        while True:
+            segment = self.jobs.get()
+            if segment is None:
+                return
+            try:
+                self.compress(segment)
+            except OSError as e:
+                # Leave the raw segment; pruning still bounds disk use
+                logger.warning(f"Failed to compress {segment}: {e}")
+            self.prune()
+
+    def compress(self, segment: str) -> str:
+        """Gzip segment next to itself and remove the original"""
+        target = segment + '.gz'
+        partial = target + '.tmp'
+        with open(segment, 'rb') as src, gzip.open(partial, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(partial, target)
+        os.remove(segment)
+        return target
+
+    def segments(self) -> List[str]:
+        """Return rotated segments (compressed or not), oldest first"""
+        directory, base = os.path.split(self.base_filename)
+        prefix = base + '.'
+        names = sorted(
+            name for name in os.listdir(directory or '.')
+            if name.startswith(prefix) and not name.endswith('.tmp')
+        )
+        return [os.path.join(directory, name) for name in names]
+
+    def prune(self) -> None:
+        """Delete the oldest segments beyond backup_count"""
+        segments = self.segments()
+        for path in segments[:max(len(segments) - self.backup_count, 0)]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Failed to remove old log {path}: {e}")
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Finish queued compressions and stop the worker"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self.jobs.put(None)
+            thread.join(timeout)
+
+
+class RotatingCompressedFileHandler(logging.handlers.BaseRotatingHandler):
+    """
+    File handler rotating on size or age with gzip-compressed retention
+
+    Rotated segments are named <file>.<YYYYmmddTHHMMSSZ>-<NNN> (UTC, so DST
+    changes never move names backwards, plus a zero-padded sequence for
+    rotations within one second) so they sort by age and never need
+    renumbering; LogCompressor turns them into .gz files.
+    """
+
+    def __init__(self, filename: str, max_bytes: int = LOG_MAX_BYTES,
+                 max_age_seconds: float = LOG_MAX_AGE_SECONDS,
+                 backup_count: int = LOG_BACKUP_COUNT,
+                 clock: Callable[[], float] = time.time):
+        """
+        Initialize handler
+
+        Args:
+            filename: Active log file path
+            max_bytes: Rotate before a write would exceed this size (0 disables)
+            max_age_seconds: Rotate once the segment is this old (0 disables)
+            backup_count: Number of rotated segments to keep
+            clock: Wall-clock source (injectable for tests)
+        """
+        super().__init__(filename, 'a', encoding='utf-8')
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.clock = clock
+        self.compressor = LogCompressor(self.baseFilename, backup_count)
+        self.segment_started = self._segment_start()
+        # Sequence numbers only grow within one stamp: names freed by
+        # pruning must not be reused, or a newer segment would sort older
+        self.last_stamp: Optional[str] = None
+        self.last_sequence = -1
+
+    def _segment_start(self) -> float:
+        """Age an existing non-empty file from its last write"""
+        now = self.clock()
+        try:
+            stat = os.stat(self.baseFilename)
+        except OSError:
+            return now
+        return min(stat.st_mtime, now) if stat.st_size else now
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        """Return True if the record would exceed size or the segment is too old"""
+        if self.stream is None:
+            self.stream = self._open()
+        position = self.stream.tell()
+        if position == 0:
+            return False
+        if self.max_age_seconds and self.clock() - self.segment_started >= self.max_age_seconds:
+            return True
+        if self.max_bytes:
+            size = len(self.format(record)) + len(self.terminator)
+            return position + size > self.max_bytes
+        return False
+
+    def doRollover(self) -> None:
+        """Move the active file aside and hand it to the compressor"""
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        now = self.clock()
+        stamp = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(now))
+        sequence = self.last_sequence + 1 if stamp == self.last_stamp else 0
+        segment = f"{self.baseFilename}.{stamp}-{sequence:03d}"
+        while os.path.exists(segment) or os.path.exists(segment + '.gz'):
+            sequence += 1
+            segment = f"{self.baseFilename}.{stamp}-{sequence:03d}"
+        self.last_stamp, self.last_sequence = stamp, sequence
+
+        if os.path.exists(self.baseFilename):
+            os.replace(self.baseFilename, segment)
+            self.compressor.submit(segment)
+
+        self.stream = self._open()
+        self.segment_started = now
+
+    def close(self) -> None:
+        """Close file and wait for pending compressions"""
+        super().close()
+        self.compressor.stop()
+
+
+class LogSampler(logging.Filter):
+    """
+    Rate-limit repetitive DEBUG lines that share a prefix
+
+    A line is passed when its text differs from the previous one for the
+    same prefix (so state changes are never hidden) or when interval seconds
+    have elapsed; the passed line notes how many repeats were suppressed.
+    """
+
+    def __init__(self, prefixes: Tuple[str, ...], interval: float = SAMPLE_INTERVAL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize sampler
+
+        Args:
+            prefixes: Message prefixes subject to sampling
+            interval: Seconds between repeats of an unchanged line
+            clock: Monotonic time source (injectable for tests)
+        """
+        super().__init__()
+        self.prefixes = tuple(prefixes)
+        self.interval = interval
+        self.clock = clock
+        self.suppressed = 0
+        self._last: Dict[str, Tuple[str, float, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Return False for repeats inside the sampling interval"""
+        if record.levelno > logging.DEBUG:
+            return True
+        message = record.getMessage()
+        prefix = next((p for p in self.prefixes if message.startswith(p)), None)
+        if prefix is None:
+            return True
+
+        now = self.clock()
+        with self._lock:
+            last = self._last.get(prefix)
+            if last is not None:
+                last_message, last_time, repeats = last
+                if message == last_message and now - last_time < self.interval:
+                    self._last[prefix] = (last_message, last_time, repeats + 1)
+                    self.suppressed += 1
+                    return False
+                if repeats:
+                    record.msg = f"{message} ({repeats} similar suppressed)"
+                    record.args = None
+            self._last[prefix] = (message, now, 0)
+        return True
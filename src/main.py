@@ -17,13 +17,53 @@ import asyncio
 import logging
 import os
 import signal
+import socket
 import sys
+import time
 import traceback
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
-from installer import install, InstallationDetector
-from statemonitor import StateMonitor
+# Component names resolved on first use (PEP 562) so each mode imports only
+# what it runs: 'ctl' loads none of these, bootstrap only the installer, and
+# the service never loads the installer. AP-only modules (webserver,
+# apmanager, dnsresponder) are deferred further by components.py.
+_LAZY_IMPORTS = {
+    'install': 'installer',
+    'provision_main': 'installer',
+    'install_main': 'installer',
+    'BootProbe': 'connectionmanager',
+    'ControlServer': 'controlsocket',
+    'ControlSocketError': 'controlsocket',
+    'LogPipeline': 'logpipeline',
+    'LogSampler': 'logpipeline',
+    'RotatingCompressedFileHandler': 'logpipeline',
+    'StateMonitor': 'statemonitor',
+    'StateCheckpoint': 'statemonitor',
+    'TransitionJournal': 'statemonitor',
+    'ServiceComponents': 'components',
+    'WebServerError': 'webserver',
+    'configured_ssid': 'components',
+}
+
+
+def __getattr__(name: str) -> Any:
+    """Import a lazily loaded component name and cache it on this module."""
+    module = _LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # __import__ (not importlib.import_module) so -X importtime reports it
+    value = getattr(__import__(module), name)
+    globals()[name] = value
+    return value
+
+
+def _component(name: str) -> Any:
+    """Resolve a lazily loaded name from inside this module (honours patches)."""
+    try:
+        return globals()[name]
+    except KeyError:
+        return __getattr__(name)
 
 
 # Exception hierarchy
@@ -42,11 +82,167 @@ class PrivilegeError(ServiceControllerError):
     pass
 
 
+class SystemdNotifier:
+    """
+    Minimal sd_notify client (datagrams to $NOTIFY_SOCKET).
+    
+    All methods are no-ops returning False when not started by systemd
+    with Type=notify, so manual runs behave exactly as before.
+    """
+    
+    def __init__(self, environ=None):
+        environ = os.environ if environ is None else environ
+        address = environ.get('NOTIFY_SOCKET', '')
+        if address.startswith('@'):
+            address = '\0' + address[1:]  # abstract namespace
+        self.address: Optional[str] = address or None
+        self.watchdog_usec = self._read_watchdog_usec(environ)
+        self._socket: Optional[socket.socket] = None
+        self._warned = False
+    
+    @staticmethod
+    def _read_watchdog_usec(environ) -> Optional[int]:
+        """Return WATCHDOG_USEC if it targets this process."""
+        try:
+            pid = environ.get('WATCHDOG_PID')
+            if pid is not None and int(pid) != os.getpid():
+                return None
+            usec = int(environ.get('WATCHDOG_USEC', '0'))
+            return usec if usec > 0 else None
+        except ValueError:
+            return None
+    
+    @property
+    def enabled(self) -> bool:
+        """True if a notification socket was provided."""
+        return self.address is not None
+    
+    def notify(self, message: str) -> bool:
+        """
+        Send one notification datagram.
+        
+        Args:
+            message: Newline-separated KEY=VALUE assignments
+        
+        Returns:
+            bool: True if the datagram was sent
+        """
+        if self.address is None:
+            return False
+        try:
+            if self._socket is None:
+                self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM | socket.SOCK_CLOEXEC)
+                self._socket.setblocking(False)
+            self._socket.sendto(message.encode('utf-8'), self.address)
+            return True
+        except OSError as e:
+            if not self._warned:
+                logger.warning(f"sd_notify failed: {e}")
+                self._warned = True
+            return False
+    
+    def ready(self) -> bool:
+        """Send READY=1."""
+        return self.notify('READY=1')
+    
+    def watchdog(self) -> bool:
+        """Send WATCHDOG=1 keep-alive."""
+        return self.notify('WATCHDOG=1')
+    
+    def status(self, text: str) -> bool:
+        """Send STATUS= line shown by systemctl status."""
+        return self.notify(f'STATUS={text}')
+    
+    def stopping(self) -> bool:
+        """Send STOPPING=1."""
+        return self.notify('STOPPING=1')
+    
+    def watchdog_interval(self) -> Optional[float]:
+        """Ping interval in seconds (half of WatchdogSec), None if disabled."""
+        if self.watchdog_usec is None or not self.enabled:
+            return None
+        return self.watchdog_usec / 2_000_000
+    
+    def close(self) -> None:
+        """Close notification socket."""
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+class ReadinessReporter:
+    """
+    StateMonitor listener sending READY=1 after the first check and
+    STATUS= whenever the state changes.
+    """
+    
+    def __init__(self, notifier: SystemdNotifier):
+        self.notifier = notifier
+        self.ready_sent = False
+        self.last_state: Optional[str] = None
+    
+    def __call__(self, monitor) -> None:
+        state = monitor.current_state.name
+        if state != self.last_state:
+            self.notifier.status(f"State: {state}")
+            self.last_state = state
+        if not self.ready_sent:
+            self.notifier.ready()
+            self.ready_sent = True
+            logger.info("Service ready (first connection check complete)")
+
+
+def process_start_time() -> float:
+    """
+    Return the monotonic time this process was created.
+    
+    Uses the kernel's start time from /proc/self/stat so interpreter
+    startup and imports are included in time-to-stable-state reports.
+    Falls back to now if /proc is unavailable.
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        started = int(fields[19]) / os.sysconf('SC_CLK_TCK')
+        age = time.clock_gettime(time.CLOCK_BOOTTIME) - started
+        return time.monotonic() - max(age, 0.0)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.monotonic()
+
+
+async def watchdog_loop(notifier: SystemdNotifier, interval: float) -> None:
+    """
+    Ping the systemd watchdog from the event loop.
+    
+    Pings stop if the loop is blocked (e.g. by a synchronous nmcli call),
+    letting systemd restart the wedged service.
+    
+    Args:
+        notifier: SystemdNotifier instance
+        interval: Seconds between pings
+    """
+    logger.debug(f"Watchdog pings every {interval:.1f}s")
+    while True:
+        notifier.watchdog()
+        await asyncio.sleep(interval)
+
+
 # Global shutdown event
 shutdown_event: Optional[asyncio.Event] = None
-state_monitor: Optional[StateMonitor] = None
+state_monitor: Optional['StateMonitor'] = None
+notifier: Optional[SystemdNotifier] = None
+log_pipeline: Optional['LogPipeline'] = None
 logger = logging.getLogger('ServiceController')
 
+# Keep in sync with installer.UNIT_DIR / SERVICE_UNIT (not imported: mode
+# detection runs on every service start and must not load the installer)
+SERVICE_UNIT_PATH = '/etc/systemd/system/pi-netconfig.service'
+
+
+def is_service_installed() -> bool:
+    """Return True if the systemd unit file exists."""
+    return os.path.exists(SERVICE_UNIT_PATH)
+
 
 def detect_execution_mode() -> str:
     """
@@ -66,7 +262,7 @@ def detect_execution_mode() -> str:
         logger.debug("Detecting execution mode")
         
         # Check if service is installed
-        service_installed = InstallationDetector.is_service_installed()
+        service_installed = is_service_installed()
         logger.debug(f"Service installed: {service_installed}")
         
         if not service_installed:
@@ -118,10 +314,16 @@ def configure_logging(mode: str) -> None:
         LoggingConfigurationError: If log file cannot be created/written
     
     Configuration:
-        - File handler: /var/log/pi-netconfig.log (INFO level)
+        - File handler: /var/log/pi-netconfig.log (INFO level), rotated by
+          size and age into gzip archives with a fixed retention count
         - Console handler: stdout (DEBUG level, manual mode only)
         - Format: timestamp - logger - level - message
+        - Repeated "Connection check" debug lines are sampled
+        - Handlers run on a single writer thread behind a bounded queue;
+          calling again replaces handlers rather than duplicating them
     """
+    global log_pipeline
+    
     try:
         # Create log directory if needed
         log_path = Path('/var/log/pi-netconfig.log')
@@ -131,20 +333,19 @@ def configure_logging(mode: str) -> None:
         root_logger = logging.getLogger()
         root_logger.setLevel(logging.DEBUG)
         
-        # Remove existing handlers
-        for handler in root_logger.handlers[:]:
-            root_logger.removeHandler(handler)
+        if log_pipeline is None:
+            log_pipeline = _component('LogPipeline')()
+            log_pipeline.queue_handler.addFilter(_component('LogSampler')(('Connection check:',)))
         
         # File handler (all modes)
         try:
-            file_handler = logging.FileHandler(log_path)
+            file_handler = _component('RotatingCompressedFileHandler')(str(log_path))
             file_handler.setLevel(logging.INFO)
             file_formatter = logging.Formatter(
                 '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
             )
             file_handler.setFormatter(file_formatter)
-            root_logger.addHandler(file_handler)
-            logger.info(f"File logging configured: {log_path}")
+            log_pipeline.add_handler('file', file_handler)
         except (OSError, PermissionError) as e:
             # If file logging fails, we can't log this error to file
             # Fall back to stderr
@@ -159,7 +360,15 @@ def configure_logging(mode: str) -> None:
                 '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
             )
             console_handler.setFormatter(console_formatter)
-            root_logger.addHandler(console_handler)
+            log_pipeline.add_handler('console', console_handler)
+        else:
+            log_pipeline.remove_handler('console')
+        
+        # Queue handler replaces any existing root handlers
+        log_pipeline.install(root_logger)
+        log_pipeline.start()
+        logger.info(f"File logging configured: {log_path}")
+        if mode == 'manual':
             logger.debug("Console logging configured for manual mode")
         
         logger.info("Logging configuration complete")
@@ -232,6 +441,9 @@ async def graceful_shutdown() -> None:
     logger.info("Initiating graceful shutdown")
     
     try:
+        if notifier:
+            notifier.stopping()
+        
         if state_monitor:
             logger.debug("Shutting down StateMonitor")
             shutdown_task = asyncio.create_task(state_monitor.shutdown())
@@ -251,22 +463,76 @@ async def graceful_shutdown() -> None:
         logger.debug(traceback.format_exc())
 
 
+def build_state_monitor(services: 'ServiceComponents') -> 'StateMonitor':
+    """
+    Construct the StateMonitor wired to services (the service cold-start path).
+    
+    Args:
+        services: Component set driven by the state machine
+    
+    Returns:
+        StateMonitor: Monitor with checkpoint, journal and boot fast path,
+            bound as the portal's status provider
+    """
+    monitor = _component('StateMonitor')(
+        services.connection, services.access_point, services.portal,
+        station_probe=services.station_probe,
+        dns_responder=services.dns,
+        checkpoint=_component('StateCheckpoint')(),
+        journal=_component('TransitionJournal')(),
+        boot_probe=_component('BootProbe'),
+        started_at=process_start_time(),
+        ssid_provider=_component('configured_ssid'),
+    )
+    services.bind_status(monitor.status)
+    return monitor
+
+
+async def open_portal(services: 'ServiceComponents') -> None:
+    """
+    Adopt the portal socket at service start when socket-activated.
+    
+    The passed descriptor belongs to this process and its LISTEN_*
+    variables must not leak to child processes, so it is taken over
+    immediately. Without LISTEN_FDS nothing is loaded here: the portal
+    binds on first AP entry and a device that stays in CLIENT mode never
+    imports webserver. Failures are logged and retried on AP entry.
+    
+    Args:
+        services: Component set whose portal is opened
+    """
+    if 'LISTEN_FDS' not in os.environ:
+        return
+    try:
+        await services.portal.open()
+    except _component('WebServerError') as e:
+        logger.warning(f"Portal socket unavailable, retrying on AP entry: {e}")
+
+
 async def run_service() -> None:
     """
     Run main service loop.
     
     Behavior:
         1. Creates global shutdown event
-        2. Initializes StateMonitor
-        3. Starts StateMonitor.run()
-        4. Waits for shutdown signal
-        5. Coordinates graceful shutdown
+        2. Wires service components into StateMonitor with sd_notify
+           readiness reporting
+        3. Adopts the portal socket if systemd passed one (otherwise the
+           portal binds on first AP entry)
+        4. Starts the control socket (non-fatal if unavailable)
+        5. Starts StateMonitor.run() and watchdog pings (if WatchdogSec set)
+        6. Waits for shutdown signal
+        7. Coordinates graceful shutdown
     
     Raises:
         ServiceControllerError: If StateMonitor initialization fails
     """
-    global shutdown_event, state_monitor
+    global shutdown_event, state_monitor, notifier
     
+    ControlSocketError = _component('ControlSocketError')
+    watchdog_task: Optional[asyncio.Task] = None
+    control_server: Optional['ControlServer'] = None
+    services: Optional['ServiceComponents'] = None
     try:
         logger.info("Starting service")
         
@@ -274,9 +540,27 @@ async def run_service() -> None:
         shutdown_event = asyncio.Event()
         logger.debug("Shutdown event created")
         
-        # Initialize StateMonitor
+        # Wire components; AP-only modules load on first AP_MODE entry
         logger.debug("Initializing StateMonitor")
-        state_monitor = StateMonitor()
+        services = _component('ServiceComponents')()
+        state_monitor = build_state_monitor(services)
+        
+        await open_portal(services)
+        notifier = SystemdNotifier()
+        state_monitor.add_listener(ReadinessReporter(notifier))
+        
+        interval = notifier.watchdog_interval()
+        if interval:
+            watchdog_task = asyncio.create_task(watchdog_loop(notifier, interval))
+        
+        # Control socket for pi-netconfig-ctl
+        metrics_sources = {'logging': log_pipeline.stats} if log_pipeline else {}
+        control_server = _component('ControlServer')(state_monitor,
+                                                     metrics_sources=metrics_sources)
+        try:
+            await control_server.start()
+        except ControlSocketError as e:
+            logger.warning(f"Control socket unavailable: {e}")
         
         # Start StateMonitor
         logger.debug("Starting StateMonitor")
@@ -302,6 +586,16 @@ async def run_service() -> None:
         logger.critical(f"Fatal error in service loop: {e}")
         logger.debug(traceback.format_exc())
         raise ServiceControllerError(f"Service execution failed: {e}")
+    
+    finally:
+        if control_server:
+            await control_server.stop()
+        if watchdog_task:
+            watchdog_task.cancel()
+        if notifier:
+            notifier.close()
+        if services:
+            services.close()
 
 
 def main() -> int:
@@ -312,6 +606,11 @@ def main() -> int:
         int: Exit code (0 = success, 1 = error)
     
     Execution Flow:
+        0. 'ctl' subcommand: hand remaining arguments to the control client;
+           'provision' subcommand: write an offline install into an image;
+           'install' (or 'upgrade') subcommand: install or upgrade to a
+           new release regardless of the detected mode; --socket-activation
+           also enables pi-netconfig.socket
         1. Detect execution mode (bootstrap/service/manual)
         2. Bootstrap mode:
            - Verify root privileges
@@ -324,6 +623,14 @@ def main() -> int:
            - Run service event loop
         4. Return appropriate exit code
     """
+    if sys.argv[1:2] == ['ctl']:
+        from controlclient import main as ctl_main
+        return ctl_main(sys.argv[2:])
+    if sys.argv[1:2] == ['provision']:
+        return _component('provision_main')(sys.argv[2:])
+    if sys.argv[1:2] in (['install'], ['upgrade']):
+        return _component('install_main')(sys.argv[2:])
+    
     try:
         # Detect execution mode
         mode = detect_execution_mode()
@@ -336,10 +643,12 @@ def main() -> int:
                 print("ERROR: Root privileges required for installation", file=sys.stderr)
                 return 1
             
-            success = install()
+            success = _component('install')()
             if success:
                 print("Installation successful")
                 print("Start service: sudo systemctl start pi-netconfig")
+                print(f"Upgrade or enable socket activation later: "
+                      f"sudo python3 {sys.argv[0]} install [--socket-activation]")
                 return 0
             else:
                 print("ERROR: Installation failed", file=sys.stderr)
@@ -0,0 +1,348 @@
+"""
+Simulation Module - Virtual-Clock StateMonitor Harness
+
+Runs the real StateMonitor against scripted connectivity and fake
+components on an event loop whose clock jumps straight to the next timer
+instead of sleeping, so days of 30-second checks finish in seconds of wall
+time and every run with the same inputs gives the same result.
+
+A Timeline describes upstream reachability over virtual time (outages,
+flapping links); the simulated connection adds per-check latency and an
+optional seeded random failure rate for partial failures. The report gives
+time-to-AP after an outage starts, time-to-CLIENT after it ends, transition
+counts and flapping metrics, which the regression tests hold to fixed
+budgets.
+
+Usage:
+    python simulation.py [scenario ...]
+
+Copyright (c) 2025 William Watson. Licensed under MIT License.
+"""
+
+import asyncio
+import bisect
+import json
+import random
+import selectors
+import sys
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from statemonitor import FLAP_WINDOW_SECONDS, StateMonitor, SystemState
+
+DAY_SECONDS = 24 * 3600.0
+
+
+class VirtualSelector:
+    """Selector wrapper that advances the loop clock instead of blocking"""
+
+    def __init__(self, selector: selectors.BaseSelector, loop: 'VirtualClockLoop'):
+        """Wrap selector, advancing loop's clock on idle waits"""
+        self.selector = selector
+        self.loop = loop
+
+    def select(self, timeout: Optional[float] = None):
+        """Poll without blocking; if nothing is ready, jump to the next timer"""
+        if timeout is None:
+            # No timers pending: only real I/O (e.g. an executor) can wake us
+            return self.selector.select(None)
+        events = self.selector.select(0)
+        if not events and timeout > 0:
+            self.loop.advance(timeout)
+        return events
+
+    def __getattr__(self, name: str):
+        """Delegate register/unregister/close to the real selector"""
+        return getattr(self.selector, name)
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """Event loop whose time() is virtual and never sleeps between timers"""
+
+    def __init__(self, start: float = 0.0):
+        """Initialize loop with virtual time at start"""
+        super().__init__()
+        self.virtual_time = start
+        self._selector = VirtualSelector(self._selector, self)
+
+    def time(self) -> float:
+        """Return virtual time in seconds"""
+        return self.virtual_time
+
+    def advance(self, seconds: float) -> None:
+        """Move virtual time forward"""
+        self.virtual_time += seconds
+
+
+class Timeline:
+    """Upstream reachability over virtual time as sorted change points"""
+
+    def __init__(self, changes: Sequence[Tuple[float, bool]] = (), initial: bool = True):
+        """
+        Initialize timeline
+
+        Args:
+            changes: (time, connected) pairs; need not be sorted
+            initial: Reachability before the first change
+        """
+        self.initial = initial
+        self.changes = sorted(changes)
+        self.times = [t for t, _ in self.changes]
+
+    @classmethod
+    def outages(cls, windows: Sequence[Tuple[float, float]]) -> 'Timeline':
+        """Link up except during (start, length) windows"""
+        changes: List[Tuple[float, bool]] = []
+        for start, length in windows:
+            changes += [(start, False), (start + length, True)]
+        return cls(changes)
+
+    @classmethod
+    def flapping(cls, up: float, down: float, start: float, end: float) -> 'Timeline':
+        """Link alternates up/down periods between start and end, up otherwise"""
+        changes: List[Tuple[float, bool]] = []
+        t = start
+        while t < end:
+            changes.append((t, False))
+            changes.append((min(t + down, end), True))
+            t += down + up
+        return cls(changes)
+
+    def connected(self, t: float) -> bool:
+        """Return reachability at time t"""
+        index = bisect.bisect_right(self.times, t)
+        return self.changes[index - 1][1] if index else self.initial
+
+    def last_edge(self, t: float, connected: bool) -> Optional[float]:
+        """Return the latest time <= t the link became connected (or not)"""
+        index = bisect.bisect_right(self.times, t)
+        for when, state in reversed(self.changes[:index]):
+            if state == connected:
+                return when
+        return None
+
+
+@dataclass
+class Latencies:
+    """Virtual seconds spent by each simulated component operation"""
+    check: float = 1.0
+    check_timeout: float = 5.0
+    ap_up: float = 8.0
+    ap_down: float = 3.0
+    portal: float = 0.5
+
+
+class SimulatedConnection:
+    """Connectivity check answering from a Timeline after a virtual delay"""
+
+    def __init__(self, timeline: Timeline, latencies: Latencies,
+                 failure_rate: float = 0.0, seed: int = 0):
+        """
+        Initialize connection
+
+        Args:
+            timeline: Upstream reachability script
+            latencies: Component latencies
+            failure_rate: Probability a check fails while the link is up
+            seed: Random seed for partial failures
+        """
+        self.timeline = timeline
+        self.latencies = latencies
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+
+    async def test_connection(self) -> bool:
+        """Answer after check latency (or the probe timeout when down)"""
+        loop = asyncio.get_running_loop()
+        connected = self.timeline.connected(loop.time())
+        if connected and self.random.random() < self.failure_rate:
+            connected = False
+        await asyncio.sleep(self.latencies.check if connected else self.latencies.check_timeout)
+        return connected
+
+
+class SimulatedAccessPoint:
+    """Access point whose activation and teardown take virtual time"""
+
+    def __init__(self, latencies: Latencies):
+        """Initialize with no activations"""
+        self.latencies = latencies
+        self.activations = 0
+
+    async def activate_ap(self) -> None:
+        """Bring the AP up"""
+        await asyncio.sleep(self.latencies.ap_up)
+        self.activations += 1
+
+    async def deactivate_ap(self) -> None:
+        """Bring the AP down"""
+        await asyncio.sleep(self.latencies.ap_down)
+
+
+class SimulatedPortal:
+    """Web portal whose start and stop take virtual time"""
+
+    def __init__(self, latencies: Latencies):
+        """Initialize portal"""
+        self.latencies = latencies
+
+    async def start_server(self) -> None:
+        """Start serving"""
+        await asyncio.sleep(self.latencies.portal)
+
+    async def stop_server(self) -> None:
+        """Stop serving"""
+        await asyncio.sleep(self.latencies.portal)
+
+
+@dataclass
+class SimulationReport:
+    """Outcome of one simulated run (all times in virtual seconds)"""
+    duration: float
+    checks: int = 0
+    transitions: List[Tuple[float, str, str]] = field(default_factory=list)
+    time_to_ap: List[float] = field(default_factory=list)
+    time_to_client: List[float] = field(default_factory=list)
+    spurious_ap: int = 0
+    ap_episodes: int = 0
+    flaps: int = 0
+    max_transitions_per_hour: int = 0
+
+    def summary(self) -> Dict[str, Any]:
+        """Return aggregate metrics without the transition list"""
+        data = asdict(self)
+        del data['transitions']
+        for name in ('time_to_ap', 'time_to_client'):
+            values = data.pop(name)
+            data[f'{name}_max'] = max(values) if values else None
+            data[f'{name}_mean'] = sum(values) / len(values) if values else None
+        data['transition_count'] = len(self.transitions)
+        return data
+
+
+def analyze(timeline: Timeline, transitions: List[Tuple[float, str, str]],
+            duration: float, checks: int) -> SimulationReport:
+    """
+    Derive recovery and flapping metrics from recorded transitions
+
+    AP entries while the timeline says the link is up are counted as spurious
+    (caused by partial failures) rather than timed against an outage.
+
+    Args:
+        timeline: Connectivity script the run used
+        transitions: (time, from_state, to_state) in order
+        duration: Simulated seconds
+        checks: Connection checks performed
+
+    Returns:
+        SimulationReport: Aggregated metrics
+    """
+    report = SimulationReport(duration=duration, checks=checks, transitions=transitions)
+    ap_entered: Optional[float] = None
+    for when, old, new in transitions:
+        if new == SystemState.AP_MODE.name:
+            report.ap_episodes += 1
+            ap_entered = when
+            down = timeline.last_edge(when, False)
+            if timeline.connected(when) or down is None:
+                report.spurious_ap += 1
+            else:
+                report.time_to_ap.append(when - down)
+        elif old == SystemState.AP_MODE.name:
+            if ap_entered is not None and when - ap_entered < FLAP_WINDOW_SECONDS:
+                report.flaps += 1
+            up = timeline.last_edge(when, True)
+            if up is not None and timeline.connected(when):
+                report.time_to_client.append(when - max(up, ap_entered or up))
+
+    times = [when for when, _, _ in transitions]
+    for index, start in enumerate(times):
+        in_hour = bisect.bisect_left(times, start + 3600.0) - index
+        report.max_transitions_per_hour = max(report.max_transitions_per_hour, in_hour)
+    return report
+
+
+async def run_monitor(timeline: Timeline, duration: float, latencies: Latencies,
+                      failure_rate: float, seed: int) -> SimulationReport:
+    """Drive a StateMonitor with simulated components for duration seconds"""
+    loop = asyncio.get_running_loop()
+    monitor = StateMonitor(
+        SimulatedConnection(timeline, latencies, failure_rate, seed),
+        SimulatedAccessPoint(latencies),
+        SimulatedPortal(latencies),
+        clock=loop.time,
+    )
+    transitions: List[Tuple[float, str, str]] = []
+    previous = [monitor.current_state.name]
+
+    def record(state_monitor: StateMonitor) -> None:
+        state = state_monitor.current_state.name
+        if state != previous[0]:
+            transitions.append((loop.time(), previous[0], state))
+            previous[0] = state
+
+    monitor.add_listener(record)
+    await monitor.initialize()
+    await asyncio.sleep(duration)
+    await monitor.shutdown()
+    return analyze(timeline, transitions, duration, monitor.counters['checks'])
+
+
+def simulate(timeline: Timeline, duration: float, latencies: Optional[Latencies] = None,
+             failure_rate: float = 0.0, seed: int = 0) -> SimulationReport:
+    """
+    Run the state machine against timeline on a virtual clock
+
+    Args:
+        timeline: Upstream reachability script
+        duration: Virtual seconds to simulate
+        latencies: Component latencies (defaults to Latencies())
+        failure_rate: Probability a check fails while the link is up
+        seed: Random seed for partial failures
+
+    Returns:
+        SimulationReport: Transitions and derived metrics
+    """
+    loop = VirtualClockLoop()
+    try:
+        return loop.run_until_complete(
+            run_monitor(timeline, duration, latencies or Latencies(), failure_rate, seed)
+        )
+    finally:
+        loop.close()
+
+
+# Named scenarios: name -> zero-argument callable returning a report
+SCENARIOS: Dict[str, Callable[[], SimulationReport]] = {
+    'steady': lambda: simulate(Timeline(), DAY_SECONDS),
+    'long_outages': lambda: simulate(
+        Timeline.outages([(3600.0, 4 * 3600.0), (12 * 3600.0, 1800.0),
+                          (20 * 3600.0, 600.0)]),
+        DAY_SECONDS),
+    'short_blips': lambda: simulate(
+        Timeline.outages([(t, 45.0) for t in range(1800, int(DAY_SECONDS), 3600)]),
+        DAY_SECONDS),
+    'flapping': lambda: simulate(
+        Timeline.flapping(up=40.0, down=40.0, start=3600.0, end=7 * 3600.0),
+        DAY_SECONDS),
+    'partial_failures': lambda: simulate(Timeline(), DAY_SECONDS, failure_rate=0.05, seed=1),
+    'week': lambda: simulate(
+        Timeline.outages([(day * DAY_SECONDS + 2 * 3600.0, 3 * 3600.0) for day in range(7)]),
+        7 * DAY_SECONDS, failure_rate=0.02, seed=7),
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run named scenarios (all by default) and print their summaries as JSON"""
+    names = (sys.argv[1:] if argv is None else argv) or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f"unknown scenario(s): {', '.join(unknown)}; "
+              f"choose from {', '.join(SCENARIOS)}", file=sys.stderr)
+        return 2
+    print(json.dumps({name: SCENARIOS[name]().summary() for name in names}, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,9 +12,30 @@ Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
 """
 
 import asyncio
+import json
 import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
 from enum import Enum, auto
-from typing import Optional
+from types import MappingProxyType
+from typing import (Any, Awaitable, Callable, Dict, Iterator, List, Mapping, Optional,
+                    Tuple)
+
+CHECK_INTERVAL_SECONDS = 30.0
+FORCED_AP_HOLD_SECONDS = 600.0
+HISTORY_LENGTH = 256
+STATUS_HISTORY_LIMIT = 10
+FLAP_WINDOW_SECONDS = 300.0
+JOURNAL_PATH = '/var/log/pi-netconfig/transitions.jsonl'
+JOURNAL_MAX_BYTES = 256 * 1024
+TRANSITION_STEP_TIMEOUT_SECONDS = 60.0
+CHECKPOINT_PATH = '/run/pi-netconfig/state.json'
+CHECKPOINT_MAX_AGE_SECONDS = 120.0
+CHECKPOINT_VERSION = 1
 
 
 class SystemState(Enum):
@@ -39,6 +60,609 @@ class ComponentInitializationError(StateMonitorError):
     pass
 
 
+class StateCheckpoint:
+    """Last-known state persisted on tmpfs for warm restarts.
+    
+    /run is cleared on reboot, so a checkpoint only ever describes the
+    current boot. Writes go to a temporary file in the same directory and
+    are renamed into place, so readers never see a partial file.
+    
+    Attributes:
+        path: Checkpoint file location
+        max_age: Seconds after which a checkpoint is ignored
+    """
+    
+    def __init__(self, path: str = CHECKPOINT_PATH,
+                 max_age: float = CHECKPOINT_MAX_AGE_SECONDS):
+        """Initialize checkpoint location and freshness limit.
+        
+        Args:
+            path: Checkpoint file location
+            max_age: Seconds after which a checkpoint is ignored
+        """
+        self.path = path
+        self.max_age = max_age
+        self.logger = logging.getLogger('StateMonitor')
+    
+    def save(self, data: Dict[str, Any]) -> bool:
+        """Atomically write checkpoint data.
+        
+        Args:
+            data: JSON-serializable state fields
+        
+        Returns:
+            bool: True if written; failures are logged, never raised
+        """
+        payload = dict(data, version=CHECKPOINT_VERSION, saved_at=time.time())
+        directory = os.path.dirname(self.path) or '.'
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix='.state-', dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(payload, f)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            return True
+        except OSError as e:
+            self.logger.warning(f"Failed to write state checkpoint: {e}")
+            return False
+    
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Read checkpoint if present, valid and fresh.
+        
+        Returns:
+            Optional[Dict[str, Any]]: Checkpoint data, or None
+        """
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable state checkpoint: {e}")
+            return None
+        
+        if not isinstance(data, dict) or data.get('version') != CHECKPOINT_VERSION:
+            return None
+        if data.get('state') not in SystemState.__members__:
+            return None
+        try:
+            age = time.time() - float(data['saved_at'])
+        except (KeyError, TypeError, ValueError):
+            return None
+        # Negative age means the clock stepped back (e.g. NTP after boot)
+        if not 0 <= age <= self.max_age:
+            self.logger.info(f"State checkpoint is stale ({age:.0f}s), starting fresh")
+            return None
+        return data
+
+
+@dataclass(frozen=True)
+class TransitionEvent:
+    """One recorded state change.
+    
+    Attributes:
+        timestamp: Wall-clock time of the change
+        from_state: State name left
+        to_state: State name entered
+        reason: What caused the change (e.g. 'connected', 'failures', 'forced')
+        duration: Seconds spent in from_state
+        probe: Last connection check result ({'connected', 'latency'}), if any
+    """
+    timestamp: float
+    from_state: str
+    to_state: str
+    reason: str
+    duration: float
+    probe: Optional[Dict[str, Any]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the JSON form used by the journal, status and ctl history."""
+        return {
+            'timestamp': self.timestamp,
+            'from': self.from_state,
+            'to': self.to_state,
+            'reason': self.reason,
+            'duration': self.duration,
+            'probe': self.probe,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TransitionEvent':
+        """Build an event from its JSON form.
+        
+        Raises:
+            KeyError, TypeError, ValueError: If data is malformed
+        """
+        probe = data.get('probe')
+        return cls(
+            timestamp=float(data['timestamp']),
+            from_state=SystemState[data['from']].name,
+            to_state=SystemState[data['to']].name,
+            reason=str(data.get('reason', '')),
+            duration=float(data.get('duration') or 0.0),
+            probe=dict(probe) if probe is not None else None,
+        )
+
+
+@dataclass(frozen=True)
+class StatusSnapshot:
+    """Immutable view of monitor state for readers on any thread.
+    
+    StateMonitor builds a new snapshot on the event loop after every check,
+    transition or forced change and publishes it by swapping one attribute
+    reference, which is atomic. HTTP threads read it without locks or loop
+    round-trips; a reader sees either the old or the new snapshot, never a
+    mix.
+    
+    Attributes:
+        state: Current state name
+        ssid: Configured network while in CLIENT, else None
+        ap_active: True while in AP_MODE
+        failure_count: Consecutive failed checks
+        last_probe_rtt: Seconds the latest connection check took
+        last_check: Wall-clock time of the latest check
+        last_transition: Wall-clock time of the latest transition
+        ap_hold_until: End of a forced AP_MODE hold, if any
+        time_to_stable: Seconds from process start to first CLIENT/AP_MODE
+        startup_path: How the first stable state was reached
+        history: Newest transitions, oldest first
+        transition_stats: Time per state and flap counts (read-only mapping)
+        published_at: Wall-clock time the snapshot was built
+    """
+    state: str
+    ssid: Optional[str]
+    ap_active: bool
+    failure_count: int
+    last_probe_rtt: Optional[float]
+    last_check: Optional[float]
+    last_transition: Optional[float]
+    ap_hold_until: Optional[float]
+    time_to_stable: Optional[float]
+    startup_path: str
+    history: Tuple[TransitionEvent, ...]
+    transition_stats: Mapping[str, Any]
+    published_at: float
+
+    def __post_init__(self) -> None:
+        # Shared across threads: wrap the stats (and nested dicts) read-only
+        stats = {key: MappingProxyType(dict(value)) if isinstance(value, Mapping) else value
+                 for key, value in self.transition_stats.items()}
+        object.__setattr__(self, 'transition_stats', MappingProxyType(stats))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the JSON form served by /api/status and ctl status."""
+        return {
+            'state': self.state,
+            'ssid': self.ssid,
+            'ap_active': self.ap_active,
+            'failure_count': self.failure_count,
+            'last_probe_rtt': self.last_probe_rtt,
+            'last_check': self.last_check,
+            'last_transition': self.last_transition,
+            'ap_hold_until': self.ap_hold_until,
+            'time_to_stable': self.time_to_stable,
+            'startup_path': self.startup_path,
+            'history': [event.to_dict() for event in self.history],
+            'transition_stats': {key: dict(value) if isinstance(value, Mapping) else value
+                                 for key, value in self.transition_stats.items()},
+            'published_at': self.published_at,
+        }
+
+
+class TransitionHistory:
+    """Fixed-capacity ring buffer of transition events, oldest first.
+    
+    Slots are preallocated and overwritten in place, so recording a
+    transition never allocates beyond the event itself and memory stays
+    bounded however long the service runs.
+    
+    Attributes:
+        capacity: Maximum events retained
+    """
+    
+    def __init__(self, capacity: int = HISTORY_LENGTH):
+        """Initialize empty buffer.
+        
+        Args:
+            capacity: Maximum events retained (at least 1)
+        """
+        self.capacity = max(1, capacity)
+        self.slots: List[Optional[TransitionEvent]] = [None] * self.capacity
+        self.start = 0
+        self.count = 0
+    
+    def append(self, event: TransitionEvent) -> None:
+        """Add event, overwriting the oldest when full."""
+        self.slots[(self.start + self.count) % self.capacity] = event
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def __iter__(self) -> Iterator[TransitionEvent]:
+        for offset in range(self.count):
+            yield self.slots[(self.start + offset) % self.capacity]
+    
+    def __getitem__(self, index: int) -> TransitionEvent:
+        """Return event by position (negative counts from newest)."""
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('transition history index out of range')
+        return self.slots[(self.start + index) % self.capacity]
+    
+    def last(self) -> Optional[TransitionEvent]:
+        """Return newest event, or None if empty."""
+        return self[-1] if self.count else None
+    
+    def recent(self, limit: Optional[int] = None) -> List[TransitionEvent]:
+        """Return up to limit newest events, oldest first (all if limit is None)."""
+        events = list(self)
+        if limit is not None:
+            events = events[-limit:] if limit > 0 else []
+        return events
+    
+    def stats(self, now: float, current_state: str, since: float) -> Dict[str, Any]:
+        """Summarize time per state and flapping over the retained window.
+        
+        Args:
+            now: Current wall-clock time
+            current_state: State name held since the newest event
+            since: Time current_state was entered
+        
+        Returns:
+            Dict[str, Any]: time_in_state (seconds per state name), ap_entries,
+                flaps (AP_MODE episodes shorter than FLAP_WINDOW_SECONDS),
+                and window (seconds covered)
+        """
+        time_in_state = {state.name: 0.0 for state in SystemState}
+        ap_entries = flaps = 0
+        for event in self:
+            time_in_state[event.from_state] += event.duration
+            if event.to_state == SystemState.AP_MODE.name:
+                ap_entries += 1
+            elif event.from_state == SystemState.AP_MODE.name and \
+                    event.duration < FLAP_WINDOW_SECONDS:
+                flaps += 1
+        time_in_state[current_state] += max(0.0, now - since)
+        return {
+            'time_in_state': time_in_state,
+            'ap_entries': ap_entries,
+            'flaps': flaps,
+            'window': sum(time_in_state.values()),
+        }
+
+
+class TransitionJournal:
+    """Append-only on-disk log of transitions, replayed at startup.
+    
+    Each transition is one JSON line, appended and fsynced so it survives
+    power loss. A torn final line is skipped on replay. Once the file grows
+    past max_bytes it is rewritten (atomically, like StateCheckpoint) with
+    only the events still held in memory. The state machine hands events to
+    submit(); a writer thread does the file I/O so fsync never blocks the
+    event loop.
+    
+    Attributes:
+        path: Journal file location
+        max_bytes: Size that triggers compaction
+        queue: Submitted (event, retained events) pairs awaiting the writer
+    """
+    
+    def __init__(self, path: str = JOURNAL_PATH, max_bytes: int = JOURNAL_MAX_BYTES):
+        """Initialize journal location and size limit.
+        
+        Args:
+            path: Journal file location
+            max_bytes: Size that triggers compaction
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.queue: queue.Queue = queue.Queue()
+        self.writer: Optional[threading.Thread] = None
+        self.writer_lock = threading.Lock()
+        self.logger = logging.getLogger('StateMonitor')
+    
+    def submit(self, event: TransitionEvent, retained: List[TransitionEvent]) -> None:
+        """Queue event for the writer thread without blocking.
+        
+        Args:
+            event: Transition to append
+            retained: Events to keep if the append triggers compaction
+        """
+        with self.writer_lock:
+            if self.writer is None or not self.writer.is_alive():
+                self.writer = threading.Thread(target=self.write_queued,
+                                               name='TransitionJournal', daemon=True)
+                self.writer.start()
+        self.queue.put((event, retained))
+    
+    def write_queued(self) -> None:
+        """Writer thread: append queued events, compacting when needed."""
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                event, retained = item
+                self.append(event)
+                if self.needs_compaction():
+                    self.compact(retained)
+            finally:
+                self.queue.task_done()
+    
+    def flush(self) -> None:
+        """Block until every submitted event has been written."""
+        if self.writer is not None:
+            self.queue.join()
+    
+    def close(self, timeout: float = 5.0) -> None:
+        """Write what is queued, then stop the writer thread."""
+        with self.writer_lock:
+            writer, self.writer = self.writer, None
+        if writer is not None and writer.is_alive():
+            self.queue.put(None)
+            writer.join(timeout)
+    
+    @staticmethod
+    def encode(event: TransitionEvent) -> str:
+        """Serialize one journal line."""
+        return json.dumps(event.to_dict(), separators=(',', ':')) + '\n'
+    
+    def append(self, event: TransitionEvent) -> bool:
+        """Append event durably.
+        
+        Returns:
+            bool: True if written; failures are logged, never raised
+        """
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(self.encode(event))
+                f.flush()
+                os.fsync(f.fileno())
+            return True
+        except OSError as e:
+            self.logger.warning(f"Failed to append transition journal: {e}")
+            return False
+    
+    def needs_compaction(self) -> bool:
+        """Return True once the file has grown past max_bytes."""
+        try:
+            return os.path.getsize(self.path) > self.max_bytes
+        except OSError:
+            return False
+    
+    def compact(self, events: List[TransitionEvent]) -> bool:
+        """Atomically replace the journal with events.
+        
+        Returns:
+            bool: True if rewritten; failures are logged, never raised
+        """
+        directory = os.path.dirname(self.path) or '.'
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix='.transitions-', dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    f.writelines(self.encode(event) for event in events)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            return True
+        except OSError as e:
+            self.logger.warning(f"Failed to compact transition journal: {e}")
+            return False
+    
+    def load(self) -> List[TransitionEvent]:
+        """Read all valid events, skipping malformed lines.
+        
+        Returns:
+            List[TransitionEvent]: Events oldest first (empty if no journal)
+        """
+        events: List[TransitionEvent] = []
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        events.append(TransitionEvent.from_dict(json.loads(line)))
+                    except (KeyError, TypeError, ValueError, AttributeError):
+                        continue
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning(f"Ignoring unreadable transition journal: {e}")
+        return events
+
+
+@dataclass(eq=False)
+class TransitionRequest:
+    """A queued transition and the future its requesters await."""
+    target: SystemState
+    action: Callable[[], Awaitable[None]]
+    future: asyncio.Future
+
+
+class TransitionExecutor:
+    """Runs state transitions one at a time from a single queue.
+    
+    The monitoring loop, the control socket and recovery can all ask for a
+    transition; requests are serialized so two never run concurrently.
+    A request for the target already pending (or running with nothing
+    queued behind it) is coalesced onto that request. A request for a
+    different target supersedes: queued requests are dropped and a running
+    transition is cancelled, its requesters seeing False. Each component
+    step runs under a timeout. The worker task exists only while requests
+    are queued.
+    
+    Attributes:
+        step_timeout: Seconds allowed for one component step
+        queue: Pending requests, oldest first
+        running: Request currently executing, if any
+        superseded: Set when supersede() cancelled the running request
+        counters: Requests, coalesced, superseded, step timeouts, queue peak
+        step_seconds: Duration of the latest run of each named step
+    """
+    
+    def __init__(self, step_timeout: float = TRANSITION_STEP_TIMEOUT_SECONDS):
+        """Initialize idle executor.
+        
+        Args:
+            step_timeout: Seconds allowed for one component step
+        """
+        self.step_timeout = step_timeout
+        self.queue: Optional[asyncio.Queue] = None
+        self.pending: List[TransitionRequest] = []
+        self.running: Optional[TransitionRequest] = None
+        self.running_task: Optional[asyncio.Task] = None
+        self.superseded = False
+        self.worker: Optional[asyncio.Task] = None
+        self.counters: Dict[str, int] = {
+            'transition_requests': 0,
+            'transitions_coalesced': 0,
+            'transitions_superseded': 0,
+            'transition_step_timeouts': 0,
+            'transition_queue_peak': 0,
+        }
+        self.step_seconds: Dict[str, float] = {}
+        self.logger = logging.getLogger('StateMonitor')
+    
+    async def submit(self, target: SystemState, action: Callable[[], Awaitable[None]]) -> bool:
+        """Queue a transition to target and wait for its outcome.
+        
+        Args:
+            target: State the action moves to
+            action: Zero-argument callable returning the transition coroutine
+        
+        Returns:
+            bool: True if the transition ran, False if it was superseded
+        
+        Raises:
+            StateTransitionError: If the transition failed
+        """
+        self.counters['transition_requests'] += 1
+        request = self.coalesce(target)
+        if request is None:
+            self.supersede(target)
+            request = TransitionRequest(target, action,
+                                        asyncio.get_running_loop().create_future())
+            if self.queue is None:
+                self.queue = asyncio.Queue()
+            self.pending.append(request)
+            self.queue.put_nowait(request)
+            self.counters['transition_queue_peak'] = max(
+                self.counters['transition_queue_peak'], len(self.pending)
+            )
+            if self.worker is None or self.worker.done():
+                self.worker = asyncio.ensure_future(self.drain())
+        # Shielded so a cancelled requester does not cancel the transition
+        return await asyncio.shield(request.future)
+    
+    def coalesce(self, target: SystemState) -> Optional[TransitionRequest]:
+        """Return the latest pending or running request for target, if any."""
+        latest = self.pending[-1] if self.pending else self.running
+        if latest is not None and latest.target == target:
+            self.counters['transitions_coalesced'] += 1
+            self.logger.debug(f"Coalesced {target.name} transition request")
+            return latest
+        return None
+    
+    def supersede(self, target: SystemState) -> None:
+        """Drop queued requests and cancel a running one aimed elsewhere."""
+        for request in self.pending:
+            request.future.set_result(False)
+            self.counters['transitions_superseded'] += 1
+        self.pending.clear()
+        if self.running is not None and self.running.target != target and \
+                self.running_task is not None and not self.running_task.done():
+            self.logger.info(
+                f"Cancelling {self.running.target.name} transition for {target.name}"
+            )
+            self.superseded = True
+            self.running_task.cancel()
+            self.counters['transitions_superseded'] += 1
+    
+    async def drain(self) -> None:
+        """Run queued requests in order until the queue is empty."""
+        while not self.queue.empty():
+            request = self.queue.get_nowait()
+            if request.future.done():
+                continue  # superseded while queued
+            self.pending.remove(request)
+            self.running = request
+            self.superseded = False
+            self.running_task = asyncio.ensure_future(request.action())
+            try:
+                await self.running_task
+            except asyncio.CancelledError:
+                if not request.future.done():
+                    request.future.set_result(False)
+                if not self.superseded:
+                    # The worker itself was cancelled: nothing will run the rest
+                    for queued in self.pending:
+                        queued.future.set_result(False)
+                    self.pending.clear()
+                    raise
+            except Exception as e:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            else:
+                if not request.future.done():
+                    request.future.set_result(True)
+            finally:
+                self.running = None
+                self.running_task = None
+                self.superseded = False
+    
+    async def run_step(self, name: str, step: Awaitable[Any]) -> Any:
+        """Await one component step under the step timeout, recording its duration.
+        
+        Args:
+            name: Step name for metrics and errors
+            step: Component coroutine
+        
+        Raises:
+            StateTransitionError: If the step exceeds the timeout
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            return await asyncio.wait_for(step, self.step_timeout)
+        except asyncio.TimeoutError:
+            self.counters['transition_step_timeouts'] += 1
+            raise StateTransitionError(
+                f"{name} timed out after {self.step_timeout:.0f}s"
+            )
+        finally:
+            self.step_seconds[name] = round(loop.time() - started, 3)
+    
+    async def close(self) -> None:
+        """Supersede everything queued and stop the running transition."""
+        for request in self.pending:
+            request.future.set_result(False)
+        self.pending.clear()
+        for task in (self.running_task, self.worker):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Return counters and latest step durations."""
+        return dict(self.counters, transition_steps=dict(self.step_seconds))
+
+
 class StateMonitor:
     """State machine coordinating operational mode transitions.
     
@@ -50,28 +674,352 @@ class StateMonitor:
         connection_manager: Connection testing module
         ap_manager: Access point management module
         web_server: HTTP interface module
+        station_probe: Optional AP+STA probe for known networks during AP_MODE
+        dns_responder: Optional captive-portal DNS responder run during AP_MODE
+        checkpoint: Optional StateCheckpoint for warm restarts
+        boot_probe: Optional startup fast path deciding the first state
+        started_at: Monotonic time the process started
+        journal: Optional TransitionJournal persisting history across restarts
+        clock: Wall-clock source (time.time, or a virtual clock in simulation)
+        time_to_stable: Seconds from process start to first CLIENT/AP_MODE
+        startup_path: How the first stable state was reached
         current_state: Current operational state
         failure_count: Consecutive connection failure counter
         shutdown_event: Event signaling shutdown request
+        check_requested: Event waking the loop for an immediate check
+        history: Ring buffer of recent TransitionEvents
+        state_since: Wall-clock time the current state was entered
+        last_probe: Result of the latest connection check
+        executor: TransitionExecutor serializing all transitions
+        ap_partial: AP components may be up without AP_MODE (superseded entry)
+        ssid_provider: Optional callable returning the configured SSID
+        ssid: Configured SSID, read on each CLIENT entry
+        snapshot: Latest published StatusSnapshot (safe to read from any thread)
+        counters: Check and transition counts for runtime metrics
         logger: Logger instance for state monitoring
     """
     
-    def __init__(self, connection_manager, ap_manager, web_server):
+    def __init__(self, connection_manager, ap_manager, web_server, station_probe=None,
+                 dns_responder=None, checkpoint: Optional[StateCheckpoint] = None,
+                 boot_probe=None, started_at: Optional[float] = None,
+                 clock: Callable[[], float] = time.time,
+                 journal: Optional[TransitionJournal] = None,
+                 history_size: int = HISTORY_LENGTH,
+                 step_timeout: float = TRANSITION_STEP_TIMEOUT_SECONDS,
+                 ssid_provider: Optional[Callable[[], Optional[str]]] = None):
         """Initialize state machine with component dependencies.
         
         Args:
             connection_manager: ConnectionManager instance
             ap_manager: APManager instance
             web_server: WebServer instance
+            station_probe: Optional StationProbe, only on AP+STA capable chipsets
+            dns_responder: Optional DNSResponder started beside the web server
+            checkpoint: Optional StateCheckpoint saved after checks and transitions
+            boot_probe: Optional object whose initial_state() returns 'CLIENT',
+                'AP_MODE' or None from cheap link and cached-scan reads
+            started_at: Monotonic process start time (defaults to now)
+            clock: Wall-clock source for check, transition and hold times
+            journal: Optional TransitionJournal appended on every transition
+                and replayed into history at startup
+            history_size: Transitions kept in memory
+            step_timeout: Seconds allowed for each component step of a transition
+            ssid_provider: Optional callable returning the configured SSID,
+                reported in status while in CLIENT
         """
         self.connection_manager = connection_manager
         self.ap_manager = ap_manager
         self.web_server = web_server
+        self.station_probe = station_probe
+        self.dns_responder = dns_responder
+        self.checkpoint = checkpoint
+        self.boot_probe = boot_probe
+        self.started_at = time.monotonic() if started_at is None else started_at
+        self.clock = clock
+        self.journal = journal
+        self.time_to_stable: Optional[float] = None
+        self.startup_path = 'check'
         self.current_state: SystemState = SystemState.CHECKING
         self.failure_count: int = 0
         self.shutdown_event: Optional[asyncio.Event] = None
         self.monitoring_task: Optional[asyncio.Task] = None
+        self.listeners: List[Callable[['StateMonitor'], None]] = []
+        self.check_requested = asyncio.Event()
+        self.ap_hold_until: float = 0.0
+        self.last_check: Optional[float] = None
+        self.history = TransitionHistory(history_size)
+        self.state_since: float = clock()
+        self.last_probe: Optional[Dict[str, Any]] = None
+        self.executor = TransitionExecutor(step_timeout)
+        self.ap_partial = False
+        self.ssid_provider = ssid_provider
+        self.ssid: Optional[str] = None
+        self.counters: Dict[str, int] = {
+            'checks': 0,
+            'check_failures': 0,
+            'transitions': 0,
+            'forced_checks': 0,
+            'forced_ap': 0,
+        }
         self.logger = logging.getLogger('StateMonitor')
+        self.snapshot = self.build_snapshot()
+
+    def set_state(self, state: SystemState, reason: str = 'check') -> None:
+        """Set current state, recording the change in history and journal.
+        
+        Args:
+            state: New operational state
+            reason: What caused the change
+        """
+        if state == self.current_state:
+            return
+        now = self.clock()
+        event = TransitionEvent(now, self.current_state.name, state.name, reason,
+                                max(0.0, now - self.state_since), self.last_probe)
+        self.history.append(event)
+        self.record_in_journal(event)
+        self.state_since = now
+        self.counters['transitions'] += 1
+        self.current_state = state
+        self.ssid = self.read_ssid() if state == SystemState.CLIENT else None
+        if self.time_to_stable is None and state != SystemState.CHECKING:
+            self.time_to_stable = time.monotonic() - self.started_at
+            self.logger.info(
+                f"First stable state {state.name} after {self.time_to_stable:.2f}s "
+                f"(via {self.startup_path})"
+            )
+        self.save_checkpoint()
+        self.publish_status()
+    
+    def read_ssid(self) -> Optional[str]:
+        """Return the configured SSID from ssid_provider (None if unavailable)."""
+        if self.ssid_provider is None:
+            return None
+        try:
+            return self.ssid_provider()
+        except Exception:
+            self.logger.warning("Cannot read configured SSID", exc_info=True)
+            return None
+    
+    def build_snapshot(self) -> StatusSnapshot:
+        """Capture current state as an immutable snapshot (event loop only)."""
+        probe = self.last_probe or {}
+        return StatusSnapshot(
+            state=self.current_state.name,
+            ssid=self.ssid,
+            ap_active=self.current_state == SystemState.AP_MODE,
+            failure_count=self.failure_count,
+            last_probe_rtt=probe.get('latency'),
+            last_check=self.last_check,
+            last_transition=self.last_transition(),
+            ap_hold_until=self.ap_hold_until or None,
+            time_to_stable=self.time_to_stable,
+            startup_path=self.startup_path,
+            history=tuple(self.history.recent(STATUS_HISTORY_LIMIT)),
+            transition_stats=self.transition_stats(),
+            published_at=self.clock(),
+        )
+    
+    def publish_status(self) -> StatusSnapshot:
+        """Build a snapshot and swap it in for cross-thread readers.
+        
+        Returns:
+            StatusSnapshot: The snapshot just published
+        """
+        snapshot = self.build_snapshot()
+        self.snapshot = snapshot  # single reference assignment: atomic for readers
+        return snapshot
+
+    def save_checkpoint(self) -> None:
+        """Persist state, failure count and timestamps if checkpointing is enabled."""
+        if self.checkpoint is None:
+            return
+        self.checkpoint.save({
+            'state': self.current_state.name,
+            'ap_active': self.current_state == SystemState.AP_MODE,
+            'failure_count': self.failure_count,
+            'last_check': self.last_check,
+            'last_transition': self.last_transition(),
+            'ap_hold_until': self.ap_hold_until,
+        })
+    
+    def record_in_journal(self, event: TransitionEvent) -> None:
+        """Hand event to the journal writer, with history to keep on compaction."""
+        if self.journal is None:
+            return
+        self.journal.submit(event, self.history.recent())
+    
+    def replay_journal(self) -> int:
+        """Load journaled transitions from previous runs into history.
+        
+        Returns:
+            int: Number of events replayed
+        """
+        if self.journal is None:
+            return 0
+        events = self.journal.load()[-self.history.capacity:]
+        for event in events:
+            self.history.append(event)
+        if events:
+            self.logger.info(f"Replayed {len(events)} transitions from journal")
+        return len(events)
+    
+    def last_transition(self) -> Optional[float]:
+        """Return time of the newest recorded transition, if any."""
+        event = self.history.last()
+        return event.timestamp if event else None
+    
+    def transition_stats(self) -> Dict[str, Any]:
+        """Return time per state and flap counts over the retained history."""
+        return self.history.stats(self.clock(), self.current_state.name, self.state_since)
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Return counters, executor meters and transition statistics."""
+        return dict(self.counters, **self.executor.metrics(), **self.transition_stats())
+    
+    async def execute_transition(self, target: SystemState,
+                                 action: Callable[[], Awaitable[None]]) -> bool:
+        """Run a transition through the executor.
+        
+        All transitions go through here so concurrent requesters (monitoring
+        loop, control socket, recovery) never interleave component calls.
+        
+        Args:
+            target: State the action moves to
+            action: Zero-argument callable returning the transition coroutine
+        
+        Returns:
+            bool: True if it ran, False if a later request superseded it
+        
+        Raises:
+            StateTransitionError: If the transition failed
+        """
+        return await self.executor.submit(target, action)
+
+    async def resume_from_checkpoint(self) -> bool:
+        """Restore state from a fresh checkpoint instead of starting in CHECKING.
+        
+        AP_MODE is re-entered immediately (the web server and DNS responder
+        died with the previous process); CLIENT is restored directly and
+        confirmed by the first regular check.
+        
+        Returns:
+            bool: True if a checkpoint was applied
+        """
+        if self.checkpoint is None:
+            return False
+        data = self.checkpoint.load()
+        if data is None:
+            return False
+        
+        state = SystemState[data['state']]
+        self.startup_path = 'checkpoint'
+        self.failure_count = int(data.get('failure_count') or 0)
+        self.last_check = data.get('last_check')
+        self.ap_hold_until = float(data.get('ap_hold_until') or 0.0)
+        self.logger.info(
+            f"Resuming {state.name} from checkpoint (failures={self.failure_count})"
+        )
+        try:
+            if state == SystemState.AP_MODE:
+                await self.execute_transition(
+                    SystemState.AP_MODE, lambda: self.transition_to_ap_mode(reason='checkpoint')
+                )
+            else:
+                self.set_state(state, reason='checkpoint')
+        except StateTransitionError:
+            self.logger.warning("Checkpoint resume failed, starting from CHECKING")
+            self.current_state = SystemState.CHECKING
+            self.startup_path = 'check'
+            return False
+        return True
+
+    async def apply_boot_fast_path(self) -> bool:
+        """Skip CHECKING when cheap startup reads already decide the state.
+        
+        Goes straight to CLIENT when the configured SSID is associated with
+        a default route, or straight to AP_MODE when there is no route and
+        no known network in NetworkManager's cached scan.
+        
+        Returns:
+            bool: True if the fast path decided the first state
+        """
+        if self.boot_probe is None:
+            return False
+        loop = asyncio.get_running_loop()
+        try:
+            decision = await loop.run_in_executor(None, self.boot_probe.initial_state)
+        except Exception:
+            self.logger.warning("Boot fast path failed", exc_info=True)
+            return False
+        if decision not in ('CLIENT', 'AP_MODE'):
+            return False
+        
+        self.startup_path = 'fast path'
+        try:
+            if decision == 'CLIENT':
+                self.failure_count = 0
+                self.set_state(SystemState.CLIENT, reason='fast path')
+            else:
+                self.failure_count = 3
+                await self.execute_transition(
+                    SystemState.AP_MODE, lambda: self.transition_to_ap_mode(reason='fast path')
+                )
+        except StateTransitionError:
+            self.logger.warning("Boot fast path transition failed, starting from CHECKING")
+            self.startup_path = 'check'
+            return False
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        """Return the latest published snapshot as a dict.
+        
+        Safe to call from any thread (e.g. the web server's request
+        handlers): it only reads the current snapshot reference.
+        """
+        return self.snapshot.to_dict()
+
+    def request_check(self) -> None:
+        """Wake the monitoring loop to run a connection check now."""
+        self.counters['forced_checks'] += 1
+        self.check_requested.set()
+
+    async def force_ap_mode(self, hold: float = FORCED_AP_HOLD_SECONDS) -> None:
+        """Enter AP_MODE on request and keep it for hold seconds.
+        
+        Successful checks during the hold do not return to CLIENT, so the
+        portal stays reachable for reconfiguration.
+        
+        Args:
+            hold: Seconds to stay in AP_MODE regardless of connectivity
+        
+        Raises:
+            StateTransitionError: If AP activation fails
+        """
+        self.counters['forced_ap'] += 1
+        self.ap_hold_until = self.clock() + hold
+        if self.current_state != SystemState.AP_MODE:
+            await self.execute_transition(
+                SystemState.AP_MODE, lambda: self.transition_to_ap_mode(reason='forced')
+            )
+        self.save_checkpoint()
+        self.publish_status()
+
+    def add_listener(self, listener: Callable[['StateMonitor'], None]) -> None:
+        """Register a callback run on the event loop after every completed check.
+        
+        Args:
+            listener: Callable receiving this StateMonitor
+        """
+        self.listeners.append(listener)
+
+    def notify_listeners(self) -> None:
+        """Invoke listeners; a failing listener never stops monitoring."""
+        for listener in self.listeners:
+            try:
+                listener(self)
+            except Exception:
+                self.logger.warning("State listener failed", exc_info=True)
 
     async def initialize(self) -> None:
         """Initialize state machine and component instances.
@@ -82,9 +1030,12 @@ class StateMonitor:
             ComponentInitializationError: If component initialization fails
         """
         self.shutdown_event = asyncio.Event()
+        self.replay_journal()
         try:
             # Components should already be initialized by their constructors
-            # This method exists for future initialization needs
+            if not await self.resume_from_checkpoint():
+                await self.apply_boot_fast_path()
+            self.publish_status()
             self.logger.debug("State machine initialization complete")
         except Exception as e:
             raise ComponentInitializationError(
@@ -94,6 +1045,18 @@ class StateMonitor:
         self.monitoring_task = asyncio.create_task(self.monitoring_loop())
         self.logger.info("State monitoring started")
 
+    async def run(self) -> None:
+        """Initialize and run the monitoring loop until it finishes.
+        
+        Used by the service controller, which owns the shutdown signal and
+        calls shutdown() separately.
+        """
+        await self.initialize()
+        try:
+            await self.monitoring_task
+        except asyncio.CancelledError:
+            pass
+
     async def monitoring_loop(self) -> None:
         """Main monitoring loop checking connection status every 30 seconds.
         
@@ -105,15 +1068,27 @@ class StateMonitor:
         try:
             while not self.shutdown_event.is_set():
                 try:
+                    check_started = self.clock()
                     connected = await self.check_connection()
+                    self.last_check = self.clock()
+                    self.last_probe = {
+                        'connected': connected,
+                        'latency': round(self.last_check - check_started, 3),
+                    }
+                    self.counters['checks'] += 1
+                    if not connected:
+                        self.counters['check_failures'] += 1
                     self.logger.debug(
                         f"Connection check: {'connected' if connected else 'disconnected'}, "
                         f"state={self.current_state.name}, failures={self.failure_count}"
                     )
                     
                     if connected:
-                        if self.current_state != SystemState.CLIENT:
-                            await self.transition_to_client()
+                        if self.current_state == SystemState.AP_MODE and self.clock() < self.ap_hold_until:
+                            self.logger.debug("Connected, but AP_MODE held by request")
+                        elif self.current_state != SystemState.CLIENT:
+                            await self.execute_transition(SystemState.CLIENT,
+                                                          self.transition_to_client)
                         else:
                             # Reset failure count on successful check in CLIENT state
                             self.failure_count = 0
@@ -122,7 +1097,10 @@ class StateMonitor:
                         self.logger.debug(f"Connection failure count: {self.failure_count}")
                         
                         if self.failure_count >= 3 and self.current_state != SystemState.AP_MODE:
-                            await self.transition_to_ap_mode()
+                            await self.execute_transition(SystemState.AP_MODE,
+                                                          self.transition_to_ap_mode)
+                        elif self.current_state == SystemState.AP_MODE and self.station_probe:
+                            await self.probe_upstream()
                             
                 except asyncio.CancelledError:
                     self.logger.info("Monitoring loop cancelled")
@@ -130,21 +1108,37 @@ class StateMonitor:
                 except Exception as e:
                     await self.handle_state_transition_failure(e)
                 
-                # Wait 30 seconds before next check
-                try:
-                    await asyncio.wait_for(
-                        self.shutdown_event.wait(),
-                        timeout=30.0
-                    )
-                    # If we get here, shutdown was requested
+                self.save_checkpoint()
+                self.publish_status()
+                self.notify_listeners()
+                
+                # Wait 30 seconds before next check, or less if one is requested
+                if await self.wait_for_next_check():
+                    # Shutdown was requested
                     break
-                except asyncio.TimeoutError:
-                    # Timeout is normal - continue monitoring
-                    pass
                     
         except asyncio.CancelledError:
             self.logger.info("Monitoring loop terminated")
 
+    async def wait_for_next_check(self) -> bool:
+        """Sleep until the check interval elapses or a check is requested.
+        
+        Returns:
+            bool: True if shutdown was requested
+        """
+        self.check_requested.clear()
+        waiters = [
+            asyncio.ensure_future(self.shutdown_event.wait()),
+            asyncio.ensure_future(self.check_requested.wait()),
+        ]
+        try:
+            await asyncio.wait(waiters, timeout=CHECK_INTERVAL_SECONDS,
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        return self.shutdown_event.is_set()
+
     async def check_connection(self) -> bool:
         """Check current connection status.
         
@@ -158,10 +1152,56 @@ class StateMonitor:
             self.logger.warning("Connection check failed", exc_info=True)
             return False
 
-    async def transition_to_client(self) -> None:
+    async def probe_upstream(self) -> bool:
+        """Look for a known network on the station interface while the AP stays up.
+        
+        The portal is only torn down once the upstream link is confirmed by a
+        connection check; otherwise the station interface is released and
+        AP_MODE continues. On success the AP is torn down, the connection is
+        activated on the primary interface, and only then is the station
+        interface (which carried the confirmed link) released.
+        
+        Returns:
+            bool: True if the state machine moved to CLIENT
+        """
+        ssid = await self.station_probe.find_known_network()
+        if ssid is None:
+            return False
+        
+        self.logger.info(f"Known network '{ssid}' visible on station interface")
+        if await self.station_probe.connect_known(ssid) and await self.check_connection():
+            self.logger.info(f"Upstream confirmed via '{ssid}', leaving AP_MODE")
+            await self.execute_transition(SystemState.CLIENT, lambda: self.hand_over(ssid))
+            await self.station_probe.release()
+            return True
+        
+        self.logger.warning(f"Upstream via '{ssid}' not confirmed, keeping AP_MODE")
+        await self.station_probe.release()
+        return False
+
+    async def hand_over(self, ssid: str) -> None:
+        """Leave AP_MODE and move the probed connection onto the primary interface.
+        
+        Args:
+            ssid: Network confirmed over the station interface
+        
+        Raises:
+            StateTransitionError: If the CLIENT transition fails
+        """
+        await self.transition_to_client(reason='station probe')
+        if not await self.executor.run_step('activate_primary',
+                                            self.station_probe.activate_primary(ssid)):
+            self.logger.warning(f"Could not activate '{ssid}' on the primary interface; "
+                                "the next check decides")
+
+    async def transition_to_client(self, reason: str = 'connected') -> None:
         """Transition to CLIENT mode.
         
         Deactivates AP mode if active, stops web server, and resets failure count.
+        Callers go through execute_transition.
+        
+        Args:
+            reason: What caused the change, recorded in history
         
         Raises:
             StateTransitionError: If transition fails
@@ -169,12 +1209,15 @@ class StateMonitor:
         try:
             self.logger.info("Transitioning to CLIENT mode")
             
-            if self.current_state == SystemState.AP_MODE:
-                await self.ap_manager.deactivate_ap()
-                await self.web_server.stop_server()
+            if self.current_state == SystemState.AP_MODE or self.ap_partial:
+                await self.stop_dns_responder()
+                await self.executor.run_step('deactivate_ap', self.ap_manager.deactivate_ap())
+                await self.executor.run_step('stop_server', self.web_server.stop_server())
+                self.ap_partial = False
             
-            self.current_state = SystemState.CLIENT
             self.failure_count = 0
+            self.ap_hold_until = 0.0
+            self.set_state(SystemState.CLIENT, reason)
             self.logger.info("Successfully transitioned to CLIENT mode")
             
         except Exception as e:
@@ -183,10 +1226,16 @@ class StateMonitor:
                 "Failed to transition to CLIENT mode"
             ) from e
 
-    async def transition_to_ap_mode(self) -> None:
+    async def transition_to_ap_mode(self, reason: str = 'failures') -> None:
         """Transition to AP_MODE.
         
-        Activates access point and starts web server on port 8080.
+        Activates access point and starts web server on port 8080. Callers
+        go through execute_transition; if superseded mid-way, the components
+        already brought up stay flagged so the next CLIENT transition tears
+        them down.
+        
+        Args:
+            reason: What caused the change, recorded in history
         
         Raises:
             StateTransitionError: If transition fails
@@ -194,10 +1243,13 @@ class StateMonitor:
         try:
             self.logger.info("Transitioning to AP_MODE")
             
-            await self.ap_manager.activate_ap()
-            await self.web_server.start_server()
+            self.ap_partial = True
+            await self.executor.run_step('activate_ap', self.ap_manager.activate_ap())
+            await self.executor.run_step('start_server', self.web_server.start_server())
+            await self.start_dns_responder()
             
-            self.current_state = SystemState.AP_MODE
+            self.ap_partial = False
+            self.set_state(SystemState.AP_MODE, reason)
             self.logger.info("Successfully transitioned to AP_MODE")
             
         except Exception as e:
@@ -206,6 +1258,24 @@ class StateMonitor:
                 "Failed to transition to AP_MODE"
             ) from e
 
+    async def start_dns_responder(self) -> None:
+        """Start captive-portal DNS if configured; failures leave AP_MODE usable."""
+        if not self.dns_responder:
+            return
+        try:
+            await self.executor.run_step('start_dns', self.dns_responder.start())
+        except Exception:
+            self.logger.warning("Captive-portal DNS unavailable", exc_info=True)
+
+    async def stop_dns_responder(self) -> None:
+        """Stop captive-portal DNS if configured."""
+        if not self.dns_responder:
+            return
+        try:
+            await self.executor.run_step('stop_dns', self.dns_responder.stop())
+        except Exception:
+            self.logger.warning("Failed to stop captive-portal DNS", exc_info=True)
+
     async def handle_state_transition_failure(self, error: Exception) -> None:
         """Handle state transition failures with recovery attempts.
         
@@ -221,10 +1291,14 @@ class StateMonitor:
             # Attempt recovery to current state
             if self.current_state == SystemState.CLIENT:
                 self.logger.warning("Attempting recovery to CLIENT state")
-                await self.transition_to_client()
+                await self.execute_transition(
+                    SystemState.CLIENT, lambda: self.transition_to_client(reason='recovery')
+                )
             elif self.current_state == SystemState.AP_MODE:
                 self.logger.warning("Attempting recovery to AP_MODE state")
-                await self.transition_to_ap_mode()
+                await self.execute_transition(
+                    SystemState.AP_MODE, lambda: self.transition_to_ap_mode(reason='recovery')
+                )
         except Exception as recovery_error:
             self.logger.critical(
                 "Failed to recover from state transition failure",
@@ -234,8 +1308,9 @@ class StateMonitor:
     async def shutdown(self) -> None:
         """Gracefully shutdown state machine and all components.
         
-        Cancels monitoring task, deactivates AP if active, stops web server,
-        and performs cleanup on all components.
+        Cancels monitoring task and any queued or running transition,
+        deactivates AP if active, stops web server, performs cleanup on
+        all components and flushes the transition journal.
         """
         self.logger.info("Initiating shutdown")
         self.shutdown_event.set()
@@ -247,15 +1322,23 @@ class StateMonitor:
                 await self.monitoring_task
             except asyncio.CancelledError:
                 pass
+        await self.executor.close()
         
         # Deactivate components
         try:
-            if self.current_state == SystemState.AP_MODE:
+            if self.station_probe:
+                await self.station_probe.release()
+            if self.current_state == SystemState.AP_MODE or self.ap_partial:
+                await self.stop_dns_responder()
                 await self.ap_manager.deactivate_ap()
                 await self.web_server.stop_server()
         except Exception as e:
             self.logger.warning("Component shutdown failed", exc_info=True)
         
+        # Let the journal writer finish queued transitions
+        if self.journal is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.journal.close)
+        
         self.logger.info("Shutdown complete")
 
 
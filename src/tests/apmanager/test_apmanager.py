@@ -9,6 +9,7 @@ from subprocess import CalledProcessError
 
 import sys
 import os
+import time
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../'))
 
 from apmanager import (
@@ -20,8 +21,24 @@ from apmanager import (
     APManagerError,
     InterfaceDetectionError,
     APActivationError,
-    ProfileCreationError
+    ProfileCreationError,
+    channel_overlap,
+    score_channels,
+    select_channel,
+    InterfaceCapabilities,
+    StationProbe
 )
+from connectionmanager import BSSIDEntry, NetworkScanError, ScanCache, ScanResult
+
+
+def synthetic_scan(*channel_signals):
+    """Build a ScanResult from (channel, signal) pairs."""
+    entries = []
+    for i, (channel, signal) in enumerate(channel_signals):
+        frequency = 2407 + 5 * channel if channel <= 14 else 5000 + 5 * channel
+        entries.append(BSSIDEntry(f"Net{i}", f"00:00:00:00:00:{i:02X}", signal,
+                                  "WPA2", frequency, channel, 130))
+    return ScanResult(entries)
 
 
 class TestAccessPointInitialization:
@@ -152,6 +169,243 @@ class TestProfileCreation:
                 ap.create_ap_profile()
 
 
+class TestChannelSelection:
+    """Test congestion scoring and channel selection with synthetic scans."""
+    
+    def test_channel_overlap_24ghz_decays_with_distance(self):
+        """Adjacent 2.4 GHz channels overlap partially, 1/6/11 do not."""
+        assert channel_overlap(6, 6) == 1.0
+        assert 0.0 < channel_overlap(6, 4) < channel_overlap(6, 5) < 1.0
+        assert channel_overlap(1, 6) == 0.0
+        assert channel_overlap(6, 11) == 0.0
+    
+    def test_channel_overlap_5ghz_exact_only(self):
+        """5 GHz channels only congest their own channel."""
+        assert channel_overlap(36, 36) == 1.0
+        assert channel_overlap(36, 40) == 0.0
+        assert channel_overlap(36, 6) == 0.0
+    
+    def test_score_channels_counts_bssids_and_signal(self):
+        """More and stronger BSSIDs increase the score."""
+        scan = synthetic_scan((1, 20), (6, 80), (6, 80), (11, 90))
+        
+        scores = score_channels(scan, (1, 6, 11))
+        
+        assert scores[1] < scores[11] < scores[6]
+    
+    def test_score_channels_includes_adjacent_overlap(self):
+        """BSSIDs on channel 3 congest channel 1 more than channel 6."""
+        scan = synthetic_scan((3, 70), (3, 70))
+        
+        scores = score_channels(scan, (1, 6, 11))
+        
+        assert scores[1] > scores[6] > 0.0
+        assert scores[11] == 0.0
+    
+    def test_select_channel_picks_least_congested_24ghz(self):
+        """Chooses the quietest of 1/6/11."""
+        scan = synthetic_scan((1, 60), (1, 50), (6, 40), (11, 70), (11, 65), (11, 30))
+        
+        assert select_channel(scan) == ('bg', 6)
+    
+    def test_select_channel_empty_scan_prefers_channel_1(self):
+        """Ties resolve to the first 2.4 GHz candidate."""
+        assert select_channel(ScanResult([])) == ('bg', 1)
+    
+    def test_select_channel_uses_5ghz_when_supported(self):
+        """Busy 2.4 GHz band moves the AP to a quiet 5 GHz channel."""
+        scan = synthetic_scan((1, 60), (6, 60), (11, 60), (36, 80))
+        
+        assert select_channel(scan, supports_5ghz=True) == ('a', 40)
+        assert select_channel(scan, supports_5ghz=False)[0] == 'bg'
+    
+    def test_create_ap_profile_pins_channel(self):
+        """nmcli con add carries band and channel from the scan."""
+        device_output = b"DEVICE  TYPE=wifi  STATE\nwlan0   TYPE=wifi  connected\n"
+        show_output = b"GENERAL.HWADDR: AA:BB:CC:DD:EE:FF\n"
+        scan = synthetic_scan((1, 60), (11, 60))
+        
+        with patch('apmanager.check_output', side_effect=[device_output, show_output]):
+            ap = AccessPoint()
+        
+        with patch('apmanager.check_output', return_value=b"WIFI-PROPERTIES.5GHZ:no\n") as mock_check:
+            ap.create_ap_profile(scan)
+            
+            add_call = mock_check.call_args_list[1][0][0]
+            assert add_call[-4:] == ["802-11-wireless.band", "bg", "802-11-wireless.channel", "6"]
+    
+    def test_create_ap_profile_without_scan_leaves_channel_unset(self):
+        """No cached scan means no channel pinning."""
+        device_output = b"DEVICE  TYPE=wifi  STATE\nwlan0   TYPE=wifi  connected\n"
+        show_output = b"GENERAL.HWADDR: AA:BB:CC:DD:EE:FF\n"
+        
+        with patch('apmanager.check_output', side_effect=[device_output, show_output]):
+            ap = AccessPoint()
+        
+        with patch('apmanager.check_output') as mock_check, \
+             patch('apmanager.ScanCache.latest', return_value=None), \
+             patch('apmanager.NetworkScanner.cached_scan', return_value=ScanResult([])):
+            ap.create_ap_profile()
+            
+            add_call = mock_check.call_args_list[0][0][0]
+            assert "802-11-wireless.channel" not in add_call
+    
+    def make_ap(self):
+        device_output = b"DEVICE  TYPE=wifi  STATE\nwlan0   TYPE=wifi  connected\n"
+        show_output = b"GENERAL.HWADDR: AA:BB:CC:DD:EE:FF\n"
+        with patch('apmanager.check_output', side_effect=[device_output, show_output]):
+            ap = AccessPoint()
+        ap.supports_5ghz = Mock(return_value=False)
+        return ap
+    
+    def test_plan_channel_uses_fresh_cache(self):
+        """A scan within the cache TTL is used without asking NetworkManager."""
+        ap = self.make_ap()
+        
+        with patch('apmanager.ScanCache.latest', return_value=synthetic_scan((1, 60), (11, 60))), \
+             patch('apmanager.NetworkScanner.cached_scan') as mock_cached:
+            assert ap.plan_channel() == ('bg', 6)
+        
+        mock_cached.assert_not_called()
+    
+    def test_plan_channel_skips_stale_cache(self):
+        """An expired cached scan is replaced by NetworkManager's last scan."""
+        ap = self.make_ap()
+        stale = ScanResult(synthetic_scan((6, 60)).entries,
+                           timestamp=time.time() - ScanCache.TTL_SECONDS - 60)
+        
+        with patch('apmanager.ScanCache.latest', return_value=stale), \
+             patch('apmanager.NetworkScanner.cached_scan',
+                   return_value=synthetic_scan((1, 60), (6, 60))):
+            assert ap.plan_channel() == ('bg', 11)
+    
+    @pytest.mark.parametrize('cached', [
+        {'return_value': ScanResult([])},
+        {'side_effect': NetworkScanError('nmcli failed')},
+    ])
+    def test_plan_channel_without_scan_data(self, cached):
+        """Empty cache and no usable NetworkManager list leave the channel unset."""
+        ap = self.make_ap()
+        
+        with patch('apmanager.ScanCache.latest', return_value=None), \
+             patch('apmanager.NetworkScanner.cached_scan', **cached):
+            assert ap.plan_channel() is None
+
+
+IW_LIST_AP_STA = """Wiphy phy0
+	Supported interface modes:
+		 * IBSS
+		 * managed
+		 * AP
+		 * P2P-client
+	valid interface combinations:
+		 * #{ managed } <= 1, #{ P2P-device } <= 1, #{ P2P-client, P2P-GO } <= 1,
+		   total <= 3, #channels <= 2
+		 * #{ managed } <= 1, #{ AP } <= 1, #{ P2P-client } <= 1, #{ P2P-device } <= 1,
+		   total <= 4, #channels <= 1
+	HT Capability overrides:
+		 * MCS: ff ff ff ff ff ff ff ff ff ff
+"""
+
+IW_LIST_AP_ONLY = """Wiphy phy0
+	Supported interface modes:
+		 * managed
+		 * AP
+	valid interface combinations:
+		 * #{ managed, AP } <= 1,
+		   total <= 1, #channels <= 1
+"""
+
+
+class TestInterfaceCapabilities:
+    """Test AP+STA capability detection."""
+    
+    def test_parses_ap_sta_combination(self):
+        """Separate managed and AP groups with total >= 2 allow AP+STA."""
+        caps = InterfaceCapabilities.from_iw_list(IW_LIST_AP_STA)
+        
+        assert caps.supports_ap is True
+        assert caps.supports_ap_sta is True
+        assert caps.max_channels == 1
+    
+    def test_rejects_single_interface_chipset(self):
+        """Shared group limited to one interface cannot run AP+STA."""
+        caps = InterfaceCapabilities.from_iw_list(IW_LIST_AP_ONLY)
+        
+        assert caps.supports_ap is True
+        assert caps.supports_ap_sta is False
+    
+    def test_create_returns_none_without_support(self):
+        """StationProbe.create() declines chipsets without AP+STA."""
+        with patch('apmanager.check_output', return_value=IW_LIST_AP_ONLY.encode()):
+            assert StationProbe.create("wlan0", lambda: ["Home"]) is None
+    
+    def test_create_returns_probe_with_support(self):
+        """StationProbe.create() builds a probe on capable chipsets."""
+        with patch('apmanager.check_output', return_value=IW_LIST_AP_STA.encode()):
+            probe = StationProbe.create("wlan0", lambda: ["Home"])
+            
+            assert probe.station_interface == "wlan0sta"
+
+
+class TestStationProbe:
+    """Test station interface probing with a fake capability model."""
+    
+    def make_probe(self, known=("Home",)):
+        caps = InterfaceCapabilities(supports_ap=True, supports_ap_sta=True, max_channels=1)
+        return StationProbe("wlan0", caps, lambda: list(known))
+    
+    def test_scan_known_adds_interface_and_finds_ssid(self):
+        """First scan adds the virtual interface and matches known SSIDs."""
+        probe = self.make_probe()
+        
+        with patch('apmanager.check_output', side_effect=[b"", b"Cafe\nHome\n"]) as mock_check:
+            assert probe.scan_known() == "Home"
+            
+            assert mock_check.call_args_list[0][0][0][:5] == ["iw", "dev", "wlan0", "interface", "add"]
+            assert "wlan0sta" in mock_check.call_args_list[1][0][0]
+            assert probe.station_active is True
+    
+    def test_scan_known_skips_without_known_ssids(self):
+        """Nothing configured means no interface and no scan."""
+        probe = self.make_probe(known=())
+        
+        with patch('apmanager.check_output') as mock_check:
+            assert probe.scan_known() is None
+            mock_check.assert_not_called()
+    
+    def test_remove_station_interface(self):
+        """Release deletes the virtual interface once."""
+        probe = self.make_probe()
+        probe.station_active = True
+        
+        with patch('apmanager.check_output') as mock_check:
+            probe.remove_station_interface()
+            probe.remove_station_interface()
+            
+            mock_check.assert_called_once_with(["iw", "dev", "wlan0sta", "del"])
+            assert probe.station_active is False
+    
+    def test_connect_primary_uses_ap_interface(self):
+        """Hand-over activates the profile on the primary interface."""
+        probe = self.make_probe()
+        
+        with patch('apmanager.check_output') as mock_check:
+            assert probe.connect_primary("Home") is True
+        
+        mock_check.assert_called_once_with(["nmcli", "con", "up", "id", "Home", "ifname", "wlan0"])
+        with patch('apmanager.check_output', side_effect=CalledProcessError(4, 'nmcli')):
+            assert probe.connect_primary("Home") is False
+    
+    @pytest.mark.asyncio
+    async def test_find_known_network_swallows_errors(self):
+        """Async scan returns None when iw/nmcli fail."""
+        probe = self.make_probe()
+        
+        with patch('apmanager.check_output', side_effect=CalledProcessError(1, 'iw')):
+            assert await probe.find_known_network() is None
+
+
 class TestAPActivation:
     """Test AP activation and deactivation."""
     
@@ -290,6 +544,19 @@ class TestModuleFunctions:
             # Should return ap_active status even after fallback
             assert isinstance(result, bool)
     
+    def test_activate_ap_function_uses_provisioned_profile(self, tmp_path):
+        """A keyfile written at image build time is activated without re-creating it."""
+        keyfile = tmp_path / 'pi-netconfig-ap-provisioned.nmconnection'
+        keyfile.write_text('[connection]\nid=pi-netconfig-ap\n')
+        
+        with patch('apmanager.AccessPoint') as mock_ap_class, \
+             patch('apmanager.PROVISIONED_AP_KEYFILE', keyfile):
+            mock_ap_class.return_value.activate_ap.return_value = True
+            
+            assert activate_ap() is True
+        
+        mock_ap_class.return_value.create_ap_profile.assert_not_called()
+    
     def test_deactivate_ap_function_deactivates(self):
         """deactivate_ap() creates AccessPoint and deactivates."""
         device_output = b"DEVICE  TYPE=wifi  STATE\nwlan0   TYPE=wifi  connected\n"
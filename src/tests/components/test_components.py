@@ -0,0 +1,140 @@
+"""
+Unit tests for components.py module
+
+Covers the async adapters StateMonitor drives and checks that AP-only
+modules stay unloaded until the first AP_MODE entry.
+"""
+
+import pytest
+from unittest.mock import Mock, AsyncMock, call, patch
+import subprocess
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../'))
+
+from components import (
+    ServiceComponents,
+    ConnectionService,
+    AccessPointService,
+    PortalService,
+    DNSService,
+    StationProbeService,
+    ComponentError,
+    known_ssids,
+    configured_ssid,
+)
+
+SRC = os.path.join(os.path.dirname(__file__), '../../')
+
+
+class TestAdapters:
+    """Test each adapter delegates to its backing module."""
+
+    async def test_connection_service_runs_tester(self):
+        """test_connection() runs the blocking tester in an executor."""
+        with patch('connectionmanager.ConnectionTester.test_connection',
+                   return_value=True) as mock_test:
+            assert await ConnectionService().test_connection() is True
+        mock_test.assert_called_once()
+
+    async def test_access_point_failure_raises(self):
+        """A False activation result surfaces as ComponentError."""
+        with patch('apmanager.activate_ap', return_value=False):
+            with pytest.raises(ComponentError):
+                await AccessPointService().activate_ap()
+
+    async def test_portal_opens_with_status_provider(self):
+        """open() binds with the wired provider without accepting."""
+        provider = Mock(return_value={'state': 'AP_MODE'})
+        portal = PortalService(port=8123, status_provider=provider)
+
+        with patch('webserver.open_server') as mock_open, \
+             patch('webserver.start_server') as mock_start:
+            await portal.open()
+
+        mock_open.assert_called_once_with(8123, status_provider=provider)
+        mock_start.assert_not_called()
+
+    async def test_portal_start_binds_then_accepts(self):
+        """start_server() on AP entry binds (idempotently) before accepting."""
+        provider = Mock()
+        portal = PortalService(port=8123, status_provider=provider)
+        manager = Mock()
+
+        with patch('webserver.open_server', manager.open), \
+             patch('webserver.start_server', manager.start):
+            await portal.start_server()
+
+        assert manager.mock_calls == [call.open(8123, status_provider=provider),
+                                      call.start(8123)]
+
+    async def test_dns_responder_created_once(self):
+        """The responder is built on first start and reused."""
+        responder = Mock()
+        responder.start = AsyncMock()
+        responder.stop = AsyncMock()
+        dns = DNSService('10.0.0.1')
+
+        with patch('dnsresponder.DNSResponder', return_value=responder) as mock_class:
+            await dns.start()
+            await dns.stop()
+            await dns.start()
+
+        mock_class.assert_called_once_with('10.0.0.1')
+        assert responder.start.await_count == 2
+
+    async def test_dns_stop_before_start_is_noop(self):
+        """Stopping an unused responder does nothing."""
+        await DNSService().stop()
+
+    async def test_station_probe_unsupported_is_inert(self):
+        """Probe creation failure disables probing instead of raising."""
+        probe = StationProbeService()
+
+        with patch('apmanager.AccessPoint', side_effect=RuntimeError('no iw')):
+            assert await probe.find_known_network() is None
+            assert await probe.find_known_network() is None
+
+        assert probe.checked
+        assert await probe.connect_known('Home') is False
+
+    def test_known_ssids(self):
+        """Configured SSID is returned as a list; unreadable config is empty."""
+        with patch('connectionmanager.ConfigManager.load_configuration', return_value='Home'):
+            assert known_ssids() == ['Home']
+        with patch('connectionmanager.ConfigManager.load_configuration',
+                   side_effect=OSError('denied')):
+            assert known_ssids() == []
+            assert configured_ssid() is None
+
+
+class TestServiceComponents:
+    """Test the wired component set."""
+
+    def test_bind_status_reaches_portal(self):
+        """bind_status() sets the portal's provider."""
+        services = ServiceComponents(port=9000)
+        provider = Mock()
+
+        services.bind_status(provider)
+
+        assert services.portal.status_provider is provider
+        assert services.portal.port == 9000
+
+    def test_optional_components_disabled(self):
+        """DNS and station probing can be left out."""
+        services = ServiceComponents(captive_dns=False, station_probing=False)
+
+        assert services.dns is None
+        assert services.station_probe is None
+
+    def test_construction_does_not_import_ap_modules(self):
+        """Building the component set leaves AP-only modules unloaded."""
+        probe = ("import sys, components; components.ServiceComponents(); "
+                 "print(sorted(m for m in ('webserver', 'http.server', 'apmanager', "
+                 "'dnsresponder', 'installer') if m in sys.modules))")
+
+        output = subprocess.check_output([sys.executable, '-c', probe], cwd=SRC)
+
+        assert output.strip() == b'[]'
@@ -22,9 +22,16 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../'))
 
 from connectionmanager import (
     NetworkInfo,
+    BSSIDEntry,
+    ScanResult,
+    ScanCache,
+    band_for_frequency,
+    security_class,
     ConnectionTester,
     NetworkScanner,
     ConfigManager,
+    LinkProbe,
+    BootProbe,
     ConnectionManagerError,
     ConfigurationError,
     NetworkScanError
@@ -44,6 +51,75 @@ class TestNetworkInfo:
         assert net.frequency == "2.4GHz"
 
 
+class TestScanModel:
+    """Test BSSID-level scan model and aggregation."""
+    
+    def test_band_for_frequency(self):
+        """Frequencies map to 2.4, 5 and 6 GHz bands."""
+        assert band_for_frequency(2437) == "2.4GHz"
+        assert band_for_frequency(5745) == "5GHz"
+        assert band_for_frequency(5955) == "6GHz"
+    
+    def test_bssid_entry_uses_slots(self):
+        """BSSIDEntry carries no per-instance dict."""
+        entry = BSSIDEntry("Net", "AA:BB:CC:DD:EE:FF", 50, "WPA2", 2412, 1, 65)
+        
+        assert not hasattr(entry, '__dict__')
+    
+    def test_scan_result_aggregates_dense_scan(self):
+        """Aggregates hundreds of BSSIDs per SSID in one pass."""
+        entries = [
+            BSSIDEntry(f"Net{i % 10}", f"00:00:00:00:{i // 256:02X}:{i % 256:02X}",
+                       i % 100, "WPA2", 2412 if (i // 10) % 2 else 5180, 1 if (i // 10) % 2 else 36, 130)
+            for i in range(320)
+        ]
+        
+        result = ScanResult(entries)
+        
+        assert len(result.summaries) == 10
+        assert sum(s.bssid_count for s in result.summaries.values()) == 320
+        assert all(s.bands == {"2.4GHz", "5GHz"} for s in result.summaries.values())
+        assert result.summaries["Net9"].signal_strength == max(
+            e.signal_strength for e in entries if e.ssid == "Net9")
+        signals = [n.signal_strength for n in result.networks()]
+        assert signals == sorted(signals, reverse=True)
+
+
+class TestScanCache:
+    """Test scan result caching."""
+    
+    def setup_method(self):
+        ScanCache.clear()
+    
+    def teardown_method(self):
+        ScanCache.clear()
+    
+    def test_scan_cache_reuses_fresh_result(self):
+        """Second get() within TTL does not rescan."""
+        with patch.object(NetworkScanner, 'scan_bssids', return_value=ScanResult([])) as mock_scan:
+            first = ScanCache.get()
+            second = ScanCache.get()
+            
+            assert first is second
+            mock_scan.assert_called_once()
+    
+    def test_scan_cache_refreshes_stale_result(self):
+        """Results older than max_age are rescanned."""
+        ScanCache.store(ScanResult([], timestamp=0.0))
+        
+        with patch.object(NetworkScanner, 'scan_bssids', return_value=ScanResult([])) as mock_scan:
+            ScanCache.get()
+            
+            mock_scan.assert_called_once()
+    
+    def test_security_class(self):
+        """nmcli security strings map to coarse classes."""
+        assert security_class("") == "open"
+        assert security_class("WEP") == "wep"
+        assert security_class("WPA1 WPA2") == "wpa"
+        assert security_class("WPA2 802.1X") == "enterprise"
+
+
 class TestConnectionTester:
     """Test connection testing functionality."""
     
@@ -73,7 +149,8 @@ class TestNetworkScanner:
     
     def test_scan_networks_returns_list(self):
         """Scan returns list of NetworkInfo objects."""
-        nmcli_output = b"WiFi1:75:WPA2:2.4GHz\nWiFi2:90:WPA3:5GHz\n"
+        nmcli_output = (b"WiFi1:AA\\:BB\\:CC\\:00\\:00\\:01:75:WPA2:2437 MHz:6:130 Mbit/s\n"
+                        b"WiFi2:AA\\:BB\\:CC\\:00\\:00\\:02:90:WPA3:5180 MHz:36:540 Mbit/s\n")
         
         with patch('subprocess.check_output', return_value=nmcli_output):
             networks = NetworkScanner.scan_networks()
@@ -83,7 +160,9 @@ class TestNetworkScanner:
     
     def test_scan_networks_sorts_by_signal_strength(self):
         """Networks sorted by signal strength descending."""
-        nmcli_output = b"WiFi1:75:WPA2:2.4GHz\nWiFi2:90:WPA3:5GHz\nWiFi3:60:WPA2:2.4GHz\n"
+        nmcli_output = (b"WiFi1:AA\\:BB\\:CC\\:00\\:00\\:01:75:WPA2:2437 MHz:6:130 Mbit/s\n"
+                        b"WiFi2:AA\\:BB\\:CC\\:00\\:00\\:02:90:WPA3:5180 MHz:36:540 Mbit/s\n"
+                        b"WiFi3:AA\\:BB\\:CC\\:00\\:00\\:03:60:WPA2:2412 MHz:1:65 Mbit/s\n")
         
         with patch('subprocess.check_output', return_value=nmcli_output):
             networks = NetworkScanner.scan_networks()
@@ -94,7 +173,8 @@ class TestNetworkScanner:
     
     def test_scan_networks_removes_duplicates(self):
         """Duplicate SSIDs removed."""
-        nmcli_output = b"WiFi1:75:WPA2:2.4GHz\nWiFi1:70:WPA2:2.4GHz\n"
+        nmcli_output = (b"WiFi1:AA\\:BB\\:CC\\:00\\:00\\:01:70:WPA2:2437 MHz:6:130 Mbit/s\n"
+                        b"WiFi1:AA\\:BB\\:CC\\:00\\:00\\:02:75:WPA2:2437 MHz:6:130 Mbit/s\n")
         
         with patch('subprocess.check_output', return_value=nmcli_output):
             networks = NetworkScanner.scan_networks()
@@ -102,6 +182,37 @@ class TestNetworkScanner:
             assert len(networks) == 1
             assert networks[0].ssid == "WiFi1"
     
+    def test_scan_networks_keeps_strongest_bssid(self):
+        """Duplicate SSIDs report the strongest BSSID, not the last seen."""
+        nmcli_output = (b"Office:AA\\:BB\\:CC\\:00\\:00\\:01:40:WPA2:2412 MHz:1:65 Mbit/s\n"
+                        b"Office:AA\\:BB\\:CC\\:00\\:00\\:02:82:WPA2:5180 MHz:36:540 Mbit/s\n"
+                        b"Office:AA\\:BB\\:CC\\:00\\:00\\:03:55:WPA2:2462 MHz:11:130 Mbit/s\n")
+        
+        with patch('subprocess.check_output', return_value=nmcli_output):
+            networks = NetworkScanner.scan_networks()
+            
+            assert networks[0].signal_strength == 82
+            assert networks[0].frequency == "5180 MHz"
+            assert networks[0].bands == ("2.4GHz", "5GHz")
+            assert networks[0].bssid_count == 3
+    
+    def test_scan_bssids_keeps_every_bssid(self):
+        """BSSID scan keeps each radio with unescaped BSSID, channel and rate."""
+        nmcli_output = (b"Office:AA\\:BB\\:CC\\:00\\:00\\:01:40:WPA2:2412 MHz:1:65 Mbit/s\n"
+                        b"Office:AA\\:BB\\:CC\\:00\\:00\\:02:82:WPA2:5180 MHz:36:540 Mbit/s\n"
+                        b":AA\\:BB\\:CC\\:00\\:00\\:03:30::2462 MHz:11:54 Mbit/s\n")
+        
+        with patch('subprocess.check_output', return_value=nmcli_output):
+            result = NetworkScanner.scan_bssids()
+            
+            assert len(result.entries) == 3
+            entry = result.entries[1]
+            assert entry.bssid == "AA:BB:CC:00:00:02"
+            assert (entry.frequency, entry.channel, entry.rate) == (5180, 36, 540)
+            assert entry.band == "5GHz"
+            # Hidden networks are kept as BSSIDs but not aggregated
+            assert list(result.summaries) == ["Office"]
+    
     def test_scan_networks_raises_on_nmcli_failure(self):
         """Raises NetworkScanError when nmcli fails."""
         with patch('subprocess.check_output', side_effect=subprocess.CalledProcessError(1, 'nmcli')):
@@ -257,3 +368,125 @@ class TestConfigManager:
             ConfigManager.load_configuration()
             
             mock_acquire.assert_called()
+
+
+ROUTE_HEADER = "Iface\tDestination\tGateway\tFlags\tRefCnt\tUse\tMetric\tMask\tMTU\tWindow\tIRTT\n"
+
+
+@pytest.fixture
+def fake_net(tmp_path):
+    """Temporary /sys/class/net and /proc/net/route."""
+    sysfs = tmp_path / 'net'
+    sysfs.mkdir()
+    route = tmp_path / 'route'
+    route.write_text(ROUTE_HEADER)
+
+    def add_interface(name, operstate='up', wireless=True):
+        iface = sysfs / name
+        iface.mkdir()
+        (iface / 'operstate').write_text(operstate + '\n')
+        if wireless:
+            (iface / 'wireless').mkdir()
+
+    def add_default_route(iface):
+        with open(route, 'a') as f:
+            f.write(f"{iface}\t00000000\t0132A8C0\t0003\t0\t0\t600\t00000000\t0\t0\t0\n")
+
+    with patch.object(LinkProbe, 'SYSFS_NET', sysfs), patch.object(LinkProbe, 'PROC_ROUTE', route):
+        yield add_interface, add_default_route
+
+
+def iw_link(ssid):
+    if ssid is None:
+        return b'Not connected.\n'
+    return f"Connected to aa:bb:cc:dd:ee:ff (on wlan0)\n\tSSID: {ssid}\n\tfreq: 2437\n".encode()
+
+
+class TestLinkProbe:
+    """Test sysfs/procfs link reads."""
+
+    def test_reads_interfaces_state_and_routes(self, fake_net):
+        """Wireless interfaces, operstate and default routes are parsed."""
+        add_interface, add_default_route = fake_net
+        add_interface('wlan0')
+        add_interface('eth0', operstate='down', wireless=False)
+        add_default_route('wlan0')
+
+        assert LinkProbe.wireless_interfaces() == ['wlan0']
+        assert LinkProbe.is_up('wlan0')
+        assert not LinkProbe.is_up('eth0')
+        assert not LinkProbe.is_up('missing0')
+        assert LinkProbe.default_route_interfaces() == ['wlan0']
+
+    def test_associated_ssid(self):
+        """SSID parsed from iw link output; None when not connected or iw missing."""
+        with patch('subprocess.check_output', return_value=iw_link('Home Net')):
+            assert LinkProbe.associated_ssid('wlan0') == 'Home Net'
+        with patch('subprocess.check_output', return_value=iw_link(None)):
+            assert LinkProbe.associated_ssid('wlan0') is None
+        with patch('subprocess.check_output', side_effect=FileNotFoundError('iw')):
+            assert LinkProbe.associated_ssid('wlan0') is None
+
+
+class TestBootProbe:
+    """Test startup fast-path decisions."""
+
+    def setup_method(self):
+        ScanCache.clear()
+
+    def test_client_when_configured_ssid_associated_with_route(self, fake_net):
+        """Configured SSID up with a default route goes straight to CLIENT."""
+        add_interface, add_default_route = fake_net
+        add_interface('wlan0')
+        add_default_route('wlan0')
+
+        with patch.object(ConfigManager, 'load_configuration', return_value='Home'), \
+             patch('subprocess.check_output', return_value=iw_link('Home')) as mock_check:
+            assert BootProbe.initial_state() == 'CLIENT'
+
+        assert mock_check.call_count == 1  # no nmcli scan needed
+
+    def test_ap_mode_when_no_route_and_known_network_absent(self, fake_net):
+        """No route and configured SSID not in cached scan goes straight to AP_MODE."""
+        add_interface, _ = fake_net
+        add_interface('wlan0')
+        cached = b'Neighbour:aa\\:bb\\:cc\\:dd\\:ee\\:01:70:WPA2:2412 MHz:1:54 Mbit/s\n'
+
+        with patch.object(ConfigManager, 'load_configuration', return_value='Home'), \
+             patch('subprocess.check_output', return_value=cached) as mock_check:
+            assert BootProbe.initial_state() == 'AP_MODE'
+
+        assert '--rescan' in mock_check.call_args[0][0]
+        assert ScanCache.latest() is not None
+
+    def test_undecided_when_known_network_visible(self, fake_net):
+        """Visible configured SSID is left to the regular check."""
+        add_interface, _ = fake_net
+        add_interface('wlan0')
+        cached = b'Home:aa\\:bb\\:cc\\:dd\\:ee\\:01:70:WPA2:2412 MHz:1:54 Mbit/s\n'
+
+        with patch.object(ConfigManager, 'load_configuration', return_value='Home'), \
+             patch('subprocess.check_output', return_value=cached):
+            assert BootProbe.initial_state() is None
+
+    def test_undecided_when_other_route_exists(self, fake_net):
+        """A default route elsewhere (e.g. Ethernet) defers to the check."""
+        add_interface, add_default_route = fake_net
+        add_interface('wlan0')
+        add_interface('eth0', wireless=False)
+        add_default_route('eth0')
+
+        with patch.object(ConfigManager, 'load_configuration', return_value=None), \
+             patch('subprocess.check_output') as mock_check:
+            assert BootProbe.initial_state() is None
+
+        mock_check.assert_not_called()
+
+    def test_undecided_when_cached_scan_empty(self, fake_net):
+        """An empty cache right after boot is not evidence of absence."""
+        add_interface, _ = fake_net
+        add_interface('wlan0')
+
+        with patch.object(ConfigManager, 'load_configuration', return_value=None), \
+             patch('subprocess.check_output', return_value=b''):
+            assert BootProbe.initial_state() is None
@@ -0,0 +1,265 @@
+"""
+Unit tests for controlsocket.py and controlclient.py modules
+
+Runs the control server on a temporary Unix socket and drives it with the
+ctl client, covering each command, protocol errors and client exit codes.
+"""
+
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+import asyncio
+import json
+import socket
+import tempfile
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../'))
+
+from controlsocket import ControlServer, ControlSocketError, MAX_LINE_BYTES
+from controlclient import send_command, build_request, main as ctl_main, ControlClientError
+from connectionmanager import BSSIDEntry, ScanResult
+from statemonitor import StateMonitor, SystemState
+
+
+@pytest.fixture
+def socket_path():
+    with tempfile.TemporaryDirectory() as tmp:
+        yield os.path.join(tmp, 'control.sock')
+
+
+@pytest.fixture
+def monitor():
+    ap_manager = Mock()
+    ap_manager.activate_ap = AsyncMock()
+    web_server = Mock()
+    web_server.start_server = AsyncMock()
+    return StateMonitor(Mock(), ap_manager, web_server)
+
+
+@pytest.fixture
+async def server(monitor, socket_path):
+    control = ControlServer(monitor, path=socket_path,
+                            metrics_sources={'logging': lambda: {'dropped': 0}})
+    await control.start()
+    yield control
+    await control.stop()
+
+
+async def request(server, payload):
+    """Send one request from a worker thread using the real client."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, send_command, payload, server.path, 5.0)
+
+
+def raw_exchange(path, data):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(5.0)
+        sock.connect(path)
+        sock.sendall(data)
+        reader = sock.makefile('rb')
+        return [json.loads(line) for line in reader]
+
+
+class TestControlCommands:
+    """Test each control command end to end."""
+
+    async def test_status(self, server, monitor):
+        """status reports state and failure count."""
+        monitor.failure_count = 2
+
+        response = await request(server, {'command': 'status'})
+
+        assert response['ok']
+        assert response['result']['state'] == 'CHECKING'
+        assert response['result']['failure_count'] == 2
+
+    async def test_history_and_limit(self, server, monitor):
+        """history lists recorded transitions, newest last."""
+        monitor.set_state(SystemState.AP_MODE, reason='forced')
+        monitor.set_state(SystemState.CLIENT)
+
+        full = await request(server, {'command': 'history'})
+        last = await request(server, {'command': 'history', 'limit': 1})
+
+        assert [(h['from'], h['to']) for h in full['result']] == [
+            ('CHECKING', 'AP_MODE'), ('AP_MODE', 'CLIENT')
+        ]
+        assert [(h['from'], h['to']) for h in last['result']] == [('AP_MODE', 'CLIENT')]
+        assert full['result'][0]['reason'] == 'forced'
+
+    async def test_metrics_include_sources(self, server, monitor):
+        """metrics merges state machine counters with registered sources."""
+        monitor.set_state(SystemState.CLIENT)
+
+        response = await request(server, {'command': 'metrics'})
+
+        assert response['result']['state_monitor']['transitions'] == 1
+        assert response['result']['state_monitor']['time_in_state']['CHECKING'] >= 0
+        assert response['result']['logging'] == {'dropped': 0}
+
+    async def test_check_wakes_monitor(self, server, monitor):
+        """check sets the monitor's wake event."""
+        response = await request(server, {'command': 'check'})
+
+        assert response['result'] == {'requested': True}
+        assert monitor.check_requested.is_set()
+
+    async def test_ap_forces_ap_mode(self, server, monitor):
+        """ap queues AP_MODE with a hold and replies with a request id."""
+        response = await request(server, {'command': 'ap'})
+        await server.ap_task
+
+        assert response['result']['request_id'] == 1
+        assert response['result']['queued']
+        assert monitor.status()['state'] == 'AP_MODE'
+        assert monitor.status()['ap_hold_until'] is not None
+        monitor.ap_manager.activate_ap.assert_awaited_once()
+
+    async def test_ap_replies_before_slow_transition(self, server, monitor):
+        """A transition longer than the client timeout does not hold the reply."""
+        release = asyncio.Event()
+
+        async def slow_activation():
+            await release.wait()
+
+        monitor.ap_manager.activate_ap = AsyncMock(side_effect=slow_activation)
+        loop = asyncio.get_running_loop()
+
+        first = await loop.run_in_executor(None, send_command, {'command': 'ap'}, server.path, 1.0)
+        second = await loop.run_in_executor(None, send_command, {'command': 'ap'}, server.path, 1.0)
+        assert first['result']['status']['state'] == 'CHECKING'
+        assert second['result']['request_id'] == first['result']['request_id']
+
+        release.set()
+        await server.ap_task
+        assert monitor.status()['state'] == 'AP_MODE'
+        monitor.ap_manager.activate_ap.assert_awaited_once()
+
+    async def test_failed_ap_request_is_logged(self, server, monitor, caplog):
+        """A failing queued transition is logged and a new request gets a new id."""
+        monitor.force_ap_mode = AsyncMock(side_effect=RuntimeError('nmcli failed'))
+
+        first = await request(server, {'command': 'ap'})
+        await server.ap_task
+        second = await request(server, {'command': 'ap'})
+        await server.ap_task
+
+        assert 'AP request 1 failed: nmcli failed' in caplog.text
+        assert second['result']['request_id'] == first['result']['request_id'] + 1
+
+    async def test_scan_returns_networks_strongest_first(self, server):
+        """scan refreshes the cache and lists networks by signal."""
+        result = ScanResult([
+            BSSIDEntry('Weak', 'aa:00:00:00:00:01', 30, 'WPA2', 2412, 1, 54),
+            BSSIDEntry('Strong', 'aa:00:00:00:00:02', 80, 'WPA2', 5180, 36, 300),
+        ])
+        with patch('connectionmanager.ScanCache.get', return_value=result) as mock_get:
+            response = await request(server, {'command': 'scan'})
+
+        mock_get.assert_called_once_with(0.0)
+        assert [n['ssid'] for n in response['result']] == ['Strong', 'Weak']
+        assert response['result'][0]['bands'] == ['5GHz']
+
+
+class TestProtocolErrors:
+    """Test malformed requests."""
+
+    async def test_unknown_command(self, server):
+        """Unknown commands list the available ones."""
+        response = await request(server, {'command': 'reboot'})
+
+        assert not response['ok']
+        assert 'status' in response['commands']
+
+    async def test_invalid_json_and_multiple_requests(self, server):
+        """Errors do not close the connection; requests are answered in order."""
+        loop = asyncio.get_running_loop()
+        data = b'not json\n{"command": 1}\n{"command": "status"}\n'
+
+        def exchange():
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(5.0)
+                sock.connect(server.path)
+                sock.sendall(data)
+                reader = sock.makefile('rb')
+                return [json.loads(reader.readline()) for _ in range(3)]
+
+        responses = await loop.run_in_executor(None, exchange)
+
+        assert responses[0] == {'ok': False, 'error': 'invalid JSON'}
+        assert not responses[1]['ok']
+        assert responses[2]['ok']
+
+    async def test_oversized_request_rejected(self, server):
+        """Lines beyond MAX_LINE_BYTES get an error and the connection closes."""
+        loop = asyncio.get_running_loop()
+        data = b'{"command": "' + b'x' * (MAX_LINE_BYTES * 2) + b'"}\n'
+
+        responses = await loop.run_in_executor(None, raw_exchange, server.path, data)
+
+        assert responses == [{'ok': False, 'error': 'request too long'}]
+
+    async def test_socket_is_owner_only_and_removed_on_stop(self, monitor, socket_path):
+        """Socket file is 0600 and cleaned up."""
+        control = ControlServer(monitor, path=socket_path)
+        await control.start()
+        assert os.stat(socket_path).st_mode & 0o777 == 0o600
+
+        await control.stop()
+        assert not os.path.exists(socket_path)
+
+    async def test_start_raises_when_path_unusable(self, monitor):
+        """Bind failure raises ControlSocketError."""
+        control = ControlServer(monitor, path='/proc/pi-netconfig/control.sock')
+
+        with pytest.raises(ControlSocketError):
+            await control.start()
+
+
+class TestControlClient:
+    """Test the ctl command-line client."""
+
+    @pytest.mark.parametrize('argv,expected', [
+        (['status'], {'command': 'status'}),
+        (['history', '5'], {'command': 'history', 'limit': 5}),
+        (['history', 'x'], None),
+        (['reboot'], None),
+        ([], None),
+    ])
+    def test_build_request(self, argv, expected):
+        """Arguments map to request objects."""
+        assert build_request(argv) == expected
+
+    def test_unreachable_socket(self, socket_path):
+        """Missing daemon raises ControlClientError / exits 1."""
+        with pytest.raises(ControlClientError):
+            send_command({'command': 'status'}, socket_path, timeout=1.0)
+
+        with patch.dict('os.environ', {'PI_NETCONFIG_CONTROL_SOCKET': socket_path}):
+            assert ctl_main(['status']) == 1
+
+    def test_usage_error(self):
+        """Unknown command exits 2."""
+        assert ctl_main(['reboot']) == 2
+
+    async def test_prints_result(self, server, capsys):
+        """Successful command prints JSON result and exits 0."""
+        loop = asyncio.get_running_loop()
+        with patch.dict('os.environ', {'PI_NETCONFIG_CONTROL_SOCKET': server.path}):
+            code = await loop.run_in_executor(None, ctl_main, ['status'])
+
+        assert code == 0
+        assert json.loads(capsys.readouterr().out)['state'] == 'CHECKING'
+
+    def test_client_imports_only_stdlib(self):
+        """Client module does not pull in service modules."""
+        import subprocess
+        src = os.path.join(os.path.dirname(__file__), '../../')
+        probe = ("import sys; import controlclient; "
+                 "print(sorted(m for m in ('statemonitor', 'controlsocket', 'asyncio', "
+                 "'connectionmanager', 'webserver') if m in sys.modules))")
+
+        output = subprocess.check_output([sys.executable, '-c', probe], cwd=src)
+
+        assert output.strip() == b'[]'
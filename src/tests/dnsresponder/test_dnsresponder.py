@@ -0,0 +1,187 @@
+"""
+Unit tests for dnsresponder.py module
+
+Covers header/question parsing, response construction from the answer
+template, lifecycle, and a local UDP client throughput benchmark.
+"""
+
+import pytest
+from unittest.mock import Mock
+import asyncio
+import socket
+import struct
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../'))
+
+from dnsresponder import (
+    DNSResponder,
+    DNSResponderProtocol,
+    DNSResponderError,
+    build_answer_template
+)
+
+
+def build_query(name='connectivitycheck.gstatic.com', qtype=1, query_id=0x1234, flags=0x0100):
+    """Encode a single-question DNS query."""
+    header = struct.pack('>HHHHHH', query_id, flags, 1, 0, 0, 0)
+    labels = b''.join(bytes([len(p)]) + p.encode() for p in name.split('.')) + b'\x00'
+    return header + labels + struct.pack('>HH', qtype, 1)
+
+
+def make_protocol():
+    protocol = DNSResponderProtocol('192.168.50.1')
+    protocol.connection_made(Mock())
+    return protocol
+
+
+def sent_bytes(protocol):
+    return bytes(protocol.transport.sendto.call_args[0][0])
+
+
+class TestAnswerTemplate:
+    """Test precomputed answer record."""
+
+    def test_template_encodes_address(self):
+        """Template points at the question name and carries the address."""
+        template = build_answer_template('192.168.50.1', ttl=10)
+
+        assert template[:2] == b'\xc0\x0c'
+        assert struct.unpack('>HHIH', template[2:12]) == (1, 1, 10, 4)
+        assert template[12:] == socket.inet_aton('192.168.50.1')
+
+
+class TestDNSResponderProtocol:
+    """Test query parsing and response construction."""
+
+    def test_a_query_answered_with_ap_address(self):
+        """A query gets one answer pointing at the AP."""
+        protocol = make_protocol()
+        query = build_query()
+
+        protocol.datagram_received(query, ('192.168.50.10', 5353))
+
+        response = sent_bytes(protocol)
+        query_id, flags, qd, an, ns, ar = struct.unpack('>HHHHHH', response[:12])
+        assert query_id == 0x1234
+        assert flags & 0x8000                  # QR
+        assert flags & 0x0100                  # RD copied
+        assert flags & 0x000F == 0             # NOERROR
+        assert (qd, an, ns, ar) == (1, 1, 0, 0)
+        assert response[12:len(query)] == query[12:]
+        assert response[-4:] == socket.inet_aton('192.168.50.1')
+
+    def test_aaaa_query_gets_nodata(self):
+        """Non-A queries get NOERROR with no answers."""
+        protocol = make_protocol()
+        query = build_query(qtype=28)
+
+        protocol.datagram_received(query, ('192.168.50.10', 5353))
+
+        response = sent_bytes(protocol)
+        assert struct.unpack('>H', response[6:8])[0] == 0
+        assert len(response) == len(query)
+
+    def test_buffer_reused_between_queries(self):
+        """Shorter query after longer one does not leak stale bytes."""
+        protocol = make_protocol()
+        protocol.datagram_received(build_query('a-very-long-hostname.example.com'), ('10.0.0.1', 1))
+        short = build_query('x.io', query_id=7)
+
+        protocol.datagram_received(short, ('10.0.0.1', 1))
+
+        response = sent_bytes(protocol)
+        assert len(response) == len(short) + 16
+        assert response[12:len(short)] == short[12:]
+
+    @pytest.mark.parametrize('datagram', [
+        b'\x00' * 5,                                          # truncated header
+        build_query(flags=0x8100),                            # response, not query
+        build_query(flags=0x2800),                            # opcode UPDATE
+        build_query()[:4] + b'\x00\x02' + build_query()[6:],  # QDCOUNT 2
+        build_query()[:-3],                                   # truncated question
+        build_query()[:12] + b'\xc0\x0c' + b'\x00\x01\x00\x01',  # compressed name
+    ])
+    def test_malformed_queries_dropped(self, datagram):
+        """Malformed or unsupported messages are silently dropped."""
+        protocol = make_protocol()
+
+        protocol.datagram_received(datagram, ('10.0.0.1', 1))
+
+        protocol.transport.sendto.assert_not_called()
+        assert protocol.dropped == 1
+
+
+class TestDNSResponderLifecycle:
+    """Test start/stop of the UDP endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_start_and_stop(self):
+        """Responder binds, answers, and closes."""
+        responder = DNSResponder('192.168.50.1', port=0, bind_address='127.0.0.1')
+        await responder.start()
+        try:
+            assert responder.is_running()
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, udp_exchange, responder.local_port(), build_query())
+            assert response[-4:] == socket.inet_aton('192.168.50.1')
+        finally:
+            await responder.stop()
+
+        assert not responder.is_running()
+
+    @pytest.mark.asyncio
+    async def test_start_raises_when_port_taken(self):
+        """Bind failure raises DNSResponderError."""
+        blocker = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        blocker.bind(('127.0.0.1', 0))
+        try:
+            responder = DNSResponder(port=blocker.getsockname()[1], bind_address='127.0.0.1')
+            with pytest.raises(DNSResponderError):
+                await responder.start()
+        finally:
+            blocker.close()
+
+
+def udp_exchange(port, query):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as client:
+        client.settimeout(2.0)
+        client.sendto(query, ('127.0.0.1', port))
+        return client.recv(512)
+
+
+def udp_flood(port, total, window=32):
+    """Keep `window` queries in flight; return queries answered per second."""
+    query = build_query()
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as client:
+        client.settimeout(2.0)
+        client.connect(('127.0.0.1', port))
+        start = time.perf_counter()
+        sent = received = 0
+        while received < total:
+            while sent < total and sent - received < window:
+                client.send(query)
+                sent += 1
+            client.recv(512)
+            received += 1
+        return total / (time.perf_counter() - start)
+
+
+class TestDNSResponderBenchmark:
+    """Throughput benchmark using a local UDP client."""
+
+    @pytest.mark.asyncio
+    async def test_throughput_thousands_of_queries_per_second(self):
+        """Responder sustains well over 1000 queries/s on loopback."""
+        responder = DNSResponder('192.168.50.1', port=0, bind_address='127.0.0.1')
+        await responder.start()
+        try:
+            loop = asyncio.get_running_loop()
+            qps = await loop.run_in_executor(None, udp_flood, responder.local_port(), 5000)
+        finally:
+            await responder.stop()
+
+        assert responder.protocol.answered == 5000
+        assert qps > 1000, f"{qps:,.0f} queries/s"
@@ -0,0 +1,392 @@
+"""
+Unit tests for logpipeline.py module
+
+Covers bounded queueing with drop accounting, the named handler registry,
+writer thread lifecycle, size/age rotation with background compression,
+debug-line sampling, and a log-call latency benchmark against a handler
+that stalls like a busy SD card.
+"""
+
+import pytest
+import gzip
+import logging
+import queue
+import threading
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../'))
+
+from logpipeline import (
+    LogPipeline,
+    BoundedQueueHandler,
+    RotatingCompressedFileHandler,
+    LogSampler
+)
+
+
+class RecordingHandler(logging.Handler):
+    """Collect formatted messages, optionally stalling on each emit."""
+
+    def __init__(self, level=logging.NOTSET, delay=0.0, gate=None):
+        super().__init__(level)
+        self.messages = []
+        self.delay = delay
+        self.gate = gate
+        self.closed = False
+
+    def emit(self, record):
+        if self.gate is not None:
+            self.gate.wait()
+        if self.delay:
+            time.sleep(self.delay)
+        self.messages.append(record.getMessage())
+
+    def close(self):
+        self.closed = True
+        super().close()
+
+
+@pytest.fixture
+def make_logger():
+    """Isolated logger wired to a pipeline; pipelines stopped on teardown."""
+    pipelines = []
+
+    def factory(name, capacity=100):
+        pipeline = LogPipeline(capacity=capacity)
+        log = logging.getLogger(f'test.logpipeline.{name}')
+        log.setLevel(logging.DEBUG)
+        log.propagate = False
+        pipeline.install(log)
+        pipelines.append(pipeline)
+        return pipeline, log
+
+    yield factory
+    for pipeline in pipelines:
+        pipeline.stop()
+
+
+class TestHandlerRegistry:
+    """Test named handler registration."""
+
+    def test_same_name_replaces_and_closes_previous(self, make_logger):
+        """Re-registering a name does not duplicate output."""
+        pipeline, log = make_logger('registry')
+        first = RecordingHandler()
+        second = RecordingHandler()
+        pipeline.add_handler('file', first)
+        pipeline.add_handler('file', second)
+        pipeline.start()
+
+        log.info("once")
+        pipeline.stop()
+
+        assert first.closed
+        assert first.messages == []
+        assert second.messages == ["once"]
+        assert pipeline.stats()['handlers'] == ['file']
+
+    def test_install_leaves_single_queue_handler(self, make_logger):
+        """Installing twice keeps exactly one handler on the logger."""
+        pipeline, log = make_logger('install')
+        log.addHandler(logging.NullHandler())
+
+        pipeline.install(log)
+        pipeline.install(log)
+
+        assert log.handlers == [pipeline.queue_handler]
+
+    def test_queue_level_follows_most_verbose_handler(self, make_logger):
+        """Records no handler would emit are filtered before queueing."""
+        pipeline, log = make_logger('levels')
+        pipeline.add_handler('file', RecordingHandler(logging.INFO))
+        assert pipeline.queue_handler.level == logging.INFO
+
+        pipeline.add_handler('console', RecordingHandler(logging.DEBUG))
+        assert pipeline.queue_handler.level == logging.DEBUG
+
+        pipeline.remove_handler('console')
+        log.debug("filtered")
+        assert pipeline.queue.qsize() == 0
+
+    def test_handler_levels_respected(self, make_logger):
+        """Each handler only receives records at or above its level."""
+        pipeline, log = make_logger('respect')
+        info = RecordingHandler(logging.INFO)
+        debug = RecordingHandler(logging.DEBUG)
+        pipeline.add_handler('file', info)
+        pipeline.add_handler('console', debug)
+        pipeline.start()
+
+        log.debug("detail")
+        log.info("summary")
+        pipeline.stop()
+
+        assert info.messages == ["summary"]
+        assert debug.messages == ["detail", "summary"]
+
+
+class TestBoundedQueue:
+    """Test overflow behavior and drop accounting."""
+
+    def test_full_queue_drops_without_blocking(self):
+        """enqueue never blocks and counts dropped records."""
+        handler = BoundedQueueHandler(queue.Queue(maxsize=2))
+        record = logging.LogRecord('x', logging.INFO, __file__, 1, "msg", None, None)
+
+        for _ in range(5):
+            handler.enqueue(record)
+
+        assert handler.queue.qsize() == 2
+        assert handler.dropped == 3
+
+    def test_drops_reported_after_writer_catches_up(self, make_logger):
+        """Writer logs a single overflow warning once the queue drains."""
+        pipeline, log = make_logger('overflow', capacity=5)
+        gate = threading.Event()
+        output = RecordingHandler(gate=gate)
+        pipeline.add_handler('file', output)
+        pipeline.start()
+
+        for i in range(20):
+            log.info(f"record {i}")
+        gate.set()
+        pipeline.stop()
+
+        dropped = pipeline.stats()['dropped']
+        assert dropped > 0
+        assert f"Log queue overflowed: {dropped} record(s) dropped" in output.messages
+        assert len(output.messages) == 20 - dropped + 1
+
+    def test_stop_drains_queue(self, make_logger):
+        """Records queued before stop() are written."""
+        pipeline, log = make_logger('drain')
+        output = RecordingHandler()
+        pipeline.add_handler('file', output)
+        pipeline.start()
+
+        for i in range(50):
+            log.info(f"record {i}")
+        pipeline.stop()
+
+        assert len(output.messages) == 50
+        assert not pipeline.is_running()
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_record(message, level=logging.INFO):
+    return logging.LogRecord('test', level, __file__, 1, message, None, None)
+
+
+def rotated(directory):
+    return sorted(name for name in os.listdir(directory) if name != 'app.log')
+
+
+class TestRotation:
+    """Test size/age rotation, compression and retention."""
+
+    def test_rotates_when_size_exceeded(self, tmp_path):
+        """Segment is compressed once the next write would exceed max_bytes."""
+        path = tmp_path / 'app.log'
+        handler = RotatingCompressedFileHandler(str(path), max_bytes=100, max_age_seconds=0)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+
+        for i in range(3):
+            handler.emit(make_record(f"line {i} " + 'x' * 40))
+        handler.close()
+
+        archives = rotated(tmp_path)
+        assert len(archives) == 1 and archives[0].endswith('.gz')
+        with gzip.open(tmp_path / archives[0], 'rt') as f:
+            assert f.read().splitlines()[0].startswith('line 0')
+        assert path.read_text().startswith('line 2')
+
+    def test_rotates_when_segment_too_old(self, tmp_path):
+        """Age-based rotation triggers regardless of size."""
+        clock = FakeClock()
+        handler = RotatingCompressedFileHandler(
+            str(tmp_path / 'app.log'), max_bytes=0, max_age_seconds=3600, clock=clock
+        )
+
+        handler.emit(make_record("first"))
+        clock.now += 1800
+        handler.emit(make_record("still fresh"))
+        assert rotated(tmp_path) == []
+
+        clock.now += 1800
+        handler.emit(make_record("new segment"))
+        handler.close()
+
+        assert len(rotated(tmp_path)) == 1
+
+    def test_retention_keeps_backup_count(self, tmp_path):
+        """Only the newest backup_count archives are kept."""
+        clock = FakeClock()
+        handler = RotatingCompressedFileHandler(
+            str(tmp_path / 'app.log'), max_bytes=0, max_age_seconds=60,
+            backup_count=3, clock=clock
+        )
+
+        for i in range(7):
+            handler.emit(make_record(f"segment {i}"))
+            clock.now += 60
+        handler.close()
+
+        archives = rotated(tmp_path)
+        assert len(archives) == 3
+        assert all(name.endswith('.gz') for name in archives)
+        with gzip.open(tmp_path / archives[-1], 'rt') as f:
+            assert 'segment 5' in f.read()
+
+    def test_retention_keeps_newest_within_one_second(self, tmp_path):
+        """Segments rotated in the same second are pruned oldest first."""
+        handler = RotatingCompressedFileHandler(
+            str(tmp_path / 'app.log'), max_bytes=10, max_age_seconds=0,
+            backup_count=3, clock=FakeClock()
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+
+        for i in range(12):
+            handler.emit(make_record(f"segment {i:02d}"))
+        handler.close()
+
+        contents = []
+        for name in rotated(tmp_path):
+            with gzip.open(tmp_path / name, 'rt') as f:
+                contents.append(f.read().strip())
+        assert contents == ['segment 08', 'segment 09', 'segment 10']
+
+    def test_retention_order_survives_dst_change(self, tmp_path, monkeypatch):
+        """Names stay in age order when local time falls back an hour."""
+        monkeypatch.setenv('TZ', 'Europe/Berlin')
+        time.tzset()
+        try:
+            # 2025-10-26 00:00 UTC: rotations at 02:30 CEST, 02:00 CET, 02:30 CET
+            clock = FakeClock(1_761_436_800.0)
+            handler = RotatingCompressedFileHandler(
+                str(tmp_path / 'app.log'), max_bytes=0, max_age_seconds=1800,
+                backup_count=2, clock=clock
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            for i in range(5):
+                handler.emit(make_record(f"segment {i}"))
+                clock.now += 1800
+            handler.close()
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+
+        contents = []
+        for name in rotated(tmp_path):
+            with gzip.open(tmp_path / name, 'rt') as f:
+                contents.append(f.read().strip())
+        assert contents == ['segment 2', 'segment 3']
+
+    def test_existing_stale_file_rotated_on_first_write(self, tmp_path):
+        """A leftover file older than max_age starts a new segment."""
+        path = tmp_path / 'app.log'
+        path.write_text("from previous boot\n")
+        old = path.stat().st_mtime - 7200
+        os.utime(path, (old, old))
+
+        handler = RotatingCompressedFileHandler(str(path), max_bytes=0, max_age_seconds=3600)
+        handler.emit(make_record("after restart"))
+        handler.close()
+
+        assert len(rotated(tmp_path)) == 1
+        assert 'from previous boot' not in path.read_text()
+
+    def test_compression_runs_off_the_writer_thread(self, tmp_path):
+        """Rollover returns before compression finishes."""
+        handler = RotatingCompressedFileHandler(str(tmp_path / 'app.log'), max_bytes=10, max_age_seconds=0)
+        gate = threading.Event()
+        original = handler.compressor.compress
+        handler.compressor.compress = lambda segment: (gate.wait(), original(segment))[1]
+
+        handler.emit(make_record("0123456789"))
+        start = time.perf_counter()
+        handler.emit(make_record("rotate now"))
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.5
+        assert not any(name.endswith('.gz') for name in rotated(tmp_path))
+        gate.set()
+        handler.close()
+        assert rotated(tmp_path)[0].endswith('.gz')
+
+
+class TestLogSampler:
+    """Test rate-limited sampling of repetitive debug lines."""
+
+    def test_unchanged_lines_suppressed_within_interval(self):
+        """Identical heartbeats pass once per interval with a repeat count."""
+        clock = FakeClock(0.0)
+        sampler = LogSampler(('Connection check:',), interval=600, clock=clock)
+        line = "Connection check: connected, state=CLIENT, failures=0"
+
+        passed = []
+        for _ in range(25):
+            record = make_record(line, logging.DEBUG)
+            if sampler.filter(record):
+                passed.append(record.getMessage())
+            clock.now += 30
+
+        assert passed == [line, f"{line} (19 similar suppressed)"]
+        assert sampler.suppressed == 23
+
+    def test_changed_line_always_passes(self):
+        """State changes are never hidden by sampling."""
+        sampler = LogSampler(('Connection check:',), clock=FakeClock(0.0))
+
+        assert sampler.filter(make_record("Connection check: connected", logging.DEBUG))
+        assert not sampler.filter(make_record("Connection check: connected", logging.DEBUG))
+        assert sampler.filter(make_record("Connection check: disconnected", logging.DEBUG))
+
+    def test_other_messages_and_levels_untouched(self):
+        """Non-matching prefixes and INFO+ records always pass."""
+        sampler = LogSampler(('Connection check:',), clock=FakeClock(0.0))
+
+        for _ in range(3):
+            assert sampler.filter(make_record("Scan complete", logging.DEBUG))
+            assert sampler.filter(make_record("Connection check: connected", logging.INFO))
+
+
+class TestLoggingLatencyBenchmark:
+    """Log-call latency while the output device stalls."""
+
+    def test_log_calls_do_not_wait_for_stalled_writes(self, make_logger):
+        """Callers see microseconds while every write stalls for 20 ms."""
+        pipeline, log = make_logger('benchmark', capacity=50)
+        pipeline.add_handler('file', RecordingHandler(delay=0.02))
+        pipeline.start()
+
+        latencies = []
+        for i in range(500):
+            start = time.perf_counter()
+            log.info("Connection check result: %s", i)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99)]
+
+        direct = logging.getLogger('test.logpipeline.direct')
+        direct.propagate = False
+        stalled = RecordingHandler(delay=0.02)
+        direct.addHandler(stalled)
+        start = time.perf_counter()
+        direct.warning("blocking write")
+        blocking = time.perf_counter() - start
+        direct.removeHandler(stalled)
+
+        assert p99 < 0.005, f"log call p99 via pipeline: {p99 * 1e6:.0f} us"
+        assert pipeline.stats()['dropped'] > 0
+        assert blocking >= 0.02, f"direct stalled write: {blocking * 1e3:.1f} ms"
@@ -4,10 +4,12 @@ Tests execution mode detection, logging, signal handling, and service lifecycle.
 """
 
 import pytest
-from unittest.mock import Mock, patch, MagicMock, call
+from unittest.mock import Mock, AsyncMock, patch, MagicMock, call
 import asyncio
 import signal
+import socket
 import sys
+import tempfile
 
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../'))
@@ -19,11 +21,15 @@ from main import (
     signal_handler,
     register_signal_handlers,
     graceful_shutdown,
+    open_portal,
     run_service,
     main,
     ServiceControllerError,
     LoggingConfigurationError,
-    PrivilegeError
+    PrivilegeError,
+    SystemdNotifier,
+    ReadinessReporter,
+    watchdog_loop
 )
 
 
@@ -32,24 +38,24 @@ class TestExecutionModeDetection:
     
     def test_detect_bootstrap_mode_when_service_not_installed(self):
         """Returns 'bootstrap' when service file doesn't exist."""
-        with patch('main.InstallationDetector.is_service_installed', return_value=False):
+        with patch('main.is_service_installed', return_value=False):
             assert detect_execution_mode() == 'bootstrap'
     
     def test_detect_service_mode_when_systemd_context(self):
         """Returns 'service' when INVOCATION_ID present."""
-        with patch('main.InstallationDetector.is_service_installed', return_value=True), \
+        with patch('main.is_service_installed', return_value=True), \
              patch.dict('os.environ', {'INVOCATION_ID': 'test-id'}):
             assert detect_execution_mode() == 'service'
     
     def test_detect_manual_mode_when_service_installed_no_systemd(self):
         """Returns 'manual' when service exists but no INVOCATION_ID."""
-        with patch('main.InstallationDetector.is_service_installed', return_value=True), \
+        with patch('main.is_service_installed', return_value=True), \
              patch.dict('os.environ', {}, clear=True):
             assert detect_execution_mode() == 'manual'
     
     def test_detect_mode_returns_manual_on_exception(self):
         """Returns 'manual' as safe fallback on error."""
-        with patch('main.InstallationDetector.is_service_installed', side_effect=Exception("Error")):
+        with patch('main.is_service_installed', side_effect=Exception("Error")):
             assert detect_execution_mode() == 'manual'
 
 
@@ -78,7 +84,7 @@ class TestLoggingConfiguration:
     def test_configure_logging_creates_file_handler(self):
         """File handler created for all modes."""
         with patch('pathlib.Path.mkdir'), \
-             patch('logging.FileHandler') as mock_file_handler, \
+             patch('main.RotatingCompressedFileHandler') as mock_file_handler, \
              patch('logging.StreamHandler'), \
              patch('os.chmod'):
             
@@ -89,7 +95,7 @@ class TestLoggingConfiguration:
     def test_configure_logging_adds_console_handler_in_manual_mode(self):
         """Console handler added only in manual mode."""
         with patch('pathlib.Path.mkdir'), \
-             patch('logging.FileHandler'), \
+             patch('main.RotatingCompressedFileHandler'), \
              patch('logging.StreamHandler') as mock_console_handler, \
              patch('os.chmod'):
             
@@ -100,7 +106,7 @@ class TestLoggingConfiguration:
     def test_configure_logging_no_console_in_service_mode(self):
         """No console handler in service mode."""
         with patch('pathlib.Path.mkdir'), \
-             patch('logging.FileHandler'), \
+             patch('main.RotatingCompressedFileHandler'), \
              patch('logging.StreamHandler') as mock_console_handler, \
              patch('os.chmod'):
             
@@ -111,7 +117,7 @@ class TestLoggingConfiguration:
     def test_configure_logging_raises_on_file_failure(self):
         """Raises LoggingConfigurationError if log file inaccessible."""
         with patch('pathlib.Path.mkdir'), \
-             patch('logging.FileHandler', side_effect=PermissionError("Denied")):
+             patch('main.RotatingCompressedFileHandler', side_effect=PermissionError("Denied")):
             
             with pytest.raises(LoggingConfigurationError):
                 configure_logging('service')
@@ -221,6 +227,43 @@ class TestRunService:
             
             mock_class.assert_called_once()
     
+    @pytest.mark.asyncio
+    async def test_run_service_adopts_activated_portal_before_monitor_runs(self):
+        """A systemd-passed portal socket is adopted at service start."""
+        events = []
+        services = Mock()
+        services.portal.open = AsyncMock(side_effect=lambda: events.append('open'))
+        mock_monitor = Mock()
+        
+        async def run():
+            events.append('run')
+        
+        mock_monitor.run = run
+        
+        with patch('main.ServiceComponents', return_value=services), \
+             patch('main.StateMonitor', return_value=mock_monitor), \
+             patch('main.graceful_shutdown', return_value=asyncio.sleep(0)), \
+             patch('asyncio.Event') as mock_event_class, \
+             patch.dict(os.environ, {'LISTEN_FDS': '1'}):
+            mock_event_class.return_value.wait = Mock(return_value=asyncio.sleep(0))
+            
+            await run_service()
+        
+        assert events == ['open', 'run']
+        services.portal.start_server.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_open_portal_defers_without_socket_activation(self):
+        """Without LISTEN_FDS the portal is left for the first AP entry."""
+        services = Mock()
+        services.portal.open = AsyncMock()
+        
+        with patch.dict(os.environ):
+            os.environ.pop('LISTEN_FDS', None)
+            await open_portal(services)
+        
+        services.portal.open.assert_not_awaited()
+    
     @pytest.mark.asyncio
     async def test_run_service_raises_on_critical_failure(self):
         """Raises ServiceControllerError on critical failure."""
@@ -229,6 +272,129 @@ class TestRunService:
                 await run_service()
 
 
+@pytest.fixture
+def notify_socket():
+    """Bound AF_UNIX datagram socket standing in for systemd's notify socket."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'notify')
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(path)
+        sock.settimeout(1.0)
+        yield path, sock
+        sock.close()
+
+
+class TestSystemdNotifier:
+    """Test sd_notify datagrams against a local socket."""
+    
+    def test_disabled_without_notify_socket(self):
+        """No NOTIFY_SOCKET means notifications are no-ops."""
+        notifier = SystemdNotifier({})
+        
+        assert not notifier.enabled
+        assert notifier.ready() is False
+        assert notifier.watchdog_interval() is None
+    
+    def test_ready_status_and_watchdog_sent(self, notify_socket):
+        """Messages arrive as individual datagrams."""
+        path, sock = notify_socket
+        notifier = SystemdNotifier({'NOTIFY_SOCKET': path})
+        
+        assert notifier.ready()
+        assert notifier.status('State: CLIENT')
+        assert notifier.watchdog()
+        assert notifier.stopping()
+        notifier.close()
+        
+        assert [sock.recv(256) for _ in range(4)] == [
+            b'READY=1', b'STATUS=State: CLIENT', b'WATCHDOG=1', b'STOPPING=1'
+        ]
+    
+    def test_abstract_namespace_address(self):
+        """Leading '@' maps to the abstract socket namespace."""
+        notifier = SystemdNotifier({'NOTIFY_SOCKET': '@/org/freedesktop/systemd1/notify'})
+        
+        assert notifier.address == '\0/org/freedesktop/systemd1/notify'
+    
+    def test_send_failure_returns_false(self, notify_socket):
+        """Unreachable socket is reported, not raised."""
+        path, sock = notify_socket
+        notifier = SystemdNotifier({'NOTIFY_SOCKET': path + '-missing'})
+        
+        assert notifier.ready() is False
+    
+    @pytest.mark.parametrize('environ,expected', [
+        ({'WATCHDOG_USEC': '30000000'}, 15.0),
+        ({'WATCHDOG_USEC': '30000000', 'WATCHDOG_PID': str(os.getpid())}, 15.0),
+        ({'WATCHDOG_USEC': '30000000', 'WATCHDOG_PID': '1'}, None),
+        ({'WATCHDOG_USEC': 'bogus'}, None),
+        ({}, None),
+    ])
+    def test_watchdog_interval(self, environ, expected):
+        """Interval is half of WATCHDOG_USEC when addressed to this process."""
+        notifier = SystemdNotifier(dict(environ, NOTIFY_SOCKET='/run/systemd/notify'))
+        
+        assert notifier.watchdog_interval() == expected
+
+
+class TestReadinessReporting:
+    """Test READY/STATUS reporting and watchdog pings."""
+    
+    def test_ready_sent_once_and_status_on_change(self):
+        """READY=1 after first check; STATUS only when the state changes."""
+        notifier = Mock()
+        reporter = ReadinessReporter(notifier)
+        monitor = Mock()
+        monitor.current_state.name = 'CHECKING'
+        
+        reporter(monitor)
+        reporter(monitor)
+        monitor.current_state.name = 'AP_MODE'
+        reporter(monitor)
+        
+        notifier.ready.assert_called_once()
+        assert notifier.status.call_args_list == [call('State: CHECKING'), call('State: AP_MODE')]
+    
+    @pytest.mark.asyncio
+    async def test_watchdog_loop_pings(self, notify_socket):
+        """Watchdog loop sends WATCHDOG=1 every interval until cancelled."""
+        path, sock = notify_socket
+        notifier = SystemdNotifier({'NOTIFY_SOCKET': path})
+        
+        task = asyncio.create_task(watchdog_loop(notifier, 0.01))
+        await asyncio.sleep(0.055)
+        task.cancel()
+        notifier.close()
+        
+        sock.setblocking(False)
+        pings = []
+        try:
+            while True:
+                pings.append(sock.recv(64))
+        except BlockingIOError:
+            pass
+        assert len(pings) >= 3
+        assert set(pings) == {b'WATCHDOG=1'}
+    
+    @pytest.mark.asyncio
+    async def test_run_service_registers_readiness_listener(self):
+        """run_service hooks the reporter into StateMonitor."""
+        mock_monitor = Mock()
+        mock_monitor.run = Mock(return_value=asyncio.sleep(0))
+        
+        mock_event = Mock()
+        mock_event.wait = Mock(return_value=asyncio.sleep(0))
+        
+        with patch('main.StateMonitor', return_value=mock_monitor), \
+             patch('main.graceful_shutdown', return_value=asyncio.sleep(0)), \
+             patch('asyncio.Event', return_value=mock_event), \
+             patch.dict('os.environ', {}, clear=True):
+            await run_service()
+        
+        listener = mock_monitor.add_listener.call_args[0][0]
+        assert isinstance(listener, ReadinessReporter)
+
+
 class TestMainFunction:
     """Test main() entry point."""
     
@@ -309,9 +475,127 @@ class TestMainFunction:
             
             assert result == 1
     
+    def test_main_dispatches_provision(self):
+        """'provision' hands remaining arguments to the image provisioner."""
+        with patch.object(sys, 'argv', ['main.py', 'provision', '/mnt/image']), \
+             patch('main.provision_main', return_value=0) as mock_provision, \
+             patch('main.detect_execution_mode') as mock_detect:
+            
+            assert main() == 0
+        
+        mock_provision.assert_called_once_with(['/mnt/image'])
+        mock_detect.assert_not_called()
+    
+    def test_main_dispatches_install_in_any_mode(self):
+        """'install' runs the installer even when the service is installed."""
+        with patch.object(sys, 'argv', ['main.py', 'install']), \
+             patch('main.install_main', return_value=0) as mock_install, \
+             patch('main.detect_execution_mode', return_value='manual') as mock_detect:
+            
+            assert main() == 0
+        
+        mock_install.assert_called_once_with([])
+        mock_detect.assert_not_called()
+    
     def test_main_returns_error_on_unexpected_exception(self):
         """Returns 1 on unexpected exception."""
         with patch('main.detect_execution_mode', side_effect=Exception("Unexpected")):
             result = main()
             
             assert result == 1
+
+
+# Cold-start import budget in milliseconds per CPU class (platform.machine())
+# for the service start path: import main, detect the execution mode,
+# construct the wired StateMonitor and open the portal as run_service does,
+# measured with -X importtime. Override with PI_NETCONFIG_COLD_START_BUDGET_MS,
+# or pick a class with PI_NETCONFIG_CPU_CLASS when measuring on other hardware.
+COLD_START_BUDGET_MS = {
+    'armv6l': 6000,   # Pi Zero / Pi 1
+    'armv7l': 2500,   # Pi 2 / 32-bit OS on Pi 3-4
+    'aarch64': 1200,  # 64-bit OS on Pi 3-5
+    'x86_64': 400,    # development and CI machines
+}
+COLD_START_SAMPLES = 3
+COLD_START_PROBE = """
+import asyncio, sys
+print(' '.join(sys.modules))
+import main
+main.detect_execution_mode()
+services = main._component('ServiceComponents')()
+main.build_state_monitor(services)
+asyncio.run(main.open_portal(services))
+"""
+
+
+def parse_importtime(stderr, preloaded):
+    """Total self time in ms and names of modules imported after start-up."""
+    total_us = 0
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header line
+        name = fields[2].strip()
+        if name in preloaded:
+            continue
+        modules.add(name)
+        total_us += int(fields[0])
+    return total_us / 1000, modules
+
+
+def measure_cold_start():
+    """Best-of-N cold-start import time in ms, plus the modules imported."""
+    import subprocess
+    src = os.path.join(os.path.dirname(__file__), '../../')
+    env = {key: value for key, value in os.environ.items() if not key.startswith('LISTEN_')}
+    samples = []
+    # First run compiles bytecode; it is not a cold start on an installed system
+    for _ in range(COLD_START_SAMPLES + 1):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', COLD_START_PROBE],
+                                cwd=src, env=env, capture_output=True, text=True, check=True)
+        samples.append(parse_importtime(result.stderr, set(result.stdout.split())))
+    return min(samples[1:], key=lambda sample: sample[0])
+
+
+class TestImportBudget:
+    """Regression tests for startup import cost."""
+    
+    def test_service_cold_start_within_budget(self):
+        """The service start path imports within budget and skips AP-only modules."""
+        import platform
+        cpu_class = os.environ.get('PI_NETCONFIG_CPU_CLASS', platform.machine())
+        budget = float(os.environ.get('PI_NETCONFIG_COLD_START_BUDGET_MS',
+                                      COLD_START_BUDGET_MS.get(cpu_class, 400)))
+        
+        elapsed, modules = measure_cold_start()
+        
+        assert {'main', 'statemonitor', 'components'} <= modules
+        assert not modules & {'installer', 'webserver', 'http.server', 'apmanager'}
+        assert elapsed <= budget, (
+            f"service cold start imports took {elapsed:.1f} ms, "
+            f"budget {budget:.0f} ms ({cpu_class})"
+        )
+    
+    def test_import_main_defers_mode_specific_modules(self):
+        """Installer, state machine and HTTP server load only when a mode needs them."""
+        import subprocess
+        src = os.path.join(os.path.dirname(__file__), '../../')
+        probe = ("import sys, main; print(sorted(m for m in ('installer', 'statemonitor', "
+                 "'controlsocket', 'webserver', 'http.server', 'apmanager', 'components') "
+                 "if m in sys.modules))")
+        
+        output = subprocess.check_output([sys.executable, '-c', probe], cwd=src)
+        
+        assert output.strip() == b'[]'
+    
+    def test_lazy_names_resolve(self):
+        """Deferred names are still attributes of main."""
+        import main as main_module
+        from statemonitor import StateMonitor
+        
+        assert main_module.StateMonitor is StateMonitor
+        with pytest.raises(AttributeError):
+            main_module.NoSuchComponent
@@ -34,7 +34,7 @@ from main import (
 class TestExecutionModeDetection:
     """Test execution mode detection logic."""
     
-    @patch('main.InstallationDetector.is_service_installed')
+    @patch('main.is_service_installed')
     def test_detect_execution_mode_returns_bootstrap_when_not_installed(self, mock_is_installed):
         """TC-001: Verify detect_execution_mode returns 'bootstrap' when service not installed."""
         mock_is_installed.return_value = False
@@ -44,7 +44,7 @@ class TestExecutionModeDetection:
         assert mode == 'bootstrap'
     
     @patch.dict('os.environ', {'INVOCATION_ID': 'test123'})
-    @patch('main.InstallationDetector.is_service_installed')
+    @patch('main.is_service_installed')
     def test_detect_execution_mode_returns_service_when_under_systemd(self, mock_is_installed):
         """TC-002: Verify detect_execution_mode returns 'service' when under systemd."""
         mock_is_installed.return_value = True
@@ -54,7 +54,7 @@ class TestExecutionModeDetection:
         assert mode == 'service'
     
     @patch.dict('os.environ', {}, clear=True)
-    @patch('main.InstallationDetector.is_service_installed')
+    @patch('main.is_service_installed')
     def test_detect_execution_mode_returns_manual_when_installed_but_not_systemd(self, mock_is_installed):
         """TC-003: Verify detect_execution_mode returns 'manual' when installed but not systemd."""
         mock_is_installed.return_value = True
@@ -118,7 +118,7 @@ class TestLoggingConfiguration:
     
     def test_configure_logging_raises_error_on_permission_denied(self):
         """TC-008: Verify configure_logging raises LoggingConfigurationError on permission denied."""
-        with patch('logging.FileHandler', side_effect=PermissionError("Permission denied")):
+        with patch('main.RotatingCompressedFileHandler', side_effect=PermissionError("Permission denied")):
             with pytest.raises(LoggingConfigurationError):
                 configure_logging('service')
 
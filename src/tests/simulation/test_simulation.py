@@ -0,0 +1,169 @@
+"""
+Unit tests for simulation.py module
+
+Checks the virtual clock and timeline helpers, then runs the named
+scenarios against the real StateMonitor and holds the results to recovery
+and flapping budgets so a policy change that slows recovery or thrashes
+the access point fails CI.
+"""
+
+import pytest
+import asyncio
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../'))
+
+from simulation import (
+    VirtualClockLoop,
+    Timeline,
+    Latencies,
+    SCENARIOS,
+    DAY_SECONDS,
+    simulate,
+    analyze,
+    main as simulation_main,
+)
+
+# Policy budgets (virtual seconds): three failed checks 30s apart plus AP bring-up
+TIME_TO_AP_BUDGET = 120.0
+# One check interval plus check latency and AP teardown
+TIME_TO_CLIENT_BUDGET = 60.0
+WALL_CLOCK_BUDGET_SECONDS = 10.0
+
+
+@pytest.fixture(scope='module')
+def reports():
+    return {name: scenario() for name, scenario in SCENARIOS.items()}
+
+
+class TestVirtualClock:
+    """Test the virtual-time event loop."""
+
+    def test_sleep_advances_virtual_time_only(self):
+        """A day-long sleep completes instantly with the clock a day ahead."""
+        loop = VirtualClockLoop(start=100.0)
+        started = time.monotonic()
+        try:
+            loop.run_until_complete(asyncio.sleep(DAY_SECONDS))
+            assert loop.time() == pytest.approx(100.0 + DAY_SECONDS)
+        finally:
+            loop.close()
+        assert time.monotonic() - started < 1.0
+
+    def test_timers_fire_in_order(self):
+        """Concurrent sleeps wake in virtual-time order."""
+        loop = VirtualClockLoop()
+        order = []
+
+        async def sleeper(delay):
+            await asyncio.sleep(delay)
+            order.append((delay, loop.time()))
+
+        async def run():
+            await asyncio.gather(sleeper(30.0), sleeper(5.0), sleeper(600.0))
+
+        try:
+            loop.run_until_complete(run())
+        finally:
+            loop.close()
+        assert [delay for delay, _ in order] == [5.0, 30.0, 600.0]
+        assert [when for _, when in order] == pytest.approx([5.0, 30.0, 600.0])
+
+
+class TestTimeline:
+    """Test scripted connectivity."""
+
+    def test_outages(self):
+        """Link is down only inside outage windows."""
+        timeline = Timeline.outages([(100.0, 50.0)])
+
+        assert timeline.connected(99.0)
+        assert not timeline.connected(100.0)
+        assert timeline.connected(150.0)
+        assert timeline.last_edge(120.0, False) == 100.0
+        assert timeline.last_edge(120.0, True) is None
+
+    def test_flapping(self):
+        """Flapping alternates down/up periods and ends up."""
+        timeline = Timeline.flapping(up=10.0, down=5.0, start=0.0, end=30.0)
+
+        assert [timeline.connected(t) for t in (1, 6, 16, 21, 31, 100)] == [
+            False, True, False, True, True, True
+        ]
+
+    def test_analyze_counts_flaps_and_spurious_entries(self):
+        """Short AP episodes are flaps; AP entries while up are spurious."""
+        timeline = Timeline.outages([(1000.0, 60.0)])
+        transitions = [
+            (5.0, 'CHECKING', 'CLIENT'),
+            (500.0, 'CLIENT', 'AP_MODE'),
+            (600.0, 'AP_MODE', 'CLIENT'),
+            (1100.0, 'CLIENT', 'AP_MODE'),
+        ]
+
+        report = analyze(timeline, transitions, 2000.0, 10)
+
+        assert report.ap_episodes == 2
+        assert report.spurious_ap == 2
+        assert report.flaps == 1
+        assert report.max_transitions_per_hour == 4
+
+
+class TestScenarios:
+    """Regression budgets for the state machine policy."""
+
+    def test_steady_link_stays_client(self, reports):
+        """A healthy link goes to CLIENT once and stays there."""
+        report = reports['steady']
+
+        assert [t[2] for t in report.transitions] == ['CLIENT']
+        assert report.checks > DAY_SECONDS / 31
+
+    @pytest.mark.parametrize('name', ['long_outages', 'week'])
+    def test_outage_recovery_within_budget(self, reports, name):
+        """Every long outage reaches AP_MODE and returns to CLIENT in budget."""
+        report = reports[name]
+
+        assert report.ap_episodes == len(report.time_to_ap) > 0
+        assert len(report.time_to_client) == report.ap_episodes
+        assert max(report.time_to_ap) <= TIME_TO_AP_BUDGET
+        assert max(report.time_to_client) <= TIME_TO_CLIENT_BUDGET
+        assert report.flaps == 0
+
+    @pytest.mark.parametrize('name', ['short_blips', 'flapping'])
+    def test_short_drops_do_not_start_ap(self, reports, name):
+        """Drops shorter than three check intervals never raise the AP."""
+        assert reports[name].ap_episodes == 0
+
+    def test_partial_failures_rarely_start_ap(self, reports):
+        """5% random check failures cause at most one AP episode a day."""
+        report = reports['partial_failures']
+
+        assert report.spurious_ap <= 1
+        assert report.max_transitions_per_hour <= 2
+
+    def test_runs_are_deterministic(self):
+        """Same timeline and seed give identical transitions."""
+        timeline = Timeline.outages([(600.0, 900.0)])
+        latencies = Latencies(check=2.0)
+
+        first = simulate(timeline, 3600.0, latencies, failure_rate=0.1, seed=3)
+        second = simulate(timeline, 3600.0, latencies, failure_rate=0.1, seed=3)
+
+        assert first.transitions == second.transitions
+
+    def test_week_runs_in_seconds(self):
+        """Seven simulated days finish well inside the wall-clock budget."""
+        started = time.monotonic()
+
+        report = SCENARIOS['week']()
+
+        assert report.duration == 7 * DAY_SECONDS
+        assert time.monotonic() - started < WALL_CLOCK_BUDGET_SECONDS
+
+    def test_main_rejects_unknown_scenario(self, capsys):
+        """Unknown scenario names exit 2."""
+        assert simulation_main(['nope']) == 2
+        assert 'steady' in capsys.readouterr().err
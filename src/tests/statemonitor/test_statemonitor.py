@@ -9,6 +9,9 @@ Coverage Target: 80%
 import pytest
 from unittest.mock import Mock, patch, AsyncMock, MagicMock
 import asyncio
+import json
+import threading
+import time
 from enum import Enum
 
 import sys
@@ -18,6 +21,14 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../'))
 from statemonitor import (
     SystemState,
     StateMonitor,
+    StateCheckpoint,
+    TransitionEvent,
+    TransitionHistory,
+    TransitionJournal,
+    TransitionExecutor,
+    TransitionRequest,
+    StatusSnapshot,
+    FLAP_WINDOW_SECONDS,
     run,
     StateMonitorError,
     StateTransitionError,
@@ -293,6 +304,898 @@ class TestMonitoringLoop:
             mock_handle.assert_called()
 
 
+class FakeStationProbe:
+    """Stand-in for apmanager.StationProbe."""
+    
+    def __init__(self, visible=None, connects=True, events=None):
+        self.visible = visible
+        self.connects = connects
+        self.released = 0
+        self.events = [] if events is None else events
+    
+    async def find_known_network(self):
+        return self.visible
+    
+    async def connect_known(self, ssid):
+        return self.connects
+    
+    async def activate_primary(self, ssid):
+        self.events.append(('activate_primary', ssid))
+        return True
+    
+    async def release(self):
+        self.events.append(('release',))
+        self.released += 1
+
+
+class TestListeners:
+    """Test post-check listener hooks."""
+    
+    @pytest.mark.asyncio
+    async def test_listener_called_after_each_check(self):
+        """Listeners receive the monitor after a completed check."""
+        mock_conn = Mock()
+        mock_conn.test_connection = AsyncMock(return_value=True)
+        seen = []
+        
+        sm = StateMonitor(mock_conn, Mock(), Mock())
+        sm.shutdown_event = asyncio.Event()
+        sm.add_listener(lambda monitor: seen.append(monitor.current_state))
+        
+        async def transition():
+            sm.current_state = SystemState.CLIENT
+        
+        with patch.object(sm, 'transition_to_client', side_effect=transition):
+            async def run_once():
+                await asyncio.sleep(0.1)
+                sm.shutdown_event.set()
+            
+            await asyncio.gather(sm.monitoring_loop(), run_once())
+        
+        assert seen == [SystemState.CLIENT]
+    
+    def test_failing_listener_does_not_stop_others(self):
+        """Listener exceptions are logged and remaining listeners still run."""
+        sm = StateMonitor(Mock(), Mock(), Mock())
+        second = Mock()
+        sm.add_listener(Mock(side_effect=RuntimeError("boom")))
+        sm.add_listener(second)
+        
+        sm.notify_listeners()
+        
+        second.assert_called_once_with(sm)
+
+
+class TestRuntimeControl:
+    """Test history, forced checks and forced AP_MODE."""
+    
+    def test_set_state_records_history(self):
+        """Only real changes are recorded."""
+        sm = StateMonitor(Mock(), Mock(), Mock())
+        
+        sm.set_state(SystemState.CLIENT)
+        sm.set_state(SystemState.CLIENT)
+        sm.set_state(SystemState.AP_MODE)
+        
+        assert [(e.from_state, e.to_state) for e in sm.history] == [
+            ('CHECKING', 'CLIENT'), ('CLIENT', 'AP_MODE')
+        ]
+        assert sm.counters['transitions'] == 2
+    
+    @pytest.mark.asyncio
+    async def test_request_check_wakes_loop(self):
+        """A requested check runs without waiting 30 seconds."""
+        mock_conn = Mock()
+        mock_conn.test_connection = AsyncMock(return_value=False)
+        sm = StateMonitor(mock_conn, Mock(), Mock())
+        sm.shutdown_event = asyncio.Event()
+        
+        task = asyncio.create_task(sm.monitoring_loop())
+        await asyncio.sleep(0.05)
+        sm.request_check()
+        await asyncio.sleep(0.05)
+        sm.shutdown_event.set()
+        await asyncio.wait_for(task, 1.0)
+        
+        assert mock_conn.test_connection.await_count == 2
+        assert sm.counters['checks'] == 2
+    
+    @pytest.mark.asyncio
+    async def test_forced_ap_held_while_connected(self):
+        """Successful checks do not leave a forced AP_MODE during the hold."""
+        mock_conn = Mock()
+        mock_conn.test_connection = AsyncMock(return_value=True)
+        sm = StateMonitor(mock_conn, AsyncMock(), AsyncMock())
+        sm.shutdown_event = asyncio.Event()
+        
+        await sm.force_ap_mode(hold=60)
+        with patch.object(sm, 'transition_to_client', new_callable=AsyncMock) as mock_client:
+            async def run_once():
+                await asyncio.sleep(0.05)
+                sm.shutdown_event.set()
+            await asyncio.gather(sm.monitoring_loop(), run_once())
+        
+        assert sm.current_state == SystemState.AP_MODE
+        mock_client.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_run_returns_after_shutdown(self):
+        """run() initializes, monitors, and returns once shutdown() cancels it."""
+        mock_conn = Mock()
+        mock_conn.test_connection = AsyncMock(return_value=True)
+        sm = StateMonitor(mock_conn, AsyncMock(), AsyncMock())
+        
+        task = asyncio.create_task(sm.run())
+        await asyncio.sleep(0.05)
+        await sm.shutdown()
+        await asyncio.wait_for(task, 1.0)
+        
+        assert sm.counters['checks'] >= 1
+        assert sm.status()['ap_active'] is False
+
+
+class TestCheckpoint:
+    """Test persisted last-known state and warm restart."""
+    
+    def test_save_and_load_roundtrip(self, tmp_path):
+        """Saved data is read back with version and timestamp."""
+        checkpoint = StateCheckpoint(str(tmp_path / 'state.json'))
+        
+        assert checkpoint.save({'state': 'CLIENT', 'failure_count': 1})
+        data = checkpoint.load()
+        
+        assert data['state'] == 'CLIENT'
+        assert data['failure_count'] == 1
+        assert os.listdir(tmp_path) == ['state.json']
+    
+    @pytest.mark.parametrize('content', [
+        'not json',
+        '{"version": 1, "state": "BOGUS", "saved_at": 0}',
+        '{"version": 99, "state": "CLIENT", "saved_at": 0}',
+        '[]',
+    ])
+    def test_invalid_checkpoint_ignored(self, tmp_path, content):
+        """Corrupt or unknown checkpoints are ignored."""
+        path = tmp_path / 'state.json'
+        path.write_text(content)
+        
+        assert StateCheckpoint(str(path)).load() is None
+    
+    def test_stale_or_future_checkpoint_ignored(self, tmp_path):
+        """Checkpoints older than max_age or from the future are ignored."""
+        checkpoint = StateCheckpoint(str(tmp_path / 'state.json'), max_age=60)
+        checkpoint.save({'state': 'AP_MODE'})
+        
+        with patch('statemonitor.time.time', return_value=time.time() + 61):
+            assert checkpoint.load() is None
+        with patch('statemonitor.time.time', return_value=time.time() - 3600):
+            assert checkpoint.load() is None
+    
+    def test_missing_directory_not_fatal(self):
+        """Unwritable location logs and returns False."""
+        checkpoint = StateCheckpoint('/proc/pi-netconfig/state.json')
+        
+        assert checkpoint.save({'state': 'CLIENT'}) is False
+    
+    @pytest.mark.asyncio
+    async def test_transition_writes_checkpoint(self, tmp_path):
+        """Entering a state checkpoints it immediately."""
+        checkpoint = StateCheckpoint(str(tmp_path / 'state.json'))
+        sm = StateMonitor(Mock(), AsyncMock(), AsyncMock(), checkpoint=checkpoint)
+        sm.failure_count = 3
+        
+        await sm.transition_to_ap_mode()
+        
+        data = checkpoint.load()
+        assert data['state'] == 'AP_MODE'
+        assert data['failure_count'] == 3
+        assert data['last_transition'] is not None
+    
+    @pytest.mark.asyncio
+    async def test_resume_ap_mode_reactivates_immediately(self, tmp_path):
+        """A fresh AP_MODE checkpoint skips the three failed checks."""
+        checkpoint = StateCheckpoint(str(tmp_path / 'state.json'))
+        checkpoint.save({'state': 'AP_MODE', 'failure_count': 5, 'ap_hold_until': 0})
+        ap_manager, web_server = AsyncMock(), AsyncMock()
+        sm = StateMonitor(Mock(), ap_manager, web_server, checkpoint=checkpoint)
+        
+        start = time.perf_counter()
+        assert await sm.resume_from_checkpoint()
+        elapsed = time.perf_counter() - start
+        
+        assert sm.current_state == SystemState.AP_MODE
+        assert sm.failure_count == 5
+        ap_manager.activate_ap.assert_awaited_once()
+        web_server.start_server.assert_awaited_once()
+        assert elapsed < 1.0
+    
+    @pytest.mark.asyncio
+    async def test_resume_client_without_transition(self, tmp_path):
+        """A fresh CLIENT checkpoint restores the state directly."""
+        checkpoint = StateCheckpoint(str(tmp_path / 'state.json'))
+        checkpoint.save({'state': 'CLIENT', 'failure_count': 1})
+        ap_manager = AsyncMock()
+        sm = StateMonitor(Mock(), ap_manager, AsyncMock(), checkpoint=checkpoint)
+        
+        assert await sm.resume_from_checkpoint()
+        
+        assert sm.current_state == SystemState.CLIENT
+        assert sm.failure_count == 1
+        ap_manager.activate_ap.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_resume_failure_falls_back_to_checking(self, tmp_path):
+        """If AP activation fails on resume, monitoring starts from CHECKING."""
+        checkpoint = StateCheckpoint(str(tmp_path / 'state.json'))
+        checkpoint.save({'state': 'AP_MODE', 'failure_count': 3})
+        ap_manager = AsyncMock()
+        ap_manager.activate_ap.side_effect = RuntimeError("nmcli failed")
+        sm = StateMonitor(Mock(), ap_manager, AsyncMock(), checkpoint=checkpoint)
+        
+        assert not await sm.resume_from_checkpoint()
+        assert sm.current_state == SystemState.CHECKING
+    
+    @pytest.mark.asyncio
+    async def test_no_checkpoint_starts_checking(self, tmp_path):
+        """Without a checkpoint file the state machine starts cold."""
+        checkpoint = StateCheckpoint(str(tmp_path / 'state.json'))
+        sm = StateMonitor(Mock(), Mock(), Mock(), checkpoint=checkpoint)
+        
+        assert not await sm.resume_from_checkpoint()
+        assert sm.current_state == SystemState.CHECKING
+
+
+def event(timestamp, old, new, duration=0.0, reason='check'):
+    return TransitionEvent(timestamp, old, new, reason, duration)
+
+
+class TestTransitionHistory:
+    """Test the transition ring buffer and its statistics."""
+    
+    def test_ring_overwrites_oldest(self):
+        """A full buffer keeps the newest events in order."""
+        history = TransitionHistory(capacity=3)
+        for i in range(5):
+            history.append(event(float(i), 'CLIENT', 'AP_MODE'))
+        
+        assert len(history) == 3
+        assert [e.timestamp for e in history] == [2.0, 3.0, 4.0]
+        assert history[0].timestamp == 2.0
+        assert history.last().timestamp == 4.0
+        assert [e.timestamp for e in history.recent(2)] == [3.0, 4.0]
+        assert history.recent(0) == []
+        with pytest.raises(IndexError):
+            history[3]
+    
+    def test_empty(self):
+        """Empty buffer has no last event."""
+        assert TransitionHistory().last() is None
+    
+    def test_stats_time_in_state_and_flaps(self):
+        """Durations accumulate per state; short AP episodes count as flaps."""
+        history = TransitionHistory()
+        history.append(event(100.0, 'CHECKING', 'CLIENT', duration=10.0))
+        history.append(event(1000.0, 'CLIENT', 'AP_MODE', duration=900.0))
+        history.append(event(1060.0, 'AP_MODE', 'CLIENT', duration=60.0))
+        history.append(event(2000.0, 'CLIENT', 'AP_MODE', duration=940.0))
+        history.append(event(2000.0 + FLAP_WINDOW_SECONDS, 'AP_MODE', 'CLIENT',
+                             duration=FLAP_WINDOW_SECONDS))
+        
+        stats = history.stats(now=2400.0, current_state='CLIENT', since=2300.0)
+        
+        assert stats['time_in_state'] == {
+            'CHECKING': 10.0, 'CLIENT': 1940.0, 'AP_MODE': 60.0 + FLAP_WINDOW_SECONDS
+        }
+        assert stats['ap_entries'] == 2
+        assert stats['flaps'] == 1
+        assert stats['window'] == pytest.approx(2010.0 + FLAP_WINDOW_SECONDS)
+    
+    def test_set_state_records_reason_duration_and_probe(self):
+        """Events carry the cause, time in the previous state and last probe."""
+        now = [1000.0]
+        sm = StateMonitor(Mock(), Mock(), Mock(), clock=lambda: now[0])
+        sm.last_probe = {'connected': False, 'latency': 5.0}
+        now[0] = 1090.0
+        
+        sm.set_state(SystemState.AP_MODE, reason='failures')
+        
+        assert sm.history.last() == TransitionEvent(
+            1090.0, 'CHECKING', 'AP_MODE', 'failures', 90.0,
+            {'connected': False, 'latency': 5.0}
+        )
+        status = sm.status()
+        assert status['history'][-1]['reason'] == 'failures'
+        assert status['transition_stats']['time_in_state']['CHECKING'] == 90.0
+        assert sm.metrics()['transitions'] == 1
+    
+    @pytest.mark.asyncio
+    async def test_loop_records_transition_causes(self):
+        """Failures and recovery are labelled in history."""
+        mock_conn = Mock()
+        mock_conn.test_connection = AsyncMock(side_effect=[False, False, False, True])
+        sm = StateMonitor(mock_conn, AsyncMock(), AsyncMock())
+        sm.shutdown_event = asyncio.Event()
+        
+        with patch.object(sm, 'wait_for_next_check', side_effect=[False, False, False, True]):
+            await sm.monitoring_loop()
+        
+        assert [(e.to_state, e.reason) for e in sm.history] == [
+            ('AP_MODE', 'failures'), ('CLIENT', 'connected')
+        ]
+        assert sm.history.last().probe['connected'] is True
+
+
+class TestTransitionJournal:
+    """Test the on-disk transition journal."""
+    
+    def test_append_and_load_roundtrip(self, tmp_path):
+        """Appended events load back unchanged."""
+        journal = TransitionJournal(str(tmp_path / 'log' / 'transitions.jsonl'))
+        first = event(1.0, 'CHECKING', 'CLIENT')
+        second = TransitionEvent(2.0, 'CLIENT', 'AP_MODE', 'failures', 1.0,
+                                 {'connected': False, 'latency': 5.0})
+        
+        assert journal.append(first)
+        assert journal.append(second)
+        
+        assert journal.load() == [first, second]
+    
+    def test_malformed_lines_skipped(self, tmp_path):
+        """A torn final line or unknown state is ignored."""
+        path = tmp_path / 'transitions.jsonl'
+        journal = TransitionJournal(str(path))
+        journal.append(event(1.0, 'CHECKING', 'CLIENT'))
+        with open(path, 'a') as f:
+            f.write('{"timestamp": 2, "from": "CLIENT", "to": "NOPE"}\n')
+            f.write('{"timestamp": 3, "from": "CLI')
+        
+        assert [e.timestamp for e in journal.load()] == [1.0]
+    
+    def test_missing_journal_is_empty(self, tmp_path):
+        """No file yet means no events."""
+        assert TransitionJournal(str(tmp_path / 'none.jsonl')).load() == []
+    
+    def test_compaction_keeps_history(self, tmp_path):
+        """Growing past max_bytes rewrites the file; it still replays to the in-memory history."""
+        path = tmp_path / 'transitions.jsonl'
+        journal = TransitionJournal(str(path), max_bytes=500)
+        # Fixed clock: every journal line has the same length on every run
+        sm = StateMonitor(Mock(), Mock(), Mock(), journal=journal, history_size=2,
+                          clock=lambda: 1000.0)
+        
+        for _ in range(10):
+            sm.set_state(SystemState.AP_MODE)
+            sm.set_state(SystemState.CLIENT)
+        journal.flush()
+        
+        events = journal.load()
+        assert events[-2:] == list(sm.history)
+        assert len(events) < 20
+        assert os.path.getsize(path) <= 500
+        assert os.listdir(tmp_path) == ['transitions.jsonl']
+    
+    @pytest.mark.asyncio
+    async def test_replayed_at_startup(self, tmp_path):
+        """A new monitor starts with the previous run's history."""
+        journal = TransitionJournal(str(tmp_path / 'transitions.jsonl'))
+        previous = StateMonitor(Mock(), Mock(), Mock(), journal=journal)
+        previous.set_state(SystemState.CLIENT)
+        previous.set_state(SystemState.AP_MODE, reason='forced')
+        journal.flush()
+        sm = StateMonitor(Mock(), Mock(), Mock(), journal=journal)
+        
+        with patch.object(sm, 'monitoring_loop', return_value=asyncio.sleep(0)):
+            await sm.initialize()
+        
+        assert list(sm.history) == list(previous.history)
+        assert sm.current_state == SystemState.CHECKING
+        assert sm.metrics()['ap_entries'] == 1
+    
+    def test_set_state_does_not_wait_for_fsync(self, tmp_path):
+        """Transitions return while the writer thread is still syncing."""
+        journal = TransitionJournal(str(tmp_path / 'transitions.jsonl'))
+        sm = StateMonitor(Mock(), Mock(), Mock(), journal=journal)
+        synced = threading.Event()
+        
+        def slow_fsync(fd):
+            time.sleep(0.2)
+            synced.set()
+        
+        with patch('os.fsync', side_effect=slow_fsync):
+            started = time.perf_counter()
+            sm.set_state(SystemState.CLIENT)
+            elapsed = time.perf_counter() - started
+            
+            assert elapsed < 0.1
+            assert not synced.is_set()
+            journal.close()
+        
+        assert synced.is_set()
+        assert journal.load() == [sm.history.last()]
+        assert journal.writer is None
+    
+    @pytest.mark.asyncio
+    async def test_shutdown_flushes_journal(self, tmp_path):
+        """Shutdown waits for queued transitions to reach the journal."""
+        journal = TransitionJournal(str(tmp_path / 'transitions.jsonl'))
+        sm = StateMonitor(Mock(), Mock(), AsyncMock(), journal=journal)
+        sm.shutdown_event = asyncio.Event()
+        sm.set_state(SystemState.CLIENT)
+        
+        await sm.shutdown()
+        
+        assert journal.load() == [sm.history.last()]
+    
+    def test_unwritable_journal_does_not_raise(self):
+        """Journal write failures leave the transition in memory."""
+        journal = TransitionJournal('/proc/pi-netconfig/transitions.jsonl')
+        sm = StateMonitor(Mock(), Mock(), Mock(), journal=journal)
+        
+        sm.set_state(SystemState.CLIENT)
+        
+        assert sm.current_state == SystemState.CLIENT
+        assert len(sm.history) == 1
+
+
+async def hang():
+    await asyncio.sleep(60)
+
+
+class TestTransitionExecutor:
+    """Test serialized, coalesced and cancellable transitions."""
+    
+    @pytest.mark.asyncio
+    async def test_transitions_never_overlap(self):
+        """Concurrent requests for different targets run one at a time."""
+        executor = TransitionExecutor()
+        active, overlaps, ran = [0], [0], []
+        
+        def action(name):
+            async def run():
+                active[0] += 1
+                overlaps[0] = max(overlaps[0], active[0])
+                try:
+                    await asyncio.sleep(0.01)
+                    ran.append(name)
+                finally:
+                    active[0] -= 1
+            return run
+        
+        results = await asyncio.gather(
+            executor.submit(SystemState.AP_MODE, action('ap')),
+            executor.submit(SystemState.CLIENT, action('client')),
+        )
+        
+        assert overlaps[0] == 1
+        assert results == [False, True]
+        assert ran == ['client']
+        assert executor.counters['transitions_superseded'] == 1
+    
+    @pytest.mark.asyncio
+    async def test_repeated_target_coalesced(self):
+        """Requests for the target already queued or running share one run."""
+        executor = TransitionExecutor()
+        action = AsyncMock()
+        
+        results = await asyncio.gather(*[
+            executor.submit(SystemState.AP_MODE, action) for _ in range(3)
+        ])
+        
+        assert results == [True, True, True]
+        action.assert_awaited_once()
+        assert executor.counters['transitions_coalesced'] == 2
+        assert executor.counters['transition_requests'] == 3
+        assert executor.worker.done()
+    
+    @pytest.mark.asyncio
+    async def test_running_transition_cancelled_when_superseded(self):
+        """A new target cancels the running transition."""
+        executor = TransitionExecutor()
+        started = asyncio.Event()
+        cancelled = []
+        
+        async def slow_ap():
+            started.set()
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        
+        first = asyncio.ensure_future(executor.submit(SystemState.AP_MODE, slow_ap))
+        await started.wait()
+        second = await executor.submit(SystemState.CLIENT, AsyncMock())
+        
+        assert await first is False
+        assert second is True
+        assert cancelled == [True]
+    
+    @pytest.mark.asyncio
+    async def test_worker_cancelled_during_step_stops(self):
+        """Cancelling the worker mid-step ends it instead of running the queue."""
+        executor = TransitionExecutor()
+        started = asyncio.Event()
+        queued_action = AsyncMock()
+        
+        async def slow_ap():
+            started.set()
+            await executor.run_step('activate_ap', hang())
+        
+        first = asyncio.ensure_future(executor.submit(SystemState.AP_MODE, slow_ap))
+        await started.wait()
+        executor.pending.append(TransitionRequest(
+            SystemState.CLIENT, queued_action, asyncio.get_running_loop().create_future()
+        ))
+        executor.queue.put_nowait(executor.pending[-1])
+        queued = executor.pending[-1].future
+        executor.worker.cancel()
+        
+        with pytest.raises(asyncio.CancelledError):
+            await executor.worker
+        assert await first is False
+        assert await queued is False
+        queued_action.assert_not_called()
+        assert executor.running is None
+        assert executor.counters['transitions_superseded'] == 0
+    
+    @pytest.mark.asyncio
+    async def test_failure_reaches_requester(self):
+        """Transition errors propagate to the caller."""
+        executor = TransitionExecutor()
+        
+        with pytest.raises(StateTransitionError):
+            await executor.submit(SystemState.AP_MODE,
+                                  AsyncMock(side_effect=StateTransitionError("down")))
+    
+    @pytest.mark.asyncio
+    async def test_step_timeout(self):
+        """A hung component step fails the transition and is counted."""
+        ap_manager = Mock()
+        ap_manager.activate_ap = AsyncMock(side_effect=hang)
+        sm = StateMonitor(Mock(), ap_manager, AsyncMock(), step_timeout=0.05)
+        
+        with pytest.raises(StateTransitionError):
+            await sm.execute_transition(SystemState.AP_MODE, sm.transition_to_ap_mode)
+        
+        assert sm.current_state == SystemState.CHECKING
+        metrics = sm.metrics()
+        assert metrics['transition_step_timeouts'] == 1
+        assert metrics['transition_steps']['activate_ap'] >= 0.05
+    
+    @pytest.mark.asyncio
+    async def test_forced_ap_and_loop_client_serialized(self):
+        """Superseded AP entry is torn down by the CLIENT transition that replaced it."""
+        ap_manager = Mock()
+        ap_manager.activate_ap = AsyncMock(side_effect=hang)
+        ap_manager.deactivate_ap = AsyncMock()
+        web_server = AsyncMock()
+        sm = StateMonitor(Mock(), ap_manager, web_server)
+        
+        forced = asyncio.ensure_future(sm.force_ap_mode())
+        await asyncio.sleep(0.01)
+        applied = await sm.execute_transition(SystemState.CLIENT, sm.transition_to_client)
+        
+        await forced
+        assert applied is True
+        assert sm.current_state == SystemState.CLIENT
+        ap_manager.deactivate_ap.assert_awaited_once()
+        assert not sm.ap_partial
+    
+    @pytest.mark.asyncio
+    async def test_shutdown_cancels_running_transition(self):
+        """Shutdown stops an in-flight transition and tears down partial AP."""
+        ap_manager = Mock()
+        ap_manager.activate_ap = AsyncMock(side_effect=hang)
+        ap_manager.deactivate_ap = AsyncMock()
+        sm = StateMonitor(Mock(), ap_manager, AsyncMock())
+        sm.shutdown_event = asyncio.Event()
+        
+        pending = asyncio.ensure_future(
+            sm.execute_transition(SystemState.AP_MODE, sm.transition_to_ap_mode)
+        )
+        await asyncio.sleep(0.01)
+        await sm.shutdown()
+        
+        assert await pending is False
+        ap_manager.deactivate_ap.assert_awaited_once()
+
+
+class TestStatusSnapshot:
+    """Test the published status snapshot read by other threads."""
+    
+    def test_snapshot_is_immutable(self):
+        """Snapshots cannot be modified after publication."""
+        sm = StateMonitor(Mock(), Mock(), Mock())
+        
+        with pytest.raises(AttributeError):
+            sm.snapshot.state = 'CLIENT'
+        assert isinstance(sm.snapshot.history, tuple)
+        with pytest.raises(TypeError):
+            sm.snapshot.transition_stats['flaps'] = 5
+        with pytest.raises(TypeError):
+            sm.snapshot.transition_stats['time_in_state']['CLIENT'] = 1.0
+    
+    def test_snapshot_stats_serialize_as_json(self):
+        """Read-only stats still round-trip through to_dict() and json."""
+        sm = StateMonitor(Mock(), Mock(), Mock(), clock=lambda: 1000.0)
+        
+        status = json.loads(json.dumps(sm.publish_status().to_dict()))
+        
+        assert status['transition_stats']['time_in_state']['CHECKING'] >= 0
+        assert status['transition_stats']['flaps'] == 0
+    
+    def test_status_reads_published_snapshot_only(self):
+        """Internal changes appear in status() once published."""
+        sm = StateMonitor(Mock(), Mock(), Mock())
+        before = sm.snapshot
+        
+        sm.failure_count = 2
+        assert sm.status()['failure_count'] == 0
+        
+        published = sm.publish_status()
+        assert sm.snapshot is published is not before
+        assert sm.status()['failure_count'] == 2
+        assert before.failure_count == 0
+    
+    def test_transition_publishes_with_ssid(self):
+        """Entering CLIENT publishes the configured SSID; leaving clears it."""
+        sm = StateMonitor(Mock(), Mock(), Mock(), ssid_provider=lambda: 'Home')
+        sm.last_probe = {'connected': True, 'latency': 0.25}
+        
+        sm.set_state(SystemState.CLIENT)
+        client = sm.status()
+        sm.set_state(SystemState.AP_MODE)
+        
+        assert client['ssid'] == 'Home'
+        assert client['last_probe_rtt'] == 0.25
+        assert client['history'][-1]['to'] == 'CLIENT'
+        assert sm.status()['ssid'] is None
+        assert sm.status()['ap_active'] is True
+    
+    def test_failing_ssid_provider_reports_none(self):
+        """SSID read errors are logged, not raised."""
+        sm = StateMonitor(Mock(), Mock(), Mock(),
+                          ssid_provider=Mock(side_effect=OSError('denied')))
+        
+        sm.set_state(SystemState.CLIENT)
+        
+        assert sm.status()['ssid'] is None
+    
+    @pytest.mark.asyncio
+    async def test_threads_read_consistent_snapshots(self):
+        """Readers in other threads always see a self-consistent snapshot."""
+        sm = StateMonitor(Mock(), Mock(), Mock())
+        loop = asyncio.get_running_loop()
+        stop = [False]
+        
+        def reader():
+            bad = 0
+            reads = 0
+            while not stop[0] or reads == 0:
+                status = sm.status()
+                reads += 1
+                if status['ap_active'] != (status['state'] == 'AP_MODE'):
+                    bad += 1
+                if status['history'] and status['history'][-1]['to'] != status['state']:
+                    bad += 1
+            return bad
+        
+        readers = [loop.run_in_executor(None, reader) for _ in range(3)]
+        for _ in range(200):
+            sm.set_state(SystemState.AP_MODE)
+            sm.set_state(SystemState.CLIENT)
+            await asyncio.sleep(0)
+        stop[0] = True
+        
+        assert await asyncio.gather(*readers) == [0, 0, 0]
+    
+    @pytest.mark.asyncio
+    async def test_loop_publishes_after_each_check(self):
+        """Every completed check refreshes the snapshot."""
+        mock_conn = Mock()
+        mock_conn.test_connection = AsyncMock(return_value=False)
+        sm = StateMonitor(mock_conn, Mock(), Mock())
+        sm.shutdown_event = asyncio.Event()
+        
+        with patch.object(sm, 'wait_for_next_check', side_effect=[False, True]):
+            await sm.monitoring_loop()
+        
+        assert sm.status()['failure_count'] == 2
+        assert sm.status()['last_check'] is not None
+        assert sm.status()['last_probe_rtt'] is not None
+
+
+class TestBootFastPath:
+    """Test startup fast path and time-to-stable measurement."""
+    
+    @pytest.mark.asyncio
+    async def test_fast_path_client(self):
+        """CLIENT decision skips CHECKING without activating anything."""
+        boot_probe = Mock()
+        boot_probe.initial_state.return_value = 'CLIENT'
+        ap_manager = AsyncMock()
+        sm = StateMonitor(Mock(), ap_manager, AsyncMock(), boot_probe=boot_probe)
+        
+        assert await sm.apply_boot_fast_path()
+        
+        assert sm.current_state == SystemState.CLIENT
+        assert sm.startup_path == 'fast path'
+        ap_manager.activate_ap.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_fast_path_ap_mode(self):
+        """AP_MODE decision activates the AP immediately."""
+        boot_probe = Mock()
+        boot_probe.initial_state.return_value = 'AP_MODE'
+        ap_manager, web_server = AsyncMock(), AsyncMock()
+        sm = StateMonitor(Mock(), ap_manager, web_server, boot_probe=boot_probe)
+        
+        assert await sm.apply_boot_fast_path()
+        
+        assert sm.current_state == SystemState.AP_MODE
+        ap_manager.activate_ap.assert_awaited_once()
+        web_server.start_server.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('decision', [None, 'bogus'])
+    async def test_undecided_stays_checking(self, decision):
+        """No decision leaves the regular checks in charge."""
+        boot_probe = Mock()
+        boot_probe.initial_state.return_value = decision
+        sm = StateMonitor(Mock(), Mock(), Mock(), boot_probe=boot_probe)
+        
+        assert not await sm.apply_boot_fast_path()
+        assert sm.current_state == SystemState.CHECKING
+    
+    @pytest.mark.asyncio
+    async def test_probe_error_is_not_fatal(self):
+        """A failing probe falls back to CHECKING."""
+        boot_probe = Mock()
+        boot_probe.initial_state.side_effect = OSError("sysfs unavailable")
+        sm = StateMonitor(Mock(), Mock(), Mock(), boot_probe=boot_probe)
+        
+        assert not await sm.apply_boot_fast_path()
+    
+    @pytest.mark.asyncio
+    async def test_checkpoint_takes_precedence(self, tmp_path):
+        """initialize() only consults the fast path without a fresh checkpoint."""
+        checkpoint = StateCheckpoint(str(tmp_path / 'state.json'))
+        checkpoint.save({'state': 'CLIENT', 'failure_count': 0})
+        boot_probe = Mock()
+        sm = StateMonitor(Mock(), Mock(), Mock(), checkpoint=checkpoint, boot_probe=boot_probe)
+        
+        with patch.object(sm, 'monitoring_loop', return_value=asyncio.sleep(0)):
+            await sm.initialize()
+        
+        boot_probe.initial_state.assert_not_called()
+        assert sm.startup_path == 'checkpoint'
+    
+    def test_time_to_stable_measured_once(self):
+        """First CLIENT/AP_MODE records time since process start."""
+        sm = StateMonitor(Mock(), Mock(), Mock(), started_at=time.monotonic() - 2.0)
+        
+        sm.set_state(SystemState.CLIENT)
+        first = sm.time_to_stable
+        sm.set_state(SystemState.AP_MODE)
+        
+        assert 2.0 <= first < 3.0
+        assert sm.time_to_stable == first
+        assert sm.status()['time_to_stable'] == first
+
+
+class TestStationProbing:
+    """Test AP+STA probing for known networks while in AP_MODE."""
+    
+    def make_monitor(self, probe, upstream):
+        mock_conn = Mock()
+        mock_conn.test_connection = AsyncMock(return_value=upstream)
+        mock_ap = Mock()
+        mock_ap.deactivate_ap = AsyncMock()
+        mock_web = Mock()
+        mock_web.stop_server = AsyncMock()
+        sm = StateMonitor(mock_conn, mock_ap, mock_web, station_probe=probe)
+        sm.current_state = SystemState.AP_MODE
+        return sm
+    
+    @pytest.mark.asyncio
+    async def test_probe_upstream_transitions_when_confirmed(self):
+        """Known network with working upstream moves to CLIENT."""
+        probe = FakeStationProbe(visible="Home")
+        sm = self.make_monitor(probe, upstream=True)
+        
+        assert await sm.probe_upstream() is True
+        
+        assert sm.current_state == SystemState.CLIENT
+        sm.ap_manager.deactivate_ap.assert_called_once()
+        assert probe.released == 1
+    
+    @pytest.mark.asyncio
+    async def test_probe_upstream_hands_over_before_release(self):
+        """AP goes down, the link moves to the primary interface, then the probe is released."""
+        events = []
+        probe = FakeStationProbe(visible="Home", events=events)
+        sm = self.make_monitor(probe, upstream=True)
+        sm.ap_manager.deactivate_ap = AsyncMock(
+            side_effect=lambda: events.append(('deactivate_ap',)))
+        
+        assert await sm.probe_upstream() is True
+        
+        assert events == [('deactivate_ap',), ('activate_primary', 'Home'), ('release',)]
+    
+    @pytest.mark.asyncio
+    async def test_probe_upstream_keeps_portal_until_confirmed(self):
+        """Portal stays up when the upstream check fails."""
+        probe = FakeStationProbe(visible="Home")
+        sm = self.make_monitor(probe, upstream=False)
+        
+        assert await sm.probe_upstream() is False
+        
+        assert sm.current_state == SystemState.AP_MODE
+        sm.ap_manager.deactivate_ap.assert_not_called()
+        sm.web_server.stop_server.assert_not_called()
+        assert probe.released == 1
+    
+    @pytest.mark.asyncio
+    async def test_probe_upstream_noop_without_known_network(self):
+        """No visible known SSID leaves state untouched."""
+        probe = FakeStationProbe(visible=None)
+        sm = self.make_monitor(probe, upstream=True)
+        
+        assert await sm.probe_upstream() is False
+        assert sm.current_state == SystemState.AP_MODE
+    
+    @pytest.mark.asyncio
+    async def test_monitoring_loop_probes_in_ap_mode(self):
+        """Failed checks in AP_MODE trigger a station probe."""
+        sm = self.make_monitor(FakeStationProbe(), upstream=False)
+        sm.shutdown_event = asyncio.Event()
+        sm.failure_count = 3
+        
+        with patch.object(sm, 'probe_upstream', new_callable=AsyncMock) as mock_probe:
+            async def run_once():
+                await asyncio.sleep(0.1)
+                sm.shutdown_event.set()
+            
+            await asyncio.gather(sm.monitoring_loop(), run_once())
+            
+            mock_probe.assert_called_once()
+
+
+class TestCaptivePortalDNS:
+    """Test DNS responder lifecycle alongside the web server."""
+    
+    def make_monitor(self, dns):
+        mock_ap = Mock()
+        mock_ap.activate_ap = AsyncMock()
+        mock_ap.deactivate_ap = AsyncMock()
+        mock_web = Mock()
+        mock_web.start_server = AsyncMock()
+        mock_web.stop_server = AsyncMock()
+        return StateMonitor(Mock(), mock_ap, mock_web, dns_responder=dns)
+    
+    @pytest.mark.asyncio
+    async def test_ap_mode_starts_dns_and_client_stops_it(self):
+        """DNS responder follows AP_MODE."""
+        dns = Mock(start=AsyncMock(), stop=AsyncMock())
+        sm = self.make_monitor(dns)
+        
+        await sm.transition_to_ap_mode()
+        dns.start.assert_called_once()
+        
+        await sm.transition_to_client()
+        dns.stop.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_dns_start_failure_keeps_ap_mode(self):
+        """Port 53 conflicts do not fail the AP transition."""
+        dns = Mock(start=AsyncMock(side_effect=OSError("in use")), stop=AsyncMock())
+        sm = self.make_monitor(dns)
+        
+        await sm.transition_to_ap_mode()
+        
+        assert sm.current_state == SystemState.AP_MODE
+
+
 class TestShutdown:
     """Test shutdown coordination."""
     
@@ -9,7 +9,12 @@ Coverage Target: 80%
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 import json
+import statistics
 import threading
+import time
+import http.client
+import io
+import socket
 from http.server import BaseHTTPRequestHandler
 
 import sys
@@ -25,8 +30,50 @@ from webserver import (
     is_running,
     WebServerError,
     PortInUseError,
-    ConfigurationError
+    ConfigurationError,
+    ScanQuery,
+    parse_scan_query,
+    select_networks,
+    encode_scan_cursor,
+    decode_scan_cursor,
+    PROBE_PATHS,
+    PROBE_RESPONSES,
+    PORTAL_URL,
+    TokenBucket,
+    RateLimiter,
+    ServerMetrics,
+    listen_fds,
+    adopt_listen_socket
 )
+from connectionmanager import BSSIDEntry, ScanResult
+
+
+def make_handler(path):
+    """Build a ConfigHTTPHandler without a live socket."""
+    handler = ConfigHTTPHandler.__new__(ConfigHTTPHandler)
+    handler.path = path
+    handler.headers = {}
+    handler.client_address = ('127.0.0.1', 40000)
+    handler.server = None
+    handler.connection = None
+    handler.send_response = Mock()
+    handler.send_header = Mock()
+    handler.end_headers = Mock()
+    handler.wfile = Mock()
+    return handler
+
+
+def make_scan(count=40):
+    """Synthetic scan with one 2.4 GHz and one 5 GHz BSSID per SSID."""
+    entries = []
+    for i in range(count):
+        security = ["", "WPA2", "WPA2 802.1X", "WEP"][i % 4]
+        entries.append(BSSIDEntry(f"Net{i:02d}", f"00:00:00:00:00:{i:02X}", i % 90 + 5,
+                                  security, 2437, 6, 130))
+        if i % 3 == 0:
+            entries.append(BSSIDEntry(f"Net{i:02d}", f"00:00:00:00:01:{i:02X}", i % 90,
+                                      security, 5180, 36, 540))
+    return ScanResult(entries, timestamp=1000.0)
 
 
 class TestConfigHTTPHandler:
@@ -196,6 +243,485 @@ class TestConfigHTTPHandler:
         assert any('Access-Control-Allow-Origin' in str(call) for call in header_calls)
 
 
+class TestScanQuery:
+    """Test /api/scan filtering, ordering and pagination."""
+    
+    def test_parse_scan_query_defaults(self):
+        """Empty query string yields default limit and no filters."""
+        query = parse_scan_query('')
+        
+        assert query == ScanQuery()
+    
+    def test_parse_scan_query_reads_all_parameters(self):
+        """All supported parameters are parsed."""
+        query = parse_scan_query('min_signal=40&security=WPA&band=5&q=Net1&limit=5&offset=2')
+        
+        assert query.min_signal == 40
+        assert query.security == 'wpa'
+        assert query.band == '5GHz'
+        assert query.prefix == 'net1'
+        assert (query.limit, query.offset) == (5, 2)
+    
+    @pytest.mark.parametrize('qs', ['limit=0', 'limit=abc', 'min_signal=101',
+                                    'security=wpa9', 'band=60', 'cursor=%%%'])
+    def test_parse_scan_query_rejects_invalid(self, qs):
+        """Malformed parameters raise ValueError."""
+        with pytest.raises(ValueError):
+            parse_scan_query(qs)
+    
+    def test_cursor_round_trip(self):
+        """Cursor encodes and decodes the sort key."""
+        assert decode_scan_cursor(encode_scan_cursor((42, 'Caf\u00e9 WiFi'))) == (42, 'Caf\u00e9 WiFi')
+    
+    def test_select_networks_filters(self):
+        """Signal, security, band and prefix filters combine."""
+        scan = make_scan()
+        query = ScanQuery(min_signal=10, security='wpa', band='5GHz', prefix='net')
+        
+        page = select_networks(scan.summaries.values(), query)
+        
+        assert page['total'] > 0
+        for net in page['networks']:
+            assert net['signal'] >= 10
+            assert net['security_class'] == 'wpa'
+            assert '5GHz' in net['bands']
+    
+    def test_select_networks_returns_top_k_in_order(self):
+        """Limit returns the strongest networks sorted by signal."""
+        scan = make_scan()
+        expected = sorted(scan.summaries.values(), key=lambda s: (-s.signal_strength, s.ssid))[:5]
+        
+        page = select_networks(scan.summaries.values(), ScanQuery(limit=5))
+        
+        assert [n['ssid'] for n in page['networks']] == [s.ssid for s in expected]
+        assert page['total'] == 40
+        assert page['next_cursor'] is not None
+    
+    def test_select_networks_offset(self):
+        """Offset skips entries within the ordering."""
+        scan = make_scan()
+        full = select_networks(scan.summaries.values(), ScanQuery(limit=20))
+        
+        page = select_networks(scan.summaries.values(), ScanQuery(limit=5, offset=5))
+        
+        assert page['networks'] == full['networks'][5:10]
+    
+    def test_cursor_pages_cover_all_networks(self):
+        """Following next_cursor visits every network exactly once."""
+        scan = make_scan()
+        seen, cursor = [], None
+        while True:
+            page = select_networks(scan.summaries.values(),
+                                   ScanQuery(limit=7, cursor=cursor and decode_scan_cursor(cursor)))
+            seen.extend(n['ssid'] for n in page['networks'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        
+        assert sorted(seen) == sorted(scan.summaries)
+    
+    @pytest.mark.parametrize('filters', [{}, {'band': '5GHz'}])
+    def test_total_is_constant_across_pages(self, filters):
+        """total counts every filter match, whichever page the cursor selects."""
+        scan = make_scan()
+        expected = select_networks(scan.summaries.values(), ScanQuery(limit=100, **filters))
+        totals, seen, cursor = [], 0, None
+        while True:
+            page = select_networks(scan.summaries.values(),
+                                   ScanQuery(limit=7, cursor=cursor and decode_scan_cursor(cursor),
+                                             **filters))
+            totals.append(page['total'])
+            seen += len(page['networks'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        
+        assert len(totals) > 1
+        assert set(totals) == {expected['total']}
+        assert seen == expected['total']
+    
+    def test_cursor_stays_valid_after_refresh(self):
+        """Cursor from an old scan continues after the cache refreshes."""
+        old = make_scan()
+        first = select_networks(old.summaries.values(), ScanQuery(limit=3))
+        last_seen = first['networks'][-1]
+        refreshed = make_scan(count=50)
+        
+        page = select_networks(refreshed.summaries.values(),
+                               ScanQuery(limit=3, cursor=decode_scan_cursor(first['next_cursor'])))
+        
+        for net in page['networks']:
+            assert (-net['signal'], net['ssid']) > (-last_seen['signal'], last_seen['ssid'])
+    
+    def test_handle_scan_request_uses_cache_and_query(self):
+        """GET /api/scan?... serves a filtered page from the scan cache."""
+        handler = make_handler('/api/scan?limit=2&band=5')
+        
+        with patch('connectionmanager.ScanCache.get', return_value=make_scan()):
+            handler.do_GET()
+        
+        handler.send_response.assert_called_with(200)
+        response = json.loads(handler.wfile.write.call_args[0][0].decode('utf-8'))
+        assert len(response['networks']) == 2
+        assert response['scanned_at'] == 1000.0
+    
+    def test_handle_scan_request_rejects_bad_query(self):
+        """Invalid query parameters return 400."""
+        handler = make_handler('/api/scan?limit=-1')
+        
+        handler.do_GET()
+        
+        handler.send_response.assert_called_with(400)
+
+
+class TestCaptivePortalProbes:
+    """Test OS connectivity-check probe handling."""
+    
+    @pytest.mark.parametrize('path', ['/generate_204', '/hotspot-detect.html', '/connecttest.txt'])
+    def test_probe_paths_redirect_to_portal(self, path):
+        """Android, iOS and Windows probes get the prebuilt redirect."""
+        handler = make_handler(path)
+        
+        handler.do_GET()
+        
+        response = handler.wfile.write.call_args[0][0]
+        assert response.startswith(b'HTTP/1.0 302 Found\r\n')
+        assert f'Location: {PORTAL_URL}'.encode() in response
+        handler.send_response.assert_not_called()
+    
+    def test_probe_responses_are_shared_objects(self):
+        """All probes reuse one prebuilt bytes object (no per-request build)."""
+        assert len({id(PROBE_RESPONSES[p]) for p in PROBE_PATHS}) == 1
+    
+    def test_probe_with_query_string(self):
+        """Query strings do not defeat the probe table."""
+        handler = make_handler('/generate_204?x=1')
+        
+        handler.do_GET()
+        
+        assert handler.wfile.write.call_args[0][0] is PROBE_RESPONSES['/generate_204']
+    
+    def test_routes_dispatch_by_dict(self):
+        """GET/POST routes are dict lookups onto handler methods."""
+        assert ConfigHTTPHandler.GET_ROUTES['/'] is ConfigHTTPHandler.serve_html_page
+        assert ConfigHTTPHandler.POST_ROUTES['/api/configure'] is ConfigHTTPHandler.handle_configure_request
+    
+    def test_unknown_path_still_404(self):
+        """Paths outside both tables return 404."""
+        handler = make_handler('/nope')
+        
+        handler.do_GET()
+        
+        handler.send_response.assert_called_with(404)
+
+
+def timed_get(port, path):
+    """Return seconds taken for one GET."""
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    conn.request('GET', path)
+    conn.getresponse().read()
+    conn.close()
+    return time.perf_counter() - start
+
+
+class TestProbeStormBenchmark:
+    """Benchmark: probe storms must not slow the real UI."""
+    
+    def test_ui_latency_under_probe_storm(self):
+        """Median GET / latency stays close to idle while 32 clients probe."""
+        server = ThreadedHTTPServer(('127.0.0.1', 0), ConfigHTTPHandler)
+        port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        stop = threading.Event()
+        probes = [0]
+        
+        def storm(path):
+            while not stop.is_set():
+                try:
+                    timed_get(port, path)
+                    probes[0] += 1
+                except OSError:
+                    pass
+        
+        workers = [threading.Thread(target=storm, args=(PROBE_PATHS[i % 3 * 2],), daemon=True)
+                   for i in range(32)]
+        try:
+            idle = statistics.median(timed_get(port, '/') for _ in range(30))
+            for w in workers:
+                w.start()
+            time.sleep(0.2)
+            loaded = statistics.median(timed_get(port, '/') for _ in range(30))
+        finally:
+            stop.set()
+            for w in workers:
+                w.join(timeout=5)
+            server.shutdown()
+            server.server_close()
+        
+        assert probes[0] > 0
+        assert loaded < max(idle * 20, 0.05), (
+            f"GET / median idle {idle * 1000:.2f} ms, under probe storm "
+            f"{loaded * 1000:.2f} ms ({probes[0]} probes served)"
+        )
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimiting:
+    """Test token buckets and admission control."""
+    
+    def test_token_bucket_burst_then_refill(self):
+        """Burst is allowed, then refill rate governs."""
+        bucket = TokenBucket(rate=1.0, capacity=2, now=0.0)
+        
+        assert bucket.take(0.0) == 0.0
+        assert bucket.take(0.0) == 0.0
+        assert bucket.take(0.0) == pytest.approx(1.0)
+        assert bucket.take(1.0) == 0.0
+    
+    def test_rate_limiter_stricter_for_scan(self):
+        """Scan endpoint runs out before the default class."""
+        clock = FakeClock()
+        limiter = RateLimiter(clock=clock)
+        
+        scan = [limiter.check('10.0.0.2', '/api/scan') for _ in range(6)]
+        other = [limiter.check('10.0.0.2', '/') for _ in range(6)]
+        
+        assert scan[:5] == [0] * 5 and scan[5] >= 1
+        assert other == [0] * 6
+    
+    def test_rate_limiter_isolates_clients(self):
+        """One client's exhaustion does not affect another."""
+        limiter = RateLimiter(clock=FakeClock())
+        for _ in range(3):
+            limiter.check('10.0.0.2', '/api/configure')
+        
+        assert limiter.check('10.0.0.2', '/api/configure') > 0
+        assert limiter.check('10.0.0.3', '/api/configure') == 0
+    
+    def test_rate_limiter_retry_after_reflects_refill(self):
+        """Retry-After is the time until the next token."""
+        limiter = RateLimiter(limits={'default': (0.25, 1)}, clock=FakeClock())
+        limiter.check('10.0.0.2', '/')
+        
+        assert limiter.check('10.0.0.2', '/') == 4
+    
+    def test_rate_limiter_lru_bounds_memory(self):
+        """Least recently seen clients are evicted at max_clients."""
+        limiter = RateLimiter(max_clients=3, clock=FakeClock())
+        for ip in ('a', 'b', 'c'):
+            limiter.check(ip, '/')
+        limiter.check('a', '/')
+        limiter.check('d', '/')
+        
+        assert len(limiter) == 3
+        assert ('b', 'default') not in limiter._buckets
+        assert ('a', 'default') in limiter._buckets
+    
+    def test_handler_sends_429_with_retry_after(self):
+        """Rate-limited requests get 429 and Retry-After."""
+        handler = make_handler('/api/scan')
+        handler.server = Mock()
+        handler.server.rate_limiter.check = Mock(return_value=3)
+        handler.server.metrics = ServerMetrics()
+        
+        handler.do_GET()
+        
+        handler.send_response.assert_called_with(429)
+        handler.send_header.assert_any_call('Retry-After', '3')
+        assert handler.server.metrics.get('rejected_rate_limited') == 1
+    
+    def test_server_rejects_over_connection_cap_with_503(self):
+        """Connections beyond max_connections get 503 without a thread."""
+        server = ThreadedHTTPServer(('127.0.0.1', 0), ConfigHTTPHandler)
+        server._connection_slots = threading.BoundedSemaphore(1)
+        port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            idle = socket.create_connection(('127.0.0.1', port))
+            time.sleep(0.1)
+            second = socket.create_connection(('127.0.0.1', port))
+            second.settimeout(2)
+            response = second.recv(1024)
+            
+            assert response.startswith(b'HTTP/1.0 503')
+            assert b'Retry-After: 1' in response
+            assert server.metrics.get('rejected_overloaded') == 1
+            idle.close()
+            second.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+    
+    def test_idle_connection_times_out_and_frees_slot(self):
+        """Idle connections are closed after the handler timeout."""
+        class QuickTimeoutHandler(ConfigHTTPHandler):
+            timeout = 0.2
+        
+        server = ThreadedHTTPServer(('127.0.0.1', 0), QuickTimeoutHandler)
+        server._connection_slots = threading.BoundedSemaphore(1)
+        port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            idle = socket.create_connection(('127.0.0.1', port))
+            idle.settimeout(2)
+            assert idle.recv(1024) == b''
+            idle.close()
+            time.sleep(0.1)
+            
+            assert timed_get(port, '/') < 2
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestBodyLimits:
+    """Test bounded, deadline-limited request body reads."""
+    
+    def make_post(self, body, content_length=None):
+        handler = make_handler('/api/configure')
+        handler.headers = {'Content-Length': str(len(body) if content_length is None else content_length)}
+        handler.rfile = io.BytesIO(body)
+        handler.server = Mock()
+        handler.server.rate_limiter = None
+        handler.server.metrics = ServerMetrics()
+        return handler
+    
+    def test_oversized_body_rejected_with_413_before_reading(self):
+        """Content-Length above the limit is refused without reading."""
+        handler = self.make_post(b'', content_length=10 ** 9)
+        handler.rfile = Mock()
+        
+        handler.do_POST()
+        
+        handler.send_response.assert_called_with(413)
+        handler.rfile.read1.assert_not_called()
+        assert handler.server.metrics.get('rejected_body_too_large') == 1
+    
+    def test_invalid_content_length_rejected(self):
+        """Non-numeric Content-Length returns 400."""
+        handler = self.make_post(b'{}', content_length='abc')
+        
+        handler.do_POST()
+        
+        handler.send_response.assert_called_with(400)
+    
+    def test_body_read_in_chunks(self):
+        """Body larger than one chunk is assembled from several reads."""
+        body = json.dumps({'ssid': 'S' * 10, 'password': 'p' * 1500}).encode()
+        handler = self.make_post(body)
+        handler.rfile = Mock(wraps=io.BytesIO(body))
+        
+        assert handler.read_body() == body
+        assert handler.rfile.read1.call_count >= 2
+    
+    def test_truncated_body_rejected(self):
+        """Client closing early yields 400."""
+        handler = self.make_post(b'{"ssid"', content_length=100)
+        
+        handler.do_POST()
+        
+        handler.send_response.assert_called_with(400)
+    
+    def test_slow_body_rejected_with_408(self):
+        """Socket timeout while reading returns 408 and restores timeout."""
+        handler = self.make_post(b'', content_length=50)
+        handler.rfile = Mock()
+        handler.rfile.read1 = Mock(side_effect=socket.timeout())
+        handler.connection = Mock()
+        
+        handler.do_POST()
+        
+        handler.send_response.assert_called_with(408)
+        assert handler.server.metrics.get('rejected_body_timeout') == 1
+        handler.connection.settimeout.assert_called_with(ConfigHTTPHandler.timeout)
+    
+    def test_slow_loris_upload_hits_deadline(self):
+        """Trickled body on a live server is cut off at the deadline."""
+        server = ThreadedHTTPServer(('127.0.0.1', 0), ConfigHTTPHandler)
+        port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            with patch('webserver.BODY_DEADLINE_SECONDS', 0.3):
+                client = socket.create_connection(('127.0.0.1', port))
+                client.sendall(b'POST /api/configure HTTP/1.1\r\nHost: x\r\n'
+                               b'Content-Length: 100\r\n\r\n{"ssid":')
+                client.settimeout(3)
+                start = time.perf_counter()
+                response = client.recv(1024)
+                elapsed = time.perf_counter() - start
+                client.close()
+            
+            assert response.startswith(b'HTTP/1.0 408')
+            assert elapsed < 2
+            assert server.metrics.get('rejected_body_timeout') == 1
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestWiredProviders:
+    """Test handlers use providers wired onto the server."""
+    
+    def make_wired(self, path, body=b''):
+        handler = make_handler(path)
+        handler.headers = {'Content-Length': str(len(body))}
+        handler.rfile = io.BytesIO(body)
+        handler.server = Mock()
+        handler.server.rate_limiter = None
+        handler.server.metrics = ServerMetrics()
+        return handler
+    
+    def test_status_uses_status_provider(self):
+        """GET /api/status returns the provider's payload."""
+        handler = self.make_wired('/api/status')
+        handler.server.status_provider = Mock(return_value={'state': 'AP_MODE', 'ap_active': True})
+        
+        handler.do_GET()
+        
+        handler.send_response.assert_called_with(200)
+        assert json.loads(handler.wfile.write.call_args[0][0]) == {'state': 'AP_MODE', 'ap_active': True}
+    
+    def test_status_unavailable_without_provider(self):
+        """GET /api/status is 503 when nothing is wired."""
+        handler = self.make_wired('/api/status')
+        handler.server.status_provider = None
+        
+        handler.do_GET()
+        
+        handler.send_response.assert_called_with(503)
+    
+    def test_configure_uses_network_configurator(self):
+        """POST /api/configure hands credentials to the wired configurator."""
+        body = json.dumps({'ssid': 'Home', 'password': 'password123'}).encode()
+        handler = self.make_wired('/api/configure', body)
+        handler.server.network_configurator = Mock()
+        
+        handler.do_POST()
+        
+        handler.server.network_configurator.assert_called_once_with('Home', 'password123')
+    
+    def test_manager_wires_providers_onto_server(self):
+        """WebServerManager copies providers onto the server it binds."""
+        provider = Mock()
+        manager = WebServerManager(0, status_provider=provider)
+        try:
+            manager.open()
+            assert manager.server.status_provider is provider
+            assert manager.server.network_configurator is None
+        finally:
+            manager.close()
+
+
 class TestWebServerManager:
     """Test WebServerManager lifecycle."""
     
@@ -255,26 +781,38 @@ class TestWebServerManager:
             with pytest.raises(PortInUseError):
                 manager.start_server()
     
-    def test_stop_server_shuts_down_gracefully(self):
-        """stop_server() shuts down and closes server."""
+    def test_stop_server_keeps_listening_socket(self):
+        """stop_server() pauses accepting without closing the socket."""
         manager = WebServerManager(port=8080)
-        manager.server = Mock()
+        server = manager.server = Mock()
         manager.server_thread = Mock()
         
         manager.stop_server()
         
-        manager.server.shutdown.assert_called_once()
-        manager.server.server_close.assert_called_once()
+        assert server.accepting is False
+        server.shutdown.assert_not_called()
+        server.server_close.assert_not_called()
     
-    def test_stop_server_joins_thread(self):
-        """stop_server() waits for thread to complete."""
+    def test_close_shuts_down_gracefully(self):
+        """close() shuts down and closes server."""
         manager = WebServerManager(port=8080)
-        manager.server = Mock()
+        server = manager.server = Mock()
         manager.server_thread = Mock()
         
-        manager.stop_server()
+        manager.close()
+        
+        server.shutdown.assert_called_once()
+        server.server_close.assert_called_once()
+    
+    def test_close_joins_thread(self):
+        """close() waits for thread to complete."""
+        manager = WebServerManager(port=8080)
+        manager.server = Mock()
+        thread = manager.server_thread = Mock()
+        
+        manager.close()
         
-        manager.server_thread.join.assert_called_once()
+        thread.join.assert_called_once()
     
     def test_stop_server_handles_no_server(self):
         """stop_server() handles case where server not running."""
@@ -299,6 +837,136 @@ class TestWebServerManager:
         assert manager.is_running() is False
 
 
+class TestListenerReuse:
+    """Test pre-bound listening socket across rapid AP-mode cycles."""
+    
+    def test_rapid_start_stop_cycles_reuse_socket(self):
+        """Hundreds of start/stop cycles keep one server and port."""
+        manager = WebServerManager(port=0)
+        manager.open()
+        try:
+            server = manager.server
+            port = server.server_address[1]
+            start = time.perf_counter()
+            for _ in range(500):
+                manager.start_server()
+                manager.stop_server()
+            per_cycle = (time.perf_counter() - start) / 500
+            
+            assert manager.server is server
+            assert manager.server.server_address[1] == port
+            assert manager.is_open()
+            assert per_cycle < 0.001, f"start/stop cycle: {per_cycle * 1e6:.1f} us"
+        finally:
+            manager.close()
+    
+    def test_connections_follow_accepting_flag(self):
+        """Stopped listener closes connections; started listener serves them."""
+        manager = WebServerManager(port=0)
+        manager.open()
+        try:
+            port = manager.server.server_address[1]
+            
+            with pytest.raises((ConnectionError, http.client.HTTPException)):
+                timed_get(port, '/')
+            
+            manager.start_server()
+            assert timed_get(port, '/') < 2
+            
+            manager.stop_server()
+            manager.start_server()
+            assert timed_get(port, '/') < 2
+            assert manager.server.metrics.get('rejected_not_accepting') == 1
+        finally:
+            manager.close()
+    
+    def test_start_server_opens_lazily(self):
+        """start_server() binds on first use when open() was not called."""
+        manager = WebServerManager(port=0)
+        try:
+            manager.start_server()
+            
+            assert manager.is_running()
+        finally:
+            manager.close()
+        
+        assert not manager.is_open()
+
+
+class TestSocketActivation:
+    """Test LISTEN_FDS adoption using local socket stand-ins."""
+    
+    def activation_env(self, count=1, names='pi-netconfig-http', pid=None):
+        return {
+            'LISTEN_PID': str(os.getpid() if pid is None else pid),
+            'LISTEN_FDS': str(count),
+            'LISTEN_FDNAMES': names,
+            'OTHER': 'kept',
+        }
+    
+    def test_listen_fds_reads_and_unsets_environment(self):
+        """Named descriptors are returned and LISTEN_* removed."""
+        a, b = socket.socketpair()
+        try:
+            environ = self.activation_env()
+            
+            fds = listen_fds(environ, start=a.fileno())
+            
+            assert fds == {'pi-netconfig-http': a.fileno()}
+            assert environ == {'OTHER': 'kept'}
+            assert os.get_inheritable(a.fileno()) is False
+        finally:
+            a.close()
+            b.close()
+    
+    def test_listen_fds_ignores_other_pid(self):
+        """Descriptors meant for another process are ignored."""
+        assert listen_fds(self.activation_env(pid=os.getpid() + 1), start=100) == {}
+    
+    def test_listen_fds_ignores_malformed(self):
+        """Garbage in LISTEN_FDS does not raise."""
+        environ = self.activation_env()
+        environ['LISTEN_FDS'] = 'x'
+        
+        assert listen_fds(environ, start=100) == {}
+    
+    def test_adopt_listen_socket_wraps_inherited_fd(self):
+        """Adopted socket talks over the inherited descriptor (socketpair stand-in)."""
+        a, b = socket.socketpair()
+        fd = os.dup(a.fileno())
+        a.close()
+        try:
+            sock = adopt_listen_socket(self.activation_env(names=''), start=fd)
+            
+            assert sock.fileno() == fd
+            sock.sendall(b'ping')
+            assert b.recv(4) == b'ping'
+            sock.close()
+        finally:
+            b.close()
+    
+    def test_adopt_without_activation_returns_none(self):
+        """No LISTEN_FDS means bind normally."""
+        assert adopt_listen_socket({}) is None
+    
+    def test_manager_serves_on_adopted_listener(self):
+        """WebServerManager uses the inherited listener instead of binding."""
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(16)
+        port = listener.getsockname()[1]
+        manager = WebServerManager(port=8080)
+        
+        with patch('webserver.adopt_listen_socket', return_value=listener):
+            manager.start_server()
+        try:
+            assert manager.server.socket is listener
+            assert manager.server.server_port == port
+            assert timed_get(port, '/') < 2
+        finally:
+            manager.close()
+
+
 class TestModuleFunctions:
     """Test module-level convenience functions."""
     
@@ -12,13 +12,24 @@ Traceability: workspace/trace/trace-0001-requirements-traceability-matrix.md
 Copyright (c) 2025 William Watson. Licensed under MIT License.
 """
 
+import base64
+import heapq
 import json
+import math
+import os
+import socket
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from socketserver import ThreadingMixIn
 import logging
 import threading
 import traceback
-from typing import Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from connectionmanager import ConfigManager, ScanCache, security_class
 
 # Configure module logger
 logger = logging.getLogger('WebServer')
@@ -39,42 +50,350 @@ class ConfigurationError(WebServerError):
     pass
 
 
-class ConfigHTTPHandler(BaseHTTPRequestHandler):
-    """Handle HTTP requests with embedded resources"""
+PORTAL_URL = 'http://192.168.50.1:8080/'
 
-    def log_message(self, format: str, *args) -> None:
-        """Override to use custom logger"""
-        logger.debug(f"{self.address_string()} - {format % args}")
+# Well-known OS connectivity-check paths. Any answer other than the expected
+# one (204 / "Success" / "Microsoft Connect Test") makes the OS show its
+# captive-portal sheet, so every probe is redirected to the portal page.
+PROBE_PATHS = (
+    '/generate_204',                # Android, ChromeOS
+    '/gen_204',                     # Android (older)
+    '/hotspot-detect.html',         # iOS, macOS
+    '/library/test/success.html',   # iOS (older)
+    '/connecttest.txt',             # Windows 10+
+    '/ncsi.txt',                    # Windows 7/8
+    '/redirect',                    # Windows captive redirect
+    '/canonical.html',              # Firefox
+    '/success.txt',                 # Firefox
+)
 
-    def do_GET(self) -> None:
-        """Route GET requests"""
-        try:
-            if self.path == '/':
-                self.serve_html_page()
-            elif self.path == '/api/scan':
-                self.handle_scan_request()
-            elif self.path == '/api/status':
-                self.handle_status_request()
-            else:
-                self.send_error_response(404, "Not Found")
-        except Exception as e:
-            logger.error(f"GET request error: {e}\n{traceback.format_exc()}")
-            self.send_error_response(500, "Internal Server Error")
 
-    def do_POST(self) -> None:
-        """Route POST requests"""
-        try:
-            if self.path == '/api/configure':
-                self.handle_configure_request()
+def build_redirect_response(location: str) -> bytes:
+    """Build a complete 302 response (status line, headers, empty body)"""
+    return (
+        'HTTP/1.0 302 Found\r\n'
+        f'Location: {location}\r\n'
+        'Content-Length: 0\r\n'
+        'Cache-Control: no-cache, no-store, must-revalidate\r\n'
+        'Connection: close\r\n'
+        '\r\n'
+    ).encode('ascii')
+
+
+def build_probe_responses(portal_url: str) -> Dict[str, bytes]:
+    """Map every probe path to one shared prebuilt redirect"""
+    redirect = build_redirect_response(portal_url)
+    return {path: redirect for path in PROBE_PATHS}
+
+
+PROBE_RESPONSES = build_probe_responses(PORTAL_URL)
+
+# Admission control
+MAX_CONNECTIONS = 32
+IDLE_TIMEOUT_SECONDS = 10.0
+MAX_TRACKED_CLIENTS = 256
+MAX_BODY_BYTES = 4096
+BODY_DEADLINE_SECONDS = 5.0
+BODY_CHUNK_BYTES = 1024
+# Token bucket (refill per second, burst) per route class
+RATE_LIMITS = {
+    'default': (10.0, 20),
+    '/api/scan': (0.5, 5),
+    '/api/configure': (0.2, 3),
+}
+OVERLOADED_RESPONSE = (
+    'HTTP/1.0 503 Service Unavailable\r\n'
+    'Retry-After: 1\r\n'
+    'Content-Length: 0\r\n'
+    'Connection: close\r\n'
+    '\r\n'
+).encode('ascii')
+
+
+class ServerMetrics:
+    """Thread-safe named counters for the web server"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """Add amount to counter name"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def get(self, name: str) -> int:
+        """Return current value of counter name"""
+        return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return a copy of all counters"""
+        with self._lock:
+            return dict(self._counters)
+
+
+class TokenBucket:
+    """Token bucket refilled lazily on each take()"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: int, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Consume one token; return 0 if allowed, else seconds until one is available"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Per-client token buckets with LRU eviction to bound memory"""
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, int]]] = None,
+                 max_clients: int = MAX_TRACKED_CLIENTS, clock=time.monotonic):
+        self.limits = limits or RATE_LIMITS
+        self.max_clients = max_clients
+        self.clock = clock
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, client_ip: str, path: str) -> int:
+        """
+        Charge one request to the client's bucket for this route class
+        
+        Args:
+            client_ip: Client address
+            path: Request path (query string stripped)
+        
+        Returns:
+            int: 0 if admitted, otherwise Retry-After seconds
+        """
+        route = path if path in self.limits else 'default'
+        key = (client_ip, route)
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate, capacity = self.limits[route]
+                bucket = TokenBucket(rate, capacity, now)
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
             else:
-                self.send_error_response(404, "Not Found")
-        except Exception as e:
-            logger.error(f"POST request error: {e}\n{traceback.format_exc()}")
-            self.send_error_response(500, "Internal Server Error")
+                self._buckets.move_to_end(key)
+            wait = bucket.take(now)
+        return 0 if wait == 0.0 else max(1, math.ceil(wait))
 
-    def serve_html_page(self) -> None:
-        """Send embedded HTML page with CSS and JavaScript"""
-        html_content = """<!DOCTYPE html>
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# systemd socket activation (sd_listen_fds protocol)
+SD_LISTEN_FDS_START = 3
+LISTEN_FD_NAME = 'pi-netconfig-http'
+
+
+def listen_fds(environ=None, start: int = SD_LISTEN_FDS_START,
+               unset_environment: bool = True) -> Dict[str, int]:
+    """
+    Return file descriptors passed by systemd, keyed by FileDescriptorName
+    
+    Implements the LISTEN_PID/LISTEN_FDS/LISTEN_FDNAMES protocol. Variables
+    are removed after reading so child processes do not inherit them.
+    
+    Args:
+        environ: Environment mapping (default os.environ)
+        start: First passed descriptor (SD_LISTEN_FDS_START)
+        unset_environment: Remove LISTEN_* variables once consumed
+    
+    Returns:
+        dict: name -> fd (unnamed descriptors are keyed 'unknown')
+    """
+    environ = os.environ if environ is None else environ
+    try:
+        if int(environ.get('LISTEN_PID', '0')) != os.getpid():
+            return {}
+        count = int(environ.get('LISTEN_FDS', '0'))
+    except ValueError:
+        logger.warning("Ignoring malformed LISTEN_PID/LISTEN_FDS")
+        return {}
+    names = environ.get('LISTEN_FDNAMES', '').split(':')
+    if unset_environment:
+        for key in ('LISTEN_PID', 'LISTEN_FDS', 'LISTEN_FDNAMES'):
+            environ.pop(key, None)
+    fds = {}
+    for index in range(count):
+        fd = start + index
+        os.set_inheritable(fd, False)
+        name = names[index] if index < len(names) and names[index] else 'unknown'
+        fds[name] = fd
+    return fds
+
+
+def adopt_listen_socket(environ=None, start: int = SD_LISTEN_FDS_START) -> Optional[socket.socket]:
+    """
+    Wrap the inherited portal listener, if systemd passed one
+    
+    Returns:
+        socket.socket: Inherited stream socket, or None to bind normally
+    """
+    fds = listen_fds(environ, start)
+    fd = fds.get(LISTEN_FD_NAME, fds.get('unknown'))
+    if fd is None:
+        return None
+    sock = socket.socket(fileno=fd)
+    if sock.type != socket.SOCK_STREAM:
+        logger.warning(f"Inherited fd {fd} is not a stream socket, ignoring")
+        sock.detach()
+        return None
+    logger.info(f"Adopted systemd listening socket fd {fd} ({sock.getsockname()})")
+    return sock
+
+
+SCAN_DEFAULT_LIMIT = 50
+SCAN_MAX_LIMIT = 100
+SECURITY_CLASSES = ('open', 'wep', 'wpa', 'enterprise')
+BANDS = {'2.4': '2.4GHz', '2.4ghz': '2.4GHz', '5': '5GHz', '5ghz': '5GHz', '6': '6GHz', '6ghz': '6GHz'}
+
+
+@dataclass
+class ScanQuery:
+    """Filter, ordering and paging parameters for /api/scan"""
+    min_signal: int = 0
+    security: Optional[str] = None
+    band: Optional[str] = None
+    prefix: str = ''
+    limit: int = SCAN_DEFAULT_LIMIT
+    offset: int = 0
+    cursor: Optional[Tuple[int, str]] = None
+
+
+def _int_param(params: Dict[str, List[str]], name: str, default: int,
+               minimum: int, maximum: int) -> int:
+    """Read a bounded integer query parameter"""
+    if name not in params:
+        return default
+    try:
+        value = int(params[name][0])
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if not minimum <= value <= maximum:
+        raise ValueError(f"{name} must be between {minimum} and {maximum}")
+    return value
+
+
+def encode_scan_cursor(key: Tuple[int, str]) -> str:
+    """Encode a (signal, ssid) sort key as an opaque cursor"""
+    raw = json.dumps([key[0], key[1]], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_scan_cursor(cursor: str) -> Tuple[int, str]:
+    """Decode a cursor produced by encode_scan_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        signal, ssid = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return int(signal), str(ssid)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def parse_scan_query(query_string: str) -> ScanQuery:
+    """
+    Parse /api/scan query string
+    
+    Args:
+        query_string: Raw query string (without leading '?')
+    
+    Returns:
+        ScanQuery: Parsed parameters
+    
+    Raises:
+        ValueError: If any parameter is malformed or out of range
+    """
+    params = parse_qs(query_string)
+    query = ScanQuery(
+        min_signal=_int_param(params, 'min_signal', 0, 0, 100),
+        limit=_int_param(params, 'limit', SCAN_DEFAULT_LIMIT, 1, SCAN_MAX_LIMIT),
+        offset=_int_param(params, 'offset', 0, 0, 10000),
+        prefix=params.get('q', [''])[0].strip().lower(),
+    )
+    if 'security' in params:
+        query.security = params['security'][0].lower()
+        if query.security not in SECURITY_CLASSES:
+            raise ValueError(f"security must be one of {', '.join(SECURITY_CLASSES)}")
+    if 'band' in params:
+        query.band = BANDS.get(params['band'][0].lower())
+        if query.band is None:
+            raise ValueError("band must be 2.4, 5 or 6")
+    if 'cursor' in params:
+        query.cursor = decode_scan_cursor(params['cursor'][0])
+    return query
+
+
+def _scan_sort_key(summary) -> Tuple[int, str]:
+    """Order by signal descending, then SSID for a stable tie-break"""
+    return (-summary.signal_strength, summary.ssid)
+
+
+def select_networks(summaries: Iterable, query: ScanQuery) -> Dict[str, Any]:
+    """
+    Filter and page per-SSID scan summaries
+    
+    Only the offset + limit best entries are selected (heap-based, no full
+    sort). The cursor is the sort key of the last entry returned, so it
+    stays meaningful after the scan cache is refreshed.
+    
+    Args:
+        summaries: SSIDSummary objects from a ScanResult
+        query: Parsed ScanQuery
+    
+    Returns:
+        dict: JSON-ready page with networks, total (all filter matches,
+            independent of cursor and offset) and next_cursor
+    """
+    filtered = [
+        s for s in summaries
+        if s.signal_strength >= query.min_signal
+        and (query.security is None or security_class(s.security) == query.security)
+        and (query.band is None or query.band in s.bands)
+        and (not query.prefix or s.ssid.lower().startswith(query.prefix))
+    ]
+    after = (-query.cursor[0], query.cursor[1]) if query.cursor else None
+    matches = [s for s in filtered if _scan_sort_key(s) > after] if after else filtered
+    window = heapq.nsmallest(query.offset + query.limit, matches, key=_scan_sort_key)
+    page = window[query.offset:]
+    
+    next_cursor = None
+    if page and len(matches) > query.offset + query.limit:
+        last = page[-1]
+        next_cursor = encode_scan_cursor((last.signal_strength, last.ssid))
+    
+    return {
+        "networks": [
+            {
+                "ssid": s.ssid,
+                "signal": s.signal_strength,
+                "security": s.security,
+                "security_class": security_class(s.security),
+                "bands": sorted(s.bands),
+                "bssid_count": s.bssid_count,
+                "channel": s.best.channel,
+            }
+            for s in page
+        ],
+        "total": len(filtered),
+        "next_cursor": next_cursor,
+    }
+
+
+HTML_PAGE = """<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
@@ -204,7 +523,7 @@ class ConfigHTTPHandler(BaseHTTPRequestHandler):
             showStatus('Scanning for networks...', 'info');
             setLoading(true);
             try {
-                const resp = await fetch('/api/scan');
+                const resp = await fetch('/api/scan?limit=25');
                 if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
                 const data = await resp.json();
                 networkList.innerHTML = '';
@@ -215,7 +534,7 @@ class ConfigHTTPHandler(BaseHTTPRequestHandler):
                         opt.textContent = `${net.ssid} (${net.signal}% ${net.security})`;
                         networkList.appendChild(opt);
                     });
-                    showStatus(`Found ${data.networks.length} network(s)`, 'success');
+                    showStatus(`Found ${data.total} network(s)`, 'success');
                 } else {
                     showStatus('No networks found', 'error');
                 }
@@ -288,46 +607,166 @@ class ConfigHTTPHandler(BaseHTTPRequestHandler):
     </script>
 </body>
 </html>"""
-        
+HTML_PAGE_BYTES = HTML_PAGE.encode('utf-8')
+
+
+class ConfigHTTPHandler(BaseHTTPRequestHandler):
+    """Handle HTTP requests with embedded resources"""
+
+    # Socket timeout: idle or stalled connections are dropped
+    timeout = IDLE_TIMEOUT_SECONDS
+
+    def log_message(self, format: str, *args) -> None:
+        """Override to use custom logger"""
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def do_GET(self) -> None:
+        """Route GET requests: probe table first, then GET_ROUTES"""
+        try:
+            path = self.path.split('?', 1)[0]
+            probe = PROBE_RESPONSES.get(path)
+            if probe is not None:
+                self.send_precomputed(probe)
+                return
+            if not self.admit(path):
+                return
+            route = self.GET_ROUTES.get(path)
+            if route is not None:
+                route(self)
+            else:
+                self.send_error_response(404, "Not Found")
+        except Exception as e:
+            logger.error(f"GET request error: {e}\n{traceback.format_exc()}")
+            self.send_error_response(500, "Internal Server Error")
+
+    def do_POST(self) -> None:
+        """Route POST requests"""
+        try:
+            path = self.path.split('?', 1)[0]
+            if not self.admit(path):
+                return
+            route = self.POST_ROUTES.get(path)
+            if route is not None:
+                route(self)
+            else:
+                self.send_error_response(404, "Not Found")
+        except Exception as e:
+            logger.error(f"POST request error: {e}\n{traceback.format_exc()}")
+            self.send_error_response(500, "Internal Server Error")
+
+    def serve_html_page(self) -> None:
+        """Send embedded HTML page with CSS and JavaScript"""
         self.send_response(200)
         self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(HTML_PAGE_BYTES)))
         self.send_header('Cache-Control', 'no-cache')
         self.end_headers()
-        self.wfile.write(html_content.encode('utf-8'))
+        self.wfile.write(HTML_PAGE_BYTES)
         logger.debug("Served HTML configuration page")
 
+    def admit(self, path: str) -> bool:
+        """Apply per-client rate limit, send 429 with Retry-After if exceeded"""
+        limiter = getattr(self.server, 'rate_limiter', None)
+        if limiter is None:
+            return True
+        retry_after = limiter.check(self.client_address[0], path)
+        if retry_after == 0:
+            return True
+        self.count('rejected_rate_limited')
+        logger.warning(f"Rate limit exceeded for {self.client_address[0]} on {path}")
+        self.send_json_response({"error": "Too Many Requests"}, 429,
+                                {'Retry-After': str(retry_after)})
+        return False
+
+    def read_body(self) -> Optional[bytes]:
+        """
+        Read request body in chunks under size limit and deadline
+        
+        Returns:
+            bytes: Complete body, or None if an error response was sent
+                   (400 bad length, 413 too large, 408 too slow)
+        """
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            self.send_error_response(400, "Invalid Content-Length")
+            return None
+        if content_length <= 0:
+            self.send_error_response(400, "Empty request body")
+            return None
+        if content_length > MAX_BODY_BYTES:
+            self.count('rejected_body_too_large')
+            logger.warning(f"Request body too large ({content_length} bytes) from {self.client_address[0]}")
+            self.close_connection = True
+            self.send_error_response(413, "Request body too large")
+            return None
+        
+        deadline = time.monotonic() + BODY_DEADLINE_SECONDS
+        chunks: List[bytes] = []
+        remaining = content_length
+        try:
+            while remaining > 0:
+                time_left = deadline - time.monotonic()
+                if time_left <= 0:
+                    raise socket.timeout("body deadline exceeded")
+                if self.connection is not None:
+                    self.connection.settimeout(time_left)
+                chunk = self.rfile.read1(min(BODY_CHUNK_BYTES, remaining))
+                if not chunk:
+                    self.send_error_response(400, "Incomplete request body")
+                    return None
+                chunks.append(chunk)
+                remaining -= len(chunk)
+        except socket.timeout:
+            self.count('rejected_body_timeout')
+            logger.warning(f"Request body deadline exceeded for {self.client_address[0]}")
+            self.close_connection = True
+            self.send_error_response(408, "Request Timeout")
+            return None
+        finally:
+            if self.connection is not None:
+                self.connection.settimeout(self.timeout)
+        return b''.join(chunks)
+
+    def count(self, name: str) -> None:
+        """Increment a server metric if metrics are available"""
+        metrics = getattr(self.server, 'metrics', None)
+        if metrics is not None:
+            metrics.increment(name)
+
+    def send_precomputed(self, response: bytes) -> None:
+        """Write a complete prebuilt HTTP response"""
+        self.close_connection = True
+        self.wfile.write(response)
+
     def handle_scan_request(self) -> None:
-        """Call ConnectionManager.scan_networks(), return JSON with CORS"""
+        """Filter, sort and page cached scan results, return JSON with CORS"""
+        try:
+            query = parse_scan_query(urlsplit(self.path).query)
+        except ValueError as e:
+            self.send_error_response(400, str(e))
+            return
+        
         try:
-            # Import here to avoid circular dependencies
-            from connection_manager import ConnectionManager
-            
             logger.info("Network scan requested")
-            networks = ConnectionManager.scan_networks()
-            self.send_json_response({"networks": networks})
-            logger.info(f"Scan completed: {len(networks)} networks found")
+            result = ScanCache.get()
+            response = select_networks(result.summaries.values(), query)
+            response["scanned_at"] = result.timestamp
+            self.send_json_response(response)
+            logger.info(f"Scan completed: {response['total']} networks matched")
         except Exception as e:
             logger.error(f"Scan failed: {e}\n{traceback.format_exc()}")
             self.send_error_response(500, "Network scan failed")
 
     def handle_status_request(self) -> None:
-        """Query StateMonitor/APManager, return JSON with CORS"""
+        """Return the wired provider's published status snapshot as JSON with CORS"""
+        provider = getattr(self.server, 'status_provider', None)
+        if provider is None:
+            self.send_error_response(503, "Status unavailable")
+            return
         try:
-            # Import here to avoid circular dependencies
-            from state_monitor import StateMonitor
-            from connection_manager import ConnectionManager
-            from ap_manager import APManager
-            
             logger.debug("Status query requested")
-            state = StateMonitor.get_current_state()
-            ssid = ConnectionManager.get_current_ssid()
-            ap_active = APManager.is_active()
-            
-            response = {
-                "state": state,
-                "ssid": ssid,
-                "ap_active": ap_active
-            }
+            response = provider()
             self.send_json_response(response)
             logger.debug(f"Status returned: {response}")
         except Exception as e:
@@ -337,12 +776,9 @@ class ConfigHTTPHandler(BaseHTTPRequestHandler):
     def handle_configure_request(self) -> None:
         """Parse JSON body, validate, call ConnectionManager.configure_network()"""
         try:
-            content_length = int(self.headers.get('Content-Length', 0))
-            if content_length == 0:
-                self.send_error_response(400, "Empty request body")
+            body = self.read_body()
+            if body is None:
                 return
-            
-            body = self.rfile.read(content_length)
             data = json.loads(body.decode('utf-8'))
             
             ssid = data.get('ssid', '').strip()
@@ -364,11 +800,10 @@ class ConfigHTTPHandler(BaseHTTPRequestHandler):
                 }, 400)
                 return
             
-            # Import here to avoid circular dependencies
-            from connection_manager import ConnectionManager
-            
+            configure = (getattr(self.server, 'network_configurator', None)
+                         or ConfigManager.configure_network)
             logger.info(f"Configuration requested for SSID: {ssid}")
-            ConnectionManager.configure_network(ssid, password)
+            configure(ssid, password)
             
             self.send_json_response({
                 "success": True,
@@ -389,10 +824,13 @@ class ConfigHTTPHandler(BaseHTTPRequestHandler):
                 "message": f"Configuration failed: {str(e)}"
             }, 500)
 
-    def send_json_response(self, data: dict, status_code: int = 200) -> None:
+    def send_json_response(self, data: dict, status_code: int = 200,
+                           headers: Optional[Dict[str, str]] = None) -> None:
         """Send JSON with CORS headers"""
         try:
             self.send_response(status_code)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
@@ -407,50 +845,162 @@ class ConfigHTTPHandler(BaseHTTPRequestHandler):
         """Send JSON error response"""
         self.send_json_response({"error": message}, status_code)
 
+    GET_ROUTES = {
+        '/': serve_html_page,
+        '/api/scan': handle_scan_request,
+        '/api/status': handle_status_request,
+    }
+    POST_ROUTES = {
+        '/api/configure': handle_configure_request,
+    }
+
 
 class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
-    """Handle requests in separate threads"""
+    """Handle requests in separate threads, capped at max_connections"""
     daemon_threads = True
     allow_reuse_address = True
+    max_connections = MAX_CONNECTIONS
+    # Connections arriving while False are closed immediately (portal paused)
+    accepting = True
+    # Wired by WebServerManager; handlers never import other components
+    status_provider: Optional[Callable[[], Dict[str, Any]]] = None
+    network_configurator: Optional[Callable[[str, str], Any]] = None
+
+    @classmethod
+    def from_socket(cls, sock: socket.socket, handler_class) -> 'ThreadedHTTPServer':
+        """Build server around an already bound and listening socket"""
+        server = cls(sock.getsockname()[:2], handler_class, bind_and_activate=False)
+        server.socket.close()
+        server.socket = sock
+        server.server_address = sock.getsockname()
+        server.server_name = socket.getfqdn(server.server_address[0])
+        server.server_port = server.server_address[1]
+        return server
+
+    def verify_request(self, request, client_address) -> bool:
+        """Admit connections only while accepting"""
+        if not self.accepting:
+            self.metrics.increment('rejected_not_accepting')
+            return False
+        return True
+
+    def __init__(self, *args, **kwargs):
+        self.metrics = ServerMetrics()
+        self.rate_limiter = RateLimiter()
+        self._connection_slots = threading.BoundedSemaphore(self.max_connections)
+        super().__init__(*args, **kwargs)
+
+    def process_request(self, request, client_address) -> None:
+        """Start a handler thread if a slot is free, otherwise reply 503"""
+        if not self._connection_slots.acquire(blocking=False):
+            self.metrics.increment('rejected_overloaded')
+            logger.warning(f"Connection cap ({self.max_connections}) reached, rejecting {client_address[0]}")
+            try:
+                request.settimeout(1.0)
+                request.sendall(OVERLOADED_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._connection_slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address) -> None:
+        """Release the connection slot when the handler thread ends"""
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._connection_slots.release()
 
 
 class WebServerManager:
-    """Manage HTTP server lifecycle"""
+    """
+    Manage HTTP server lifecycle
+    
+    The listening socket is bound once by open() (or inherited from
+    pi-netconfig.socket via LISTEN_FDS) and kept for the whole process.
+    start_server()/stop_server() only flip the server's accepting flag,
+    so AP-mode cycles cost no bind or thread setup and cannot race on
+    EADDRINUSE. close() releases the socket at process exit.
+    """
+
+    def __init__(self, port: int = 8080,
+                 status_provider: Optional[Callable[[], Dict[str, Any]]] = None,
+                 network_configurator: Optional[Callable[[str, str], Any]] = None):
+        """
+        Initialize server on specified port
 
-    def __init__(self, port: int = 8080):
-        """Initialize server on specified port"""
+        Args:
+            port: Port number
+            status_provider: Callable returning the /api/status payload
+            network_configurator: Callable(ssid, password) applying credentials
+                (defaults to ConfigManager.configure_network)
+        """
         self.port = port
+        self.status_provider = status_provider
+        self.network_configurator = network_configurator
         self.server: Optional[ThreadedHTTPServer] = None
         self.server_thread: Optional[threading.Thread] = None
         self._lock = threading.Lock()
 
+    def open(self) -> None:
+        """Bind listening socket and start accept thread (idempotent)"""
+        with self._lock:
+            self._open_locked()
+
+    def _open_locked(self) -> None:
+        """Bind and start accept thread; caller holds _lock"""
+        if self.server is not None:
+            return
+        try:
+            inherited = adopt_listen_socket()
+            if inherited is not None:
+                self.server = ThreadedHTTPServer.from_socket(inherited, ConfigHTTPHandler)
+            else:
+                self.server = ThreadedHTTPServer(('0.0.0.0', self.port), ConfigHTTPHandler)
+            self.server.accepting = False
+            self.server.status_provider = self.status_provider
+            self.server.network_configurator = self.network_configurator
+            self.server_thread = threading.Thread(target=self.server.serve_forever)
+            self.server_thread.daemon = True
+            self.server_thread.start()
+            logger.info(f"Web server listening on 0.0.0.0:{self.port}")
+        except OSError as e:
+            self.server = None
+            logger.critical(f"Failed to start server on port {self.port}: {e}\n{traceback.format_exc()}")
+            raise PortInUseError(f"Port {self.port} is unavailable: {e}")
+        except Exception as e:
+            self.server = None
+            logger.critical(f"Unexpected error starting server: {e}\n{traceback.format_exc()}")
+            raise WebServerError(f"Failed to start server: {e}")
+
     def start_server(self) -> None:
-        """Start server in daemon thread"""
+        """Begin serving requests, binding first if not yet open"""
         with self._lock:
             if self.is_running():
                 logger.warning("Server already running")
                 raise PortInUseError("Server is already running")
             
-            try:
-                self.server = ThreadedHTTPServer(('0.0.0.0', self.port), ConfigHTTPHandler)
-                self.server_thread = threading.Thread(target=self.server.serve_forever)
-                self.server_thread.daemon = True
-                self.server_thread.start()
-                logger.info(f"Web server started on 0.0.0.0:{self.port}")
-            except OSError as e:
-                logger.critical(f"Failed to start server on port {self.port}: {e}\n{traceback.format_exc()}")
-                raise PortInUseError(f"Port {self.port} is unavailable: {e}")
-            except Exception as e:
-                logger.critical(f"Unexpected error starting server: {e}\n{traceback.format_exc()}")
-                raise WebServerError(f"Failed to start server: {e}")
+            self._open_locked()
+            self.server.accepting = True
+            logger.info(f"Web server started on 0.0.0.0:{self.port}")
 
     def stop_server(self) -> None:
-        """Shutdown server gracefully"""
+        """Stop serving requests, keeping the listening socket bound"""
         with self._lock:
             if not self.is_running():
                 logger.warning("Server not running")
                 return
             
+            self.server.accepting = False
+            logger.info("Web server stopped (listening socket retained)")
+
+    def close(self) -> None:
+        """Shutdown accept thread and close listening socket"""
+        with self._lock:
             try:
                 if self.server:
                     logger.info("Shutting down web server")
@@ -462,16 +1012,20 @@ class WebServerManager:
                     self.server_thread.join(timeout=5.0)
                     self.server_thread = None
                 
-                logger.info("Web server stopped")
+                logger.info("Web server closed")
             except Exception as e:
-                logger.error(f"Error stopping server: {e}\n{traceback.format_exc()}")
+                logger.error(f"Error closing server: {e}\n{traceback.format_exc()}")
 
-    def is_running(self) -> bool:
-        """Return server status"""
+    def is_open(self) -> bool:
+        """Return True if the listening socket is bound and served"""
         return (self.server is not None and 
                 self.server_thread is not None and 
                 self.server_thread.is_alive())
 
+    def is_running(self) -> bool:
+        """Return server status"""
+        return self.is_open() and bool(self.server.accepting)
+
 
 # Module-level singleton and functions
 _server_manager: Optional[WebServerManager] = None
@@ -504,6 +1058,41 @@ def start_server(port: int = 8080) -> None:
             raise WebServerError(f"Server start failed: {e}")
 
 
+def open_server(port: int = 8080,
+                status_provider: Optional[Callable[[], Dict[str, Any]]] = None,
+                network_configurator: Optional[Callable[[str, str], Any]] = None) -> None:
+    """
+    Public entry point to bind the listening socket at service start
+    
+    Args:
+        port: Port number (default 8080)
+        status_provider: Callable returning the /api/status payload
+        network_configurator: Callable(ssid, password) applying credentials
+    
+    Raises:
+        PortInUseError: If port is unavailable
+        WebServerError: If server fails to start
+    """
+    global _server_manager
+    
+    with _manager_lock:
+        if _server_manager is None:
+            _server_manager = WebServerManager(port, status_provider, network_configurator)
+        _server_manager.open()
+
+
+def close_server() -> None:
+    """
+    Public entry point to release the listening socket at process exit
+    """
+    global _server_manager
+    
+    with _manager_lock:
+        if _server_manager is not None:
+            _server_manager.close()
+            _server_manager = None
+
+
 def stop_server() -> None:
     """
     Public entry point to stop server